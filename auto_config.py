@@ -32,7 +32,27 @@ def main():
             'game' : 'ds1',
             'profile': 'initial_profile.profile',
             'sorting_type': 'alphabetical',
-            'automatically_renumber': 'true'
+            'automatically_renumber': 'true',
+            'deduplicate_saves': 'false',
+            'order_manifest': 'false',
+            'visible_rows': '30',
+            'watch_interval': '1.0',
+            'compression': 'none',
+            'compression_level': '6',
+            'load_latency_budget_ms': '250',
+            'delta_saves': 'false',
+            'delta_keyframe_interval': '16',
+            'auto_snapshot': 'false',
+            'auto_snapshot_debounce': '2.0',
+            'auto_snapshot_min_interval': '60',
+            'ds1_quota_mb': '0',
+            'ds3_quota_mb': '0',
+            'quota_evicts_auto_snapshots': 'false',
+            'instrumentation': 'false',
+            'instrumentation_buffer': '1000',
+            'config_write_interval': '1.0',
+            'verify_saves': 'false',
+            'save_metadata': 'false'
         }
 
         with open('config.ini', 'w', encoding='utf8') as configfile:
@@ -0,0 +1,78 @@
+# -*- coding:Utf-8 -*-
+
+import os
+import threading
+import time
+
+from hashing import stat_key
+from order_manifest import split_number
+
+AUTO_PREFIX = 'auto '
+
+
+def auto_name():
+    return time.strftime(AUTO_PREFIX + '%Y-%m-%d %H.%M.%S')
+
+
+def is_auto_name(name):
+    return split_number(name)[1].startswith(AUTO_PREFIX)
+
+
+def auto_time(name):
+    # the time in ns written in the name of an auto-snapshot, None once it was renamed
+    try:
+        return int(time.mktime(time.strptime(split_number(name)[1], AUTO_PREFIX + '%Y-%m-%d %H.%M.%S'))) * 1_000_000_000
+    except ValueError:
+        return None
+
+
+class AutoSnapshotter:
+    # polls the size and mtime of the live save in a thread. Once they changed and then stayed the same for
+    # `debounce` seconds, the callback is called in the thread, at most once every `min_interval` seconds
+    def __init__(self, path, callback, interval=1.0, debounce=2.0, min_interval=60.0, is_ignored=None):
+        self.path = path
+        self.callback = callback
+        self.interval = interval
+        self.debounce = debounce
+        self.min_interval = min_interval
+        self.is_ignored = is_ignored  # stat key -> True when the write is not the game's, like a load
+        self.stopping = threading.Event()
+        self.thread = None
+        self.last_snapshot = float('-inf')
+
+    def start(self):
+        self.thread = threading.Thread(target=self._watch, name='savemanager-autosnapshot', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopping.set()
+        if self.thread is not None:
+            self.thread.join(1)
+            self.thread = None
+
+    def _stat(self):
+        try:
+            return stat_key(os.stat(self.path))
+        except OSError:
+            return None
+
+    def _watch(self):
+        last = self._stat()
+        changed_at = None
+        while not self.stopping.wait(self.interval):
+            current = self._stat()
+            now = time.monotonic()
+            if current != last:  # still being written, the snapshot waits for the writes to settle
+                last = current
+                changed_at = now
+                continue
+            if changed_at is None or current is None or now - changed_at < self.debounce:
+                continue
+            if now - self.last_snapshot < self.min_interval:
+                continue
+
+            changed_at = None
+            if self.is_ignored is not None and self.is_ignored(current):
+                continue
+            self.last_snapshot = now
+            self.callback()
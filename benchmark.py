@@ -0,0 +1,170 @@
+# -*- coding:Utf-8 -*-
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from configparser import ConfigParser
+
+from delta_benchmark import synthetic_save
+from ordering import FILE_SORTS
+from save_core import SAVE_NAMES, Game, Settings
+
+PROFILE = '1 benchmark'
+
+
+def make_game(directory, saves, save_size, rng, sorting_type='alphabetical'):
+    # the saves of the profile are hard links to one file, so 100k saves of a realistic size fit on any disk
+    ds_path = os.path.join(directory, 'ds')
+    profile_path = os.path.join(ds_path, PROFILE + '.profile')
+    os.makedirs(profile_path)
+    live_save = os.path.join(ds_path, SAVE_NAMES['ds3'] + '.sl2')
+    with open(live_save, 'wb') as file:
+        file.write(synthetic_save(save_size, rng))
+
+    template = os.path.join(directory, 'template.sl2')
+    with open(template, 'wb') as file:
+        file.write(synthetic_save(save_size, rng))
+    for i in range(saves):
+        path = os.path.join(profile_path, f'save {i:06d}.sl2')
+        try:
+            os.link(template, path)
+        except OSError:
+            shutil.copyfile(template, path)
+
+    cfg = ConfigParser()
+    cfg['Main'] = {
+        'ds3_path': ds_path,
+        'ds1_path': ds_path,
+        'game': 'ds3',
+        'profile': PROFILE + '.profile',
+        'sorting_type': sorting_type,
+        'automatically_renumber': 'false',
+        'watch_interval': '3600',
+    }
+    return cfg
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+def bench_headless(cfg):
+    game = Game(Settings(cfg))
+    results = dict()
+    results['open_profile'] = timed(game.profile, PROFILE)
+    results['open_profile_cached'] = timed(game.profile, PROFILE)
+    profile = game.profile(PROFILE)
+    names = profile.names()
+
+    results['renumber'] = timed(profile.renumber)
+    names = profile.names()
+    if game.settings.sorting_type not in FILE_SORTS:  # the saves sorted by file cannot be moved
+        results['move'] = timed(profile.move, names[len(names) // 2], 0)
+    results['load'] = timed(profile.load, profile.names()[-1])
+    results['load_already_loaded'] = timed(profile.load, profile.names()[-1])
+    results['import'] = timed(profile.import_save, 'imported')
+    results['delete'] = timed(profile.delete, 'imported')
+    results['reverse_numbering'] = timed(profile.reverse_numbering)
+    return results
+
+
+def bench_tk(cfg):
+    import tkinter as tk
+    import main2
+
+    class BenchmarkApp(main2.App):
+        def iconbitmap(self, *args):  # the icon is a Windows .ico
+            pass
+
+    try:
+        root = BenchmarkApp(cfg)
+    except tk.TclError as error:
+        return {'skipped': str(error)}
+
+    def wait(function, *args):
+        function(*args)
+        root.io.wait()
+        root.update_idletasks()
+
+    results = dict()
+    try:
+        results['init_widgets'] = timed(wait, root.create_profile_window)
+        profile = root.current_profile
+        results['reinit_widgets'] = timed(wait, profile.reinit_widgets)
+        results['renumber_the_items'] = timed(wait, profile.renumber_the_items)
+
+        profile.activate_reorganising_state()
+        profile.reorganization_focus = profile.order[len(profile.order) // 2]
+        results['_move_item'] = timed(wait, profile._move_item, 1)
+        profile.stop_reorganising()
+
+        results['load'] = timed(wait, profile.load, profile.order[-1])
+        profile.entry.insert(0, 'imported')
+        results['_new_item'] = timed(wait, profile.new_item)
+    finally:
+        root.close()
+    return results
+
+
+def start_virtual_display():
+    # an Xvfb server when there is no display, None when there is a display already or no Xvfb
+    if sys.platform.startswith('win') or os.environ.get('DISPLAY') or shutil.which('Xvfb') is None:
+        return None
+    display = f':{random.randint(100, 999)}'
+    server = subprocess.Popen(['Xvfb', display, '-screen', '0', '1280x1024x24'], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    time.sleep(1)
+    os.environ['DISPLAY'] = display
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Times the profile operations on synthetic profiles of growing size')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 1000, 10000, 100000], help='numbers of saves in the profile')
+    parser.add_argument('--save-size', type=int, default=4 << 20, help='size of a save in bytes')
+    parser.add_argument('--sorting-type', default='alphabetical', choices=['alphabetical', 'natural', 'mtime', 'size', 'import', 'default'])
+    parser.add_argument('--no-tk', action='store_true', help='only time the headless operations')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='JSON file to write, the standard output by default')
+    args = parser.parse_args()
+
+    server = None if args.no_tk else start_virtual_display()
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'save_size': args.save_size,
+        'sorting_type': args.sorting_type,
+        'results': [],
+    }
+    try:
+        for saves in args.sizes:
+            result = {'saves': saves}
+            with tempfile.TemporaryDirectory() as directory:
+                result['headless'] = bench_headless(make_game(directory, saves, args.save_size, random.Random(args.seed), args.sorting_type))
+            if not args.no_tk:
+                with tempfile.TemporaryDirectory() as directory:
+                    result['tk'] = bench_tk(make_game(directory, saves, args.save_size, random.Random(args.seed), args.sorting_type))
+            report['results'].append(result)
+            print(f'{saves} saves done', file=sys.stderr)
+    finally:
+        if server is not None:
+            server.terminate()
+
+    text = json.dumps(report, indent=2)
+    if args.output is None:
+        print(text)
+    else:
+        with open(args.output, 'w', encoding='utf8') as file:
+            file.write(text)
+
+
+if __name__ == '__main__':
+    main()
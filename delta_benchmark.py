@@ -0,0 +1,100 @@
+# -*- coding:Utf-8 -*-
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from collections import defaultdict
+
+from snapshot_codec import read_delta, read_header, reconstruct
+from snapshot_store import SnapshotStore
+
+
+def synthetic_save(size, rng):
+    # slots of random data separated by long zero-padded regions, like a .sl2
+    data = bytearray(size)
+    slot = max(size // 10, 1)
+    for start in range(0, size - slot + 1, slot):
+        used = slot // 4
+        data[start:start + used] = rng.randbytes(used)
+    return data
+
+
+def mutate(data, changed_bytes, rng):
+    # a play session changes a few small regions of the save
+    data = bytearray(data)
+    remaining = changed_bytes
+    while remaining > 0:
+        length = min(remaining, rng.randint(16, 512))
+        start = rng.randrange(0, len(data) - length)
+        data[start:start + length] = rng.randbytes(length)
+        remaining -= length
+    return data
+
+
+def run(keyframe_interval, snapshots, size, changed_bytes, method, level, seed):
+    rng = random.Random(seed)
+    with tempfile.TemporaryDirectory() as directory:
+        store = SnapshotStore(os.path.join(directory, 'store'), method, level, keyframe_interval)
+        live = os.path.join(directory, 'live.sl2')
+        data = synthetic_save(size, rng)
+        digests = []
+        start = time.perf_counter()
+        for i in range(snapshots):
+            data = mutate(data, changed_bytes, rng)
+            with open(live, 'wb') as file:
+                file.write(data)
+            digests.append(store.add(live, os.path.join(directory, f'{i}.sl2')))
+        import_time = time.perf_counter() - start
+
+        stored = 0
+        latencies = defaultdict(list)  # length of the chain -> seconds to rebuild the snapshot
+        for digest in digests:
+            path = store.object_path(digest)
+            stored += os.path.getsize(path)
+            header = read_header(path)
+            depth = read_delta(path).depth if header is not None and header.method == 'delta' else 0
+            start = time.perf_counter()
+            reconstruct(path, store.object_path)
+            latencies[depth].append(time.perf_counter() - start)
+
+    raw = size * snapshots
+    return {
+        'keyframe_interval': keyframe_interval,
+        'raw_bytes': raw,
+        'stored_bytes': stored,
+        'savings': 1 - stored / raw,
+        'import_ms': import_time * 1000 / snapshots,
+        'reconstruction_ms': {depth: 1000 * sum(times) / len(times) for depth, times in sorted(latencies.items())},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Storage savings and reconstruction latency of the delta snapshots')
+    parser.add_argument('--snapshots', type=int, default=64)
+    parser.add_argument('--size', type=int, default=4 << 20, help='size of a save in bytes')
+    parser.add_argument('--changed', type=int, default=8 << 10, help='bytes changed between two snapshots')
+    parser.add_argument('--intervals', type=int, nargs='+', default=[1, 4, 8, 16, 32])
+    parser.add_argument('--compression', choices=['none', 'zlib', 'lzma'], default='none', help='compression of the keyframes')
+    parser.add_argument('--level', type=int, default=6)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', action='store_true', help='print the results as JSON')
+    args = parser.parse_args()
+
+    method = None if args.compression == 'none' else args.compression
+    results = [run(interval, args.snapshots, args.size, args.changed, method, args.level, args.seed) for interval in args.intervals]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for result in results:
+        print(f"keyframe every {result['keyframe_interval']}: {result['stored_bytes'] / 1e6:.1f} MB stored for "
+              f"{result['raw_bytes'] / 1e6:.1f} MB ({result['savings']:.1%} saved), import {result['import_ms']:.1f} ms")
+        for depth, ms in result['reconstruction_ms'].items():
+            print(f'    chain length {depth}: {ms:.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
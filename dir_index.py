@@ -0,0 +1,44 @@
+# -*- coding:Utf-8 -*-
+
+import os
+import time
+from collections import namedtuple
+
+RACY_NS = 2 * 10 ** 9  # a listing made right after a change of the directory may miss another change with the same mtime
+
+ItemEntry = namedtuple('ItemEntry', 'name size mtime_ns')
+
+
+class DirectoryIndex:
+    # entries of the directories listed with os.scandir, kept until the mtime of the directory changes
+    def __init__(self):
+        self.directories = dict()  # (path, suffix) -> (mtime_ns of the directory, {name: ItemEntry})
+
+    def entries(self, path, suffix):
+        key = path, suffix
+        mtime = os.stat(path).st_mtime_ns
+        cached = self.directories.get(key)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+        entries = dict()
+        with os.scandir(path) as iterator:
+            for entry in iterator:
+                file_name = entry.name
+                if file_name.endswith(suffix) and not file_name.startswith('.'):
+                    st = entry.stat()  # comes with the listing on Windows
+                    name = file_name[:-len(suffix)]
+                    entries[name] = ItemEntry(name, st.st_size, st.st_mtime_ns)
+
+        if time.time_ns() - mtime > RACY_NS:
+            self.directories[key] = mtime, entries
+        else:
+            self.directories.pop(key, None)
+        return entries
+
+    def invalidate(self, path=None):
+        if path is None:
+            self.directories.clear()
+            return
+        for key in [key for key in self.directories if key[0] == path]:
+            del self.directories[key]
@@ -0,0 +1,70 @@
+# -*- coding:Utf-8 -*-
+
+import errno
+import os
+import shutil
+import sys
+
+CHUNK_SIZE = 1 << 20
+FICLONE = 0x40049409  # from linux/fs.h
+
+_FALLBACK_ERRNOS = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSUP, errno.EBADF, errno.EPERM}
+
+
+def _reflink(fsrc, fdst):
+    if not sys.platform.startswith('linux'):
+        return False
+    import fcntl
+    try:
+        fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+    except OSError:
+        return False
+    return True
+
+
+def _copy_file_range(fsrc, fdst, size):
+    if not hasattr(os, 'copy_file_range'):
+        return False
+    infd, outfd = fsrc.fileno(), fdst.fileno()
+    offset = 0
+    while offset < size:
+        try:
+            n = os.copy_file_range(infd, outfd, size - offset, offset, offset)
+        except OSError as error:
+            if offset == 0 and error.errno in _FALLBACK_ERRNOS:
+                return False
+            raise
+        if n == 0:
+            break
+        offset += n
+    return True
+
+
+def _sendfile(fsrc, fdst, size):
+    if not hasattr(os, 'sendfile') or not sys.platform.startswith('linux'):
+        return False
+    infd, outfd = fsrc.fileno(), fdst.fileno()
+    offset = 0
+    while offset < size:
+        try:
+            n = os.sendfile(outfd, infd, offset, size - offset)
+        except OSError as error:
+            if offset == 0 and error.errno in _FALLBACK_ERRNOS:
+                return False
+            raise
+        if n == 0:
+            break
+        offset += n
+    return True
+
+
+def copy_file(src, dst):
+    # tries a reflink, then a kernel side copy, then a plain buffered copy; returns the number of bytes copied
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        size = os.fstat(fsrc.fileno()).st_size
+
+        if _reflink(fsrc, fdst) or _copy_file_range(fsrc, fdst, size) or _sendfile(fsrc, fdst, size):
+            return size
+
+        shutil.copyfileobj(fsrc, fdst, CHUNK_SIZE)
+    return size
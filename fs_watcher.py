@@ -0,0 +1,143 @@
+# -*- coding:Utf-8 -*-
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = IN_CREATE | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+EVENT_HEADER = struct.Struct('iIII')  # wd, mask, cookie, length of the name
+READ_SIZE = 64 * 1024
+
+
+def load_inotify():
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+class DirectoryWatcher:
+    # reports the items of a directory that may have been created, deleted or renamed by someone else.
+    # The callback is called in the watcher thread with a set of names, or None when everything has to be checked.
+    # With inotify the thread sleeps until an event comes, otherwise the directory mtime is polled
+    def __init__(self, path, suffix, callback, interval=1.0):
+        self.path = path
+        self.suffix = suffix
+        self.callback = callback
+        self.interval = interval
+        self.stopping = threading.Event()
+        self.thread = None
+        self.wake_pipe = None
+        self.method = None
+
+    def start(self):
+        fd = self._open_inotify()
+        if fd is None:
+            self.method = 'polling'
+            target, args = self._watch_polling, ()
+        else:
+            self.method = 'inotify'
+            self.wake_pipe = os.pipe()
+            target, args = self._watch_inotify, (fd,)
+        self.thread = threading.Thread(target=target, args=args, name='savemanager-watcher', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        # the thread only waits in select or posts the names, it is woken up and joined before the pipe is closed
+        self.stopping.set()
+        if self.wake_pipe is not None:
+            os.write(self.wake_pipe[1], b'.')
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        if self.wake_pipe is not None:
+            for end in self.wake_pipe:
+                os.close(end)
+            self.wake_pipe = None
+
+    def scan(self):
+        return {entry.name[:-len(self.suffix)] for entry in os.scandir(self.path) if self._is_item(entry.name)}
+
+    def _is_item(self, name):
+        return name.endswith(self.suffix) and not name.startswith('.')
+
+    def _open_inotify(self):
+        libc = load_inotify()
+        if libc is None:
+            return None
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            return None
+        if libc.inotify_add_watch(fd, os.fsencode(self.path), WATCH_MASK) < 0:
+            os.close(fd)
+            return None
+        return fd
+
+    def _watch_inotify(self, fd):
+        wake = self.wake_pipe[0]
+        try:
+            while not self.stopping.is_set():
+                readable, _, _ = select.select([fd, wake], [], [])
+                if fd not in readable:
+                    continue
+                try:
+                    data = os.read(fd, READ_SIZE)
+                except BlockingIOError:
+                    continue
+
+                names = set()
+                everything = False
+                offset = 0
+                while offset < len(data):
+                    _, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+                    offset += EVENT_HEADER.size
+                    name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+                    offset += length
+                    if mask & (IN_Q_OVERFLOW | IN_DELETE_SELF | IN_MOVE_SELF):
+                        everything = True
+                    elif self._is_item(name):
+                        names.add(name[:-len(self.suffix)])
+
+                if everything:
+                    self.callback(None)
+                elif names:
+                    self.callback(names)
+        finally:
+            os.close(fd)
+
+    def _watch_polling(self):
+        # creating, deleting or renaming an entry changes the mtime of the directory, so the idle cost is a stat
+        mtime = None
+        names = None
+        while True:
+            try:
+                st = os.stat(self.path)
+                if st.st_mtime_ns != mtime:
+                    current = self.scan()
+                    if names is not None and names != current:
+                        self.callback(names ^ current)
+                    mtime, names = st.st_mtime_ns, current
+            except OSError:
+                mtime = None
+            if self.stopping.wait(self.interval):
+                return
@@ -0,0 +1,65 @@
+# -*- coding:Utf-8 -*-
+
+import hashlib
+import os
+
+CHUNK_SIZE = 1 << 20
+DIGEST_SIZE = 20
+
+_digests = dict()  # absolute path -> (stat key, hex digest)
+
+
+def stat_key(st):
+    return st.st_size, st.st_mtime_ns, st.st_ino
+
+
+def new_hash():
+    return hashlib.blake2b(digest_size=DIGEST_SIZE)
+
+
+def hash_stream(file, h=None):
+    if h is None:
+        h = new_hash()
+    buffer = bytearray(CHUNK_SIZE)
+    view = memoryview(buffer)
+    while True:
+        n = file.readinto(buffer)
+        if not n:
+            break
+        h.update(view[:n])
+    return h
+
+
+def file_digest(path, st=None):
+    # the digest is only recomputed when the size, mtime or inode of the file changed
+    path = os.path.abspath(path)
+    if st is None:
+        st = os.stat(path)
+    key = stat_key(st)
+
+    cached = _digests.get(path)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+
+    with open(path, 'rb') as file:
+        digest = hash_stream(file).hexdigest()
+    _digests[path] = key, digest
+    return digest
+
+
+def cached_digest(path, st):
+    cached = _digests.get(os.path.abspath(path))
+    if cached is not None and cached[0] == stat_key(st):
+        return cached[1]
+    return None
+
+
+def remember_digest(path, digest, st=None):
+    path = os.path.abspath(path)
+    if st is None:
+        st = os.stat(path)
+    _digests[path] = stat_key(st), digest
+
+
+def forget_digest(path):
+    _digests.pop(os.path.abspath(path), None)
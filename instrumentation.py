@@ -0,0 +1,173 @@
+# -*- coding:Utf-8 -*-
+
+import builtins
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque, namedtuple
+
+Span = namedtuple('Span', 'name category thread start duration bytes fs_calls tk_calls')  # times in ns from the recorder origin
+FS_FUNCTIONS = ('stat', 'lstat', 'scandir', 'listdir', 'open', 'rename', 'replace', 'remove', 'unlink', 'link', 'mkdir', 'rmdir',
+                'utime', 'fstat')  # os.makedirs, os.path.exists, shutil... go through these
+
+
+class CountingTk:
+    # stands for the Tcl interpreter of the widgets while recording and counts the calls into Tcl
+    def __init__(self, tk, recorder):
+        self._tk = tk
+        self._recorder = recorder
+
+    def call(self, *args):
+        self._recorder.tk_calls += 1
+        return self._tk.call(*args)
+
+    def eval(self, script):
+        self._recorder.tk_calls += 1
+        return self._tk.eval(script)
+
+    def __getattr__(self, name):
+        return getattr(self._tk, name)
+
+
+class SpanContext:
+    def __init__(self, recorder, name, category):
+        self.recorder = recorder
+        self.name = name
+        self.category = category
+
+    def __enter__(self):
+        local = self.recorder.local
+        self.bytes = getattr(local, 'bytes', 0)
+        self.fs_calls = getattr(local, 'fs_calls', 0)
+        self.tk_calls = self.recorder.tk_calls
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *_):
+        end = time.perf_counter_ns()
+        recorder = self.recorder
+        local = recorder.local
+        tk_calls = recorder.tk_calls - self.tk_calls if threading.current_thread() is threading.main_thread() else 0
+        recorder.spans.append(Span(self.name, self.category, threading.current_thread().name, self.start - recorder.origin,
+                                   end - self.start, getattr(local, 'bytes', 0) - self.bytes,
+                                   getattr(local, 'fs_calls', 0) - self.fs_calls, tk_calls))
+
+
+class Recorder:
+    # keeps the last operations in a ring buffer, with their wall time, the bytes copied and the numbers of file system
+    # and Tk calls. The calls are only counted while recording: the os functions and the interpreter of the widgets
+    # are wrapped when the recording starts and restored when it stops
+    def __init__(self, capacity=1000):
+        self.enabled = False
+        self.spans = deque(maxlen=capacity)
+        self.local = threading.local()  # bytes and fs_calls of the thread
+        self.tk_calls = 0
+        self.origin = time.perf_counter_ns()
+        self.root = None
+        self._fs_functions = dict()  # (module, name) -> original function
+
+    def resize(self, capacity):
+        self.spans = deque(self.spans, maxlen=capacity)
+
+    def enable(self, root=None):
+        if self.enabled:
+            return
+        self.enabled = True
+        self._patch_fs()
+        if root is not None:
+            self.root = root
+            self._set_tk(root, CountingTk(root.tk, self))
+
+    def disable(self):
+        if not self.enabled:
+            return
+        self.enabled = False
+        self._restore_fs()
+        if self.root is not None:
+            tk = self.root.tk
+            self._set_tk(self.root, getattr(tk, '_tk', tk))
+            self.root = None
+
+    def clear(self):
+        self.spans.clear()
+
+    def span(self, name, category='ui'):
+        return SpanContext(self, name, category)
+
+    def add_bytes(self, n):
+        self.local.bytes = getattr(self.local, 'bytes', 0) + n
+
+    def summary(self):
+        # name -> (count, total ns, max ns)
+        totals = dict()
+        for span in self.spans:
+            count, total, longest = totals.get(span.name, (0, 0, 0))
+            totals[span.name] = count + 1, total + span.duration, max(longest, span.duration)
+        return totals
+
+    def chrome_trace(self):
+        # the format of chrome://tracing and Perfetto, with complete events in microseconds
+        pid = os.getpid()
+        threads = dict()
+        events = []
+        for span in self.spans:
+            tid = threads.setdefault(span.thread, len(threads) + 1)
+            events.append({'name': span.name, 'cat': span.category, 'ph': 'X', 'ts': span.start / 1000, 'dur': span.duration / 1000,
+                           'pid': pid, 'tid': tid,
+                           'args': {'bytes': span.bytes, 'fs_calls': span.fs_calls, 'tk_calls': span.tk_calls}})
+        for thread, tid in threads.items():
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': thread}})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def export_chrome_trace(self, path):
+        with open(path, 'w', encoding='utf8') as file:
+            json.dump(self.chrome_trace(), file)
+
+    def _patch_fs(self):
+        for name in FS_FUNCTIONS:
+            if hasattr(os, name):
+                self._wrap(os, name)
+        self._wrap(builtins, 'open')
+
+    def _wrap(self, module, name):
+        function = getattr(module, name)
+        local = self.local
+
+        @functools.wraps(function)
+        def counted(*args, **kwargs):
+            local.fs_calls = getattr(local, 'fs_calls', 0) + 1
+            return function(*args, **kwargs)
+
+        self._fs_functions[module, name] = function
+        setattr(module, name, counted)
+
+    def _restore_fs(self):
+        for (module, name), function in self._fs_functions.items():
+            setattr(module, name, function)
+        self._fs_functions.clear()
+
+    def _set_tk(self, widget, tk):
+        # the widgets keep the interpreter of their master when they are created
+        widget.tk = tk
+        for child in widget.children.values():
+            self._set_tk(child, tk)
+
+
+recorder = Recorder()
+
+
+def instrumented(name=None, category='ui'):
+    # records the calls of the function while the recorder is enabled, costs one attribute lookup otherwise
+    def decorator(function):
+        label = function.__qualname__ if name is None else name
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not recorder.enabled:
+                return function(*args, **kwargs)
+            with SpanContext(recorder, label, category):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,165 @@
+# -*- coding:Utf-8 -*-
+
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from hashing import file_digest, stat_key
+from order_manifest import write_json_atomically
+
+INDEX_NAME = '.integrity.json'
+
+
+class IntegrityError(ValueError):
+    pass
+
+
+class IntegrityIndex:
+    # the digests of the saves of a profile, recorded when they are imported and moved along when they are renamed.
+    # After a rename done outside of the manager, an entry is found again through the inode number, size and mtime,
+    # which a rename keeps. The entries of the files that are gone are dropped by the verification
+    def __init__(self, directory):
+        self.directory = directory
+        self.path = os.path.join(directory, INDEX_NAME)
+        self.entries = dict()  # file name -> [size, mtime_ns, inode, digest]
+        self.changed = False  # entries filed under new names and not saved yet
+        self._by_stat = None  # (inode, size, mtime_ns) -> file name, built on the first miss
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, encoding='utf8') as file:
+                self.entries = json.load(file)
+        except (FileNotFoundError, ValueError):  # a damaged index is rebuilt by the verification
+            self.entries = dict()
+        self._by_stat = None
+
+    def save(self):
+        write_json_atomically(self.path, self.entries)
+        self.changed = False
+
+    def add(self, name, st, digest):
+        self.entries[name] = [st.st_size, st.st_mtime_ns, st.st_ino, digest]
+        self._by_stat = None
+
+    def rename(self, renames):
+        # (path, new path) pairs, in any order
+        if not self.entries:
+            return
+        entries = [(os.path.basename(new_path), self.entries.pop(os.path.basename(path), None)) for path, new_path in renames]
+        for name, entry in entries:
+            if entry is None:
+                self.entries.pop(name, None)
+            else:
+                self.entries[name] = entry
+        self._by_stat = None
+        self.save()
+
+    def forget(self, *paths):
+        forgotten = [self.entries.pop(os.path.basename(path), None) for path in paths]
+        if any(entry is not None for entry in forgotten):
+            self._by_stat = None
+            self.save()
+
+    def find(self, path, st):
+        # the entry of the file, None when it has not been recorded
+        name = os.path.basename(path)
+        entry = self.entries.get(name)
+        if entry is not None and entry[2] == st.st_ino:
+            return entry
+        if self._by_stat is None:
+            self._by_stat = {(ino, size, mtime): other for other, (size, mtime, ino, _) in self.entries.items()}
+        other = self._by_stat.get((st.st_ino, st.st_size, st.st_mtime_ns))
+        if other is None:
+            return None
+        entry = self.entries[name] = list(self.entries[other])  # renamed, or another hard link to the same file
+        self.changed = True
+        return entry
+
+    def problem(self, path, st, digest):
+        # why the file does not match its entry, None when it does or has not been recorded
+        entry = self.find(path, st)
+        if entry is None:
+            return None
+        size, mtime, _, expected = entry
+        if size != st.st_size:
+            return f'is {st.st_size} bytes instead of {size}'
+        if digest != expected:
+            if mtime != st.st_mtime_ns:
+                return 'has been modified since it was imported'
+            return 'is corrupted'
+        return None
+
+    def check(self, path):
+        # raises IntegrityError before a damaged save is loaded
+        st = os.stat(path)
+        problem = self.problem(path, st, file_digest(path, st))
+        if self.changed:
+            self.save()
+        if problem is not None:
+            raise IntegrityError(f'"{os.path.splitext(os.path.basename(path))[0]}" {problem}')
+
+    def prune(self, names):
+        # keeps the entries of the existing files only
+        self.entries = {name: entry for name, entry in self.entries.items() if name in names}
+        self._by_stat = None
+
+
+def _hash(path):
+    # the digest is None when the file was written while it was read
+    st = os.stat(path)
+    digest = file_digest(path, st)
+    if stat_key(os.stat(path)) != stat_key(st):
+        return st, None
+    return st, digest
+
+
+def verify_profiles(ds_path, workers=None, progress=None):
+    # checks every save of the game directory in parallel threads, hashing releases the GIL. The digests of the files
+    # that did not change since they were last hashed are reused. The saves that were not recorded are recorded.
+    # The other operations on the profiles go on meanwhile: a save written while it is hashed is checked next time,
+    # and the indexes are merged with the entries recorded since they were read.
+    # Returns [(profile name, save name, problem)], progress is called with (done, total)
+    indexes = dict()
+    names = dict()  # profile path -> names of its saves
+    paths = []
+    with os.scandir(ds_path) as iterator:
+        profiles = [entry for entry in iterator if entry.name.endswith('.profile') and entry.is_dir()]
+    for profile in profiles:
+        indexes[profile.path] = IntegrityIndex(profile.path)
+        with os.scandir(profile.path) as iterator:
+            names[profile.path] = {entry.name for entry in iterator if entry.name.endswith('.sl2') and entry.is_file()}
+        paths.extend(os.path.join(profile.path, name) for name in names[profile.path])
+
+    problems = []
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        futures = {pool.submit(_hash, path): path for path in paths}
+        for done, future in enumerate(as_completed(futures), 1):
+            path = futures[future]
+            directory, name = os.path.split(path)
+            index = indexes[directory]
+            try:
+                st, digest = future.result()
+            except FileNotFoundError:  # deleted meanwhile
+                continue
+            if digest is None:
+                continue
+            problem = index.problem(path, st, digest)
+            if problem is not None:
+                problems.append((os.path.basename(directory)[:-len('.profile')], name[:-len('.sl2')], problem))
+            elif index.find(path, st) is None:
+                index.add(name, st, digest)
+            if progress is not None:
+                progress(done, len(paths))
+
+    for directory, index in indexes.items():
+        merged = IntegrityIndex(directory)
+        for name, entry in index.entries.items():
+            merged.entries.setdefault(name, entry)
+        try:
+            with os.scandir(directory) as iterator:
+                merged.prune({entry.name for entry in iterator if entry.name.endswith('.sl2')})
+        except FileNotFoundError:  # the profile was deleted or renamed meanwhile
+            continue
+        merged.save()
+    return sorted(problems)
@@ -0,0 +1,147 @@
+# -*- coding:Utf-8 -*-
+
+import os
+import queue
+from concurrent.futures import ThreadPoolExecutor
+
+from instrumentation import recorder
+
+BUSY_POLL_MS = 20
+IDLE_POLL_MS = 250
+
+
+def conflict(key, other):
+    # the operations on a directory are ordered with the ones on the directories it contains and on those containing it
+    if key == other:
+        return True
+    if not (isinstance(key, str) and isinstance(other, str)):
+        return False
+    return key.startswith(os.path.join(other, '')) or other.startswith(os.path.join(key, ''))
+
+
+class Operation:
+    def __init__(self, key, label, function, args, on_done, on_error):
+        self.key = key
+        self.label = label
+        self.function = function
+        self.args = args
+        self.on_done = on_done
+        self.on_error = on_error
+        self.started = False
+
+
+class IOExecutor:
+    # runs file operations in worker threads. The keys are paths: an operation starts once the ones submitted before it
+    # on the same path, on a path containing it or on a path it contains are done. So the operations of two profiles
+    # run side by side while those of the game directory wait for them. Completions and posted callbacks are run in
+    # the Tk thread by polling
+    def __init__(self, root, workers=4, on_status=None, on_error=None):
+        self.root = root
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='savemanager-io')
+        self.completed = queue.Queue()
+        self.on_status = on_status  # called with the status text
+        self.on_error = on_error  # called with (label, exception) when the operation has no error callback
+
+        self.operations = []  # the operations not done yet, in submission order
+        self.pending = 0
+        self.running = 0
+        self.poll_id = None
+        self.schedule(IDLE_POLL_MS)
+
+    def submit(self, key, label, function, *args, on_done=None, on_error=None):
+        operation = Operation(key, label, function, args, on_done, on_error)
+        self.operations.append(operation)
+        self.pending += 1
+        self._start_ready()
+        self._notify()
+        self.schedule(BUSY_POLL_MS)
+        return operation
+
+    def post(self, callback, *args):
+        # can be called from any thread, the callback is run in the Tk thread
+        self.completed.put((None, None, callback, args))
+
+    def busy(self, key=None):
+        if key is None:
+            return bool(self.pending or self.running)
+        return any(conflict(operation.key, key) for operation in self.operations)
+
+    def wait(self, key=None):
+        # blocks the Tk thread until the operations are done, used before leaving
+        while self.busy(key):
+            self.process(block=True)
+
+    def shutdown(self):
+        self.wait()
+        self.pool.shutdown()
+        if self.poll_id is not None:
+            self.root.after_cancel(self.poll_id)
+            self.poll_id = None
+
+    def schedule(self, delay):
+        if self.poll_id is not None:
+            if delay == IDLE_POLL_MS:
+                return
+            self.root.after_cancel(self.poll_id)
+        self.poll_id = self.root.after(delay, self.poll)
+
+    def poll(self):
+        self.poll_id = None
+        self.process()
+        self.schedule(BUSY_POLL_MS if self.busy() else IDLE_POLL_MS)
+
+    def process(self, block=False):
+        while True:
+            try:
+                key, operation, callback, result = self.completed.get(block=block, timeout=0.05 if block else None)
+            except queue.Empty:
+                return
+            block = False
+
+            if operation is None:
+                callback(*result)
+                continue
+
+            self.running -= 1
+            self.operations.remove(operation)
+            self._start_ready()
+            self._notify()
+
+            if isinstance(result, BaseException):
+                if operation.on_error is not None:
+                    operation.on_error(result)
+                elif self.on_error is not None:
+                    self.on_error(operation.label, result)
+            elif operation.on_done is not None:
+                operation.on_done(result)
+
+    def _start_ready(self):
+        for i, operation in enumerate(self.operations):
+            if not operation.started and not any(conflict(other.key, operation.key) for other in self.operations[:i]):
+                operation.started = True
+                self.pending -= 1
+                self.running += 1
+                self.pool.submit(self._run, operation.key, operation)
+
+    def _run(self, key, operation):
+        try:
+            if recorder.enabled:
+                with recorder.span(operation.label, 'io'):
+                    result = operation.function(*operation.args)
+            else:
+                result = operation.function(*operation.args)
+        except Exception as error:
+            result = error
+        self.completed.put((key, operation, None, result))
+
+    def _notify(self):
+        if self.on_status is None:
+            return
+        if not self.running and not self.pending:
+            self.on_status('')
+            return
+        labels = [operation.label for operation in self.operations if operation.started]
+        text = ', '.join(labels)
+        if self.pending:
+            text += f' ({self.pending} pending)'
+        self.on_status(text)
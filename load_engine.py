@@ -0,0 +1,62 @@
+# -*- coding:Utf-8 -*-
+
+import os
+import time
+
+from fastcopy import copy_file
+from hashing import cached_digest, file_digest, remember_digest, stat_key
+from instrumentation import recorder
+from snapshot_codec import decompress_file, read_header
+
+
+class LoadEngine:
+    # copies snapshots into the live save slot, skipping the write when the slot already holds the same bytes.
+    # Compressed snapshots are decompressed on the fly into the slot
+    def __init__(self):
+        self._last_load = None  # (source path, source stat key, live save stat key) right after the last write
+
+    def load(self, src, dst, resolve=None):
+        # resolve gives the path of a stored snapshot from its digest, for the deltas
+        start = time.perf_counter()
+        copied = self._load(src, dst, resolve)
+        return copied, time.perf_counter() - start
+
+    def _load(self, src, dst, resolve):
+        src_st = os.stat(src)
+        try:
+            dst_st = os.stat(dst)
+        except FileNotFoundError:
+            dst_st = None
+
+        header = read_header(src)
+        if dst_st is not None and self.is_loaded(src, src_st, dst, dst_st, header):
+            return False
+
+        if header is None:
+            size = copy_file(src, dst)
+        else:
+            size = decompress_file(src, dst, resolve)
+        if recorder.enabled:
+            recorder.add_bytes(size)
+
+        dst_st = os.stat(dst)
+        self._last_load = os.path.abspath(src), stat_key(src_st), stat_key(dst_st)
+        digest = cached_digest(src, src_st) if header is None else header.digest
+        if digest is not None:
+            remember_digest(dst, digest, dst_st)
+        return True
+
+    def wrote(self, key):
+        # True when the stat key is the one of the live save right after the last load
+        return self._last_load is not None and self._last_load[2] == key
+
+    def is_loaded(self, src, src_st, dst, dst_st, header=None):
+        if self._last_load == (os.path.abspath(src), stat_key(src_st), stat_key(dst_st)):
+            return True
+        if header is not None:
+            return header.size == dst_st.st_size and header.digest == file_digest(dst, dst_st)
+        if src_st.st_size != dst_st.st_size:
+            return False
+        if (src_st.st_dev, src_st.st_ino) == (dst_st.st_dev, dst_st.st_ino):
+            return True
+        return file_digest(src, src_st) == file_digest(dst, dst_st)
@@ -7,7 +7,12 @@ from configparser import ConfigParser
 from glob import iglob
 from shutil import copyfile, rmtree
 from tkinter import ttk
-from tkinter.messagebox import askokcancel
+from tkinter.messagebox import askokcancel, showerror
+
+from snapshot_store import SnapshotStore
+from text_metrics import MeasureCache
+
+STORE_DIRECTORY = '.savestore'
 
 
 def read_configs():
@@ -17,6 +22,17 @@ def read_configs():
     return cfg
 
 
+def unsupported_options(cfg):
+    # this window copies the saves as they are, it cannot read compressed snapshots or deltas
+    main = cfg['Main']
+    options = []
+    if main.get('compression', fallback='none') != 'none':
+        options.append('compression')
+    if main.getboolean('delta_saves', fallback=False):
+        options.append('delta_saves')
+    return options
+
+
 class App(tk.Tk):
 
     def __init__(self, cfg, *args, **kwargs):
@@ -37,6 +53,7 @@ class App(tk.Tk):
         )
 
         self.font1 = default_font
+        self.measure_cache = MeasureCache()
 
         style = ttk.Style()
         ttk.Style().configure('B.TButton', foreground='black', justify='left', font=default_font)
@@ -133,7 +150,7 @@ class App(tk.Tk):
             for key, value in self.profiles.items():
                 style = value['style']
                 font = self.root.font1
-                measure = font.measure(key)
+                measure = self.root.measure_cache.measure(font, key)
                 ref = max(measure, ref)
                 measuring[key] = measure
 
@@ -212,6 +229,11 @@ class App(tk.Tk):
             self.saves_path = os.path.normpath(self.ds_path + '\\' + cfg['Main']['profile'])
             if not os.path.exists(self.saves_path):
                 os.mkdir(self.saves_path)
+
+            if cfg['Main'].getboolean('deduplicate_saves', fallback=False):
+                self.store = SnapshotStore(os.path.join(self.ds_path, STORE_DIRECTORY))
+            else:
+                self.store = None
             
             self.entry = self.import_button = self.buttons = self.txt_var = self.label = self.delete_button = None
 
@@ -365,7 +387,7 @@ class App(tk.Tk):
             for key, value in self.buttons.items():
                 style = value['style']
                 font = self.root.font1
-                measure = font.measure(key)
+                measure = self.root.measure_cache.measure(font, key)
                 ref = max(measure, ref)
                 measuring[key] = measure
             return measuring, ref
@@ -491,7 +513,10 @@ class App(tk.Tk):
         def delete_save(self, name):
             self.destroy_button(name)
             self.reinit_widgets()
-            os.remove(self.saves_path + f'\\{name}.sl2')
+            if self.store is None:
+                os.remove(self.saves_path + f'\\{name}.sl2')
+            else:
+                self.store.remove(self.saves_path + f'\\{name}.sl2')
             self.state = 'default'
             self.txt_var.set('')
 
@@ -552,7 +577,10 @@ class App(tk.Tk):
                 self.reinit_widgets()
 
         def _import_save(self, asname):
-            copyfile(self.ds_path + '\\' + self.base_save_name + '.sl2', self.saves_path + f'\\{asname}.sl2')
+            if self.store is None:
+                copyfile(self.ds_path + '\\' + self.base_save_name + '.sl2', self.saves_path + f'\\{asname}.sl2')
+            else:
+                self.store.add(self.ds_path + '\\' + self.base_save_name + '.sl2', self.saves_path + f'\\{asname}.sl2')
         
         def switch_to(self, game):
             cfg = self.root.cfg
@@ -565,6 +593,12 @@ class App(tk.Tk):
 
 if __name__ == "__main__":
     cfg = read_configs()
+    unsupported = unsupported_options(cfg)
+    if unsupported:
+        tk.Tk().withdraw()
+        showerror('Save Manager', f'{" and ".join(unsupported)} in config.ini need main2.py, '
+                                  f'this window would copy the compressed saves into the game as they are')
+        raise SystemExit(1)
     root = App(cfg)
     if cfg['Main']['profile'] != 'no profile':
         root.create_profile_window()
@@ -3,18 +3,32 @@
 import os
 import tkinter as tk
 import tkinter.font
-from configparser import ConfigParser
+import zipfile
 from glob import iglob
-from shutil import copyfile, rmtree
+from shutil import rmtree
 from tkinter import ttk
-from tkinter.messagebox import askokcancel
+from tkinter.filedialog import askdirectory, askopenfilename, asksaveasfilename
+from tkinter.messagebox import askokcancel, showwarning
 
-def read_configs():
-    cfg = ConfigParser()
-    cfg.read('config.ini', encoding='utf8')
-
-    return cfg
+from auto_snapshot import AutoSnapshotter, auto_name
+from dir_index import DirectoryIndex
+from fs_watcher import DirectoryWatcher
+from instrumentation import instrumented, recorder
+from integrity import verify_profiles
+from io_worker import IOExecutor
+from load_engine import LoadEngine
+from name_filter import NameFilter
+from order_manifest import split_number
+from profile_archive import archive_saves, archive_stem, export_profile, import_archive
+from quota import QuotaManager
+from save_core import (CONFIG_PATH, NO_PROFILE, Game, Profile as ProfileModel, Settings, config_text, export_snapshots, import_profile,
+                       load_snapshot, read_config, recompress_profiles, write_config_text)
+from sl2_parser import MetadataCache
+from snapshot_store import STORE_DIRECTORY, SnapshotStore
+from text_metrics import MaxTracker, MeasureCache
+from virtual_list import VirtualList
 
+ARCHIVE_TYPES = [('Archives', '*.zip *.tar *.tar.gz *.tgz *.tar.bz2 *.tar.xz'), ('All files', '*')]
 
 class App(tk.Tk):
 
@@ -22,12 +36,27 @@ class App(tk.Tk):
         super().__init__(*args, **kwargs)
         
         self.cfg = cfg
+        self.config_interval = cfg['Main'].getfloat('config_write_interval', fallback=1.0)
+        self.config_flush_id = None  # set while a write of config.ini is waiting
+        recorder.resize(cfg['Main'].getint('instrumentation_buffer', fallback=1000))
+        self.recording = tk.BooleanVar(self, cfg['Main'].getboolean('instrumentation', fallback=False))
+        if self.recording.get():  # before the widgets are created, they take the interpreter of the root
+            recorder.enable(self)
         self.current_profile = None
         self.change_profile_menu = None
 
-        self.game = cfg['Main']['game']
+        self.settings = self.game = self.ds_path = self.quota = None
+        self.quotas = dict()  # ds_path -> QuotaManager, kept when switching the game
+        self.quota_queued = set()  # ds_paths whose quota enforcement is queued
+        self.quota_again = set()  # ds_paths whose usage changed while it was measured
+        self.load_engine = LoadEngine()
+        self.dir_index = DirectoryIndex()
+        self.models = dict()  # path -> the ItemDirectory last opened for it, reused while operations are queued for the game
+        self.io_status = tk.StringVar(self)
+        self.io = IOExecutor(self, on_status=self.io_status.set, on_error=self.io_failed)
+        self.protocol('WM_DELETE_WINDOW', self.close)
 
-        self.title('Save Manager ' + self.game)
+        self.load_game()
         self.iconbitmap(r'.\icon.ico')
 
         default_font = tk.font.Font(
@@ -36,15 +65,109 @@ class App(tk.Tk):
         )
 
         self.font1 = default_font
+        self.measure_cache = MeasureCache()
 
         style = ttk.Style()
         ttk.Style().configure('B.TButton', foreground='black', justify='left', font=default_font)
         ttk.Style().configure('FOCUS.TButton', foreground='#100000', justify='left', font=('Consolas', 8, 'bold italic'))
+        ttk.Style().configure('SEL.TButton', foreground='#000090', justify='left', font=('Consolas', 8, 'bold'))
         self.car_width = self.font1.measure(' ')
 
         ttk.Style().configure('G.TLabel', foreground='#009000', justify='left', font=('Consolas', 9, 'italic'))
         ttk.Style().configure('R.TLabel', foreground='red', justify='left', font=('Consolas', 9, 'italic'))
 
+    def load_game(self):
+        # the settings of the configured game. The directory index, the load engine and the I/O worker are shared by the games
+        self.settings = Settings(self.cfg)  # the options shared with the command line
+        self.game = self.settings.game
+        self.ds_path = self.settings.ds_path
+        self.quota = self.quotas.get(self.ds_path)
+        if self.quota is None:
+            self.quota = self.quotas[self.ds_path] = QuotaManager(self.ds_path, self.settings.quota, self.settings.quota_evicts_auto_snapshots)
+        self.title('Save Manager ' + self.game)
+
+    @instrumented()
+    def switch_game(self, game):
+        # only the frame is rebuilt, the operations queued for the other game go on in the I/O worker
+        self.cfg['Main']['game'] = game
+        self.cfg['Main']['profile'] = NO_PROFILE
+        self.save_config()
+
+        self.unbind('<FocusIn>')
+        if self.current_profile is not None:
+            self.current_profile.destroy()
+            self.current_profile = None
+        if self.change_profile_menu is not None:
+            self.change_profile_menu.destroy()
+            self.change_profile_menu = None
+
+        self.load_game()
+        self.create_change_profile_menu()
+        self.bind('<FocusIn>', self.change_profile_menu.focus2entry)
+        self.enforce_quota()
+
+    def open_game(self):
+        # the model of the profiles, its file operations are queued after the ones of every profile
+        return self.open_model(self.ds_path, lambda: Game(self.settings, self.dir_index, self.queue(self.ds_path), self.load_engine,
+                                                          self.quota))
+
+    def open_profile(self, name):
+        # the operations of a profile only wait for the ones of the profile and of the whole game
+        path = os.path.join(self.ds_path, name + '.profile')
+        return self.open_model(path, lambda: ProfileModel(self.open_game(), name, self.queue(path)))
+
+    def open_model(self, path, make):
+        # the listing misses the operations still queued, the model that queued them already has their names
+        model = self.models.get(path)
+        if model is None or model.settings is not self.settings or not self.io.busy(path):
+            model = self.models[path] = make()
+        return model
+    
+    def queue(self, key):
+        # the frame that shows the model is laid out again after the callbacks of its operations
+        def run(label, function, *args, on_done=None):
+            def done(result):
+                on_done(result)
+                frame = self.current_profile or self.change_profile_menu
+                if frame is not None and frame.items_path == key:
+                    frame.reinit_widgets()
+            self.io.submit(key, label, function, *args, on_done=None if on_done is None else done,
+                           on_error=lambda error: self.model_failed(label, error))
+        return run
+    
+    def io_failed(self, label, error):
+        self.io_status.set(f'{label} failed: {error}')
+
+    def model_failed(self, label, error):
+        # the models change their names before their operations are done: the list shown is read again from the disk
+        # and the other models are opened again
+        self.io_failed(label, error)
+        frame = self.current_profile or self.change_profile_menu
+        self.models = {path: model for path, model in self.models.items() if frame is not None and model is frame.model}
+        if frame is not None:
+            frame.txt_var.set(f'{label} failed: {error}')
+            frame.label['style'] = 'R.TLabel'
+            frame.check_items(None)
+
+    def save_config(self):
+        # config.ini is written at most once per interval with the last settings, and when leaving
+        if self.config_flush_id is None:
+            self.config_flush_id = self.after(int(self.config_interval * 1000), self.flush_config)
+
+    def flush_config(self):
+        if self.config_flush_id is None:
+            return
+        self.after_cancel(self.config_flush_id)
+        self.config_flush_id = None
+        self.io.submit(CONFIG_PATH, 'saving the settings', write_config_text, config_text(self.cfg))
+
+    def close(self):
+        # the queued file operations are finished before leaving
+        self.flush_config()
+        self.io.shutdown()
+        recorder.disable()
+        self.destroy()
+
     def destroy_profile(self):
         self.unbind('<FocusIn>')
         self.current_profile.destroy()
@@ -61,21 +184,141 @@ class App(tk.Tk):
     def create_change_profile_menu(self):
         self.change_profile_menu = ChangeProfileMenu(self, self.cfg)
 
+    @instrumented()
     def change_to_profile(self, name):
+        path = os.path.join(self.ds_path, name)
+        if path not in self.models and self.io.busy(path):
+            # it may be created or renamed by a queued operation, it is read once they are done
+            game = self.open_game()
+            self.io.submit(path, f'opening "{name[:-len(".profile")]}"', ProfileModel, game, name[:-len('.profile')], self.queue(path),
+                           on_done=lambda model: self.profile_opened(name, model))
+            return
         self.cfg['Main']['profile'] = name
-        with open('config.ini', 'w', encoding='utf8') as configfile:
-            self.cfg.write(configfile)
+        self.settings.profile = name
+        self.save_config()
 
         self.change_profile_menu.destroy()
         self.change_profile_menu = None
 
         self.create_profile_window()
 
+    def profile_opened(self, name, model):
+        if self.change_profile_menu is None or model.settings is not self.settings:  # left meanwhile
+            return
+        self.models[model.path] = model
+        self.change_to_profile(name)
+
     def remove_former_profiles(self):
         response = askokcancel('Clean former profiles', 'Are you sure you want to delete the backups of deleted profiles?')
         if response:
-            for former_profile_path in iglob(self.change_profile_menu.items_path + '\\*.formerprofile'):
-                rmtree(former_profile_path)
+            # the store is locked while collected, the profiles that link snapshots meanwhile wait for it
+            ds_path = self.change_profile_menu.ds_path
+            for former_profile_path in iglob(os.path.join(ds_path, '*.formerprofile')):
+                self.io.submit(former_profile_path, 'cleaning former profiles', rmtree, former_profile_path)
+            if self.settings.deduplicate:
+                store = SnapshotStore(os.path.join(ds_path, STORE_DIRECTORY))
+                self.io.submit(store.root_path, 'collecting snapshots', store.collect)
+
+    def enforce_quota(self, key=None):
+        # the usage is measured once the operations queued on the key are done, the game directory by default. It is
+        # measured on its own key, the operations queued on the profiles meanwhile do not wait for it
+        if self.quota.budget > 0:
+            self.io.submit(self.ds_path if key is None else key, 'enforcing the storage quota', tuple,
+                           on_done=lambda _, quota=self.quota: self.measure_quota(quota))
+
+    def measure_quota(self, quota):
+        if quota.ds_path in self.quota_queued:  # measured again once it is done
+            self.quota_again.add(quota.ds_path)
+            return
+        self.quota_queued.add(quota.ds_path)
+        self.io.submit((quota.ds_path, 'quota'), 'enforcing the storage quota', quota.enforce,
+                       on_done=lambda result: self.quota_enforced(quota, *result))
+
+    def quota_enforced(self, quota, evicted, planned):
+        # the auto-snapshots are deleted by the models of their profiles, the usage is measured again once it is done
+        self.quota_queued.discard(quota.ds_path)
+        if planned and quota is self.quota:
+            count = len(evicted)
+            for profile, names in planned.items():
+                if not os.path.isdir(os.path.join(self.ds_path, profile + '.profile')):  # deleted meanwhile
+                    continue
+                model = self.open_profile(profile)
+                names = [name for name in names if name in model.order]
+                if names:
+                    model.delete(*names)
+                    evicted.extend(names)
+                    if self.current_profile is not None and self.current_profile.model is model:
+                        self.current_profile.reinit_widgets()
+            if len(evicted) > count:
+                self.quota_again.discard(quota.ds_path)
+                self.enforce_quota()
+        if quota.ds_path in self.quota_again:
+            self.quota_again.discard(quota.ds_path)
+            self.measure_quota(quota)
+        if evicted:
+            self.io_status.set(f'storage quota: {len(evicted)} removed, {quota.usage / (1 << 20):.0f} MB used '
+                               f'of {quota.budget / (1 << 20):.0f} MB')
+
+    def compress_saves(self):
+        # rewrites every snapshot with the configured compression, or raw when it is none. The linked copies of a snapshot
+        # are spread over the profiles and the store of the game, it waits for the operations of every profile
+        ds_path = self.change_profile_menu.ds_path
+        def progress(done, total):
+            self.io.post(self.io_status.set, f'compressing the saves ({done}/{total})')
+        def done(saved):
+            self.io_status.set(f'compression done, {saved / 1e6:.1f} MB saved')
+        # the integrity indexes of the open profiles are updated in place, the loads queued meanwhile check the new files
+        indexes = {path: model.integrity for path, model in self.models.items() if model.integrity is not None}
+        self.io.submit(ds_path, 'compressing the saves', recompress_profiles, ds_path, self.settings.compression, self.settings.compression_level, None,
+                       progress, indexes, on_done=done)
+
+    def verify_profiles(self):
+        # hashes every save in parallel, the ones that did not change since they were last hashed are not read again
+        ds_path = self.change_profile_menu.ds_path
+        def progress(done, total):
+            self.io.post(self.io_status.set, f'verifying the saves ({done}/{total})')
+        def done(problems):
+            if not problems:
+                self.io_status.set('verification done, no damaged save')
+                return
+            self.io_status.set(f'verification done, {len(problems)} damaged saves')
+            lines = [f'{profile}: "{name}" {problem}' for profile, name, problem in problems[:20]]
+            if len(problems) > 20:
+                lines.append(f'and {len(problems) - 20} more')
+            showwarning('Damaged saves', '\n'.join(lines))
+        # only reads the saves, the other operations of the game go on meanwhile
+        self.io.submit((ds_path, 'verify'), 'verifying the saves', verify_profiles, ds_path, None, progress, on_done=done)
+
+    def toggle_recording(self):
+        if self.recording.get():
+            recorder.enable(self)
+        else:
+            recorder.disable()
+
+    def show_operations(self):
+        # the kinds of operations by total time, then the recorded operations from the last one
+        window = tk.Toplevel(self)
+        window.title('Recorded operations')
+        text = tk.Text(window, width=110, height=40, font=self.font1)
+        text.pack(fill='both', expand=True)
+
+        lines = [f'{"operation":<50} {"count":>6} {"total ms":>10} {"max ms":>10}']
+        for name, (count, total, longest) in sorted(recorder.summary().items(), key=lambda item: -item[1][1]):
+            lines.append(f'{name[:50]:<50} {count:>6} {total / 1e6:>10.1f} {longest / 1e6:>10.1f}')
+        lines.append('')
+        lines.append(f'{"operation":<50} {"thread":<20} {"ms":>10} {"bytes":>12} {"fs":>6} {"tk":>6}')
+        for span in reversed(recorder.spans):
+            lines.append(f'{span.name[:50]:<50} {span.thread[:20]:<20} {span.duration / 1e6:>10.2f} {span.bytes:>12} '
+                         f'{span.fs_calls:>6} {span.tk_calls:>6}')
+        text.insert('1.0', '\n'.join(lines))
+        text.configure(state='disabled')
+
+    def export_trace(self):
+        path = asksaveasfilename(title='Export the trace', initialfile='savemanager-trace.json', defaultextension='.json',
+                                 filetypes=[('Chrome trace', '*.json')])
+        if path:
+            recorder.export_chrome_trace(path)
+            self.io_status.set(f'{len(recorder.spans)} operations written to {os.path.basename(path)}')
 
 
 
@@ -93,68 +336,105 @@ class BaseFrame(tk.Frame):
         game = self.root.game
         self.game = game        
     
-        self.sorting_type = cfg['Main']['sorting_type']
-        self.auto_renumber = cfg['Main'].getboolean('automatically_renumber')
+        settings = self.root.settings
+        self.visible_rows = cfg['Main'].getint('visible_rows', fallback=30)
+        self.model = None  # the ItemDirectory of the items, it keeps their order and does the file operations
+        self.watch_interval = cfg['Main'].getfloat('watch_interval', fallback=1.0)
+        self.watcher = None
+        self.unchecked = set()  # names reported by the watcher and not checked yet, None for every item
+        self.checking = False
     
         self.reorganization_focus = ''
+        self.selection = set()  # names selected with ctrl and shift clicks, for the batch operations
+        self.selection_anchor = None  # where the next shift-click range starts
         
         
-        if game == 'ds1':
-            self.ds_path = os.path.normpath(cfg['Main']['ds1_path'])
-        elif game == 'ds3':
-            self.ds_path = os.path.normpath(cfg['Main']['ds3_path'])
-        
-        
+        self.ds_path = settings.ds_path
         self.items_path = self.ds_path
         
-        self.entry = self.new_item_button = self.buttons = self.txt_var = self.label = self.delete_button = None
+        self.entry = self.new_item_button = self.items = self.list_view = self.txt_var = self.label = self.delete_button = None
+        self.widths = MaxTracker()  # widths of the items, to align them on the widest one
+        self.name_filter = None  # index of the names, made when the filter is first used
+        self.filter_text = ''  # only the items containing it are shown
         
         self.state = 'default'
     
     def focus2entry(self, _=None):
         self.entry.focus_set()
     
-    def sort_buttons(self):
-        if self.sorting_type == 'alphabetical':
-            self.buttons = dict(sorted(self.buttons.items(), key=lambda pair: pair[0]))
+    @property
+    def order(self):
+        return self.model.order
     
-    def init_widgets(self):#
-        self.buttons = dict()
-    
-        i = 0
-        suffix = self.suffix
-        for i, path in enumerate(iglob(self.items_path + r'\*' + suffix)):
-            i += 1
-            path = os.path.normpath(path)
-            name = path.split('\\')[-1].replace(suffix, '')
-            
-            button = ttk.Button(self, text=name, command=self.define_callback(name), style='B.TButton')
-            self.buttons[name] = button
-            button.grid(column=0, row=i, sticky='w')
+    @property
+    def manifest(self):
+        return self.model.manifest
     
-        self.sort_buttons()
+    def open_model(self):
+        raise NotImplementedError
+    
+    def item_path(self, name):
+        return os.path.join(self.items_path, name + self.suffix)
+
+    def run_io(self, label, function, *args, on_done=None, on_error=None):
+        # the file operations of the listed directory run in the I/O worker, one after the other
+        def done(result):
+            if on_done is not None and self.winfo_exists():
+                on_done(result)
+        def failed(error):
+            if self.winfo_exists():
+                on_error(error)
+            else:
+                self.root.io_failed(label, error)
+        self.root.io.submit(self.items_path, label, function, *args, on_done=done, on_error=None if on_error is None else failed)
+    
+    @instrumented()
+    def init_widgets(self):#
+        self.items = dict()  # name -> measured width of its name without display number
+    
+        stale = self.root.io.busy(self.items_path)  # the files are listed again once the queued operations are done
+        self.model = self.open_model()
+        self.model.listener = self.names_changed
+        self.root.measure_cache.fit(len(self.order))
+        for name in self.order:
+            self.items[name] = self.measure_item(name)
+        self.widths = MaxTracker(self.items.values())
+        self.name_filter = None
+        self.filter_text = ''
+        self.selection = set()
+        self.selection_anchor = None
     
         self.txt_var = tk.StringVar(self)
         self.label = ttk.Label(self, textvariable=self.txt_var)
         self.label.grid(column=0, row=0, columnspan=2)
     
+        self.list_view = VirtualList(self, self.visible_rows, self.activate, self.item_text, self.item_style, self.drop_item, self.select_item)
+        self.list_view.grid(column=0, row=1, columnspan=2, sticky='w')
+    
         self.entry = tk.Entry(self, width=28)
-        self.entry.grid(column=0, row=i + 2)
+        self.entry.grid(column=0, row=2)
+        self.list_view.bind_wheel(self.entry)
         self.entry.bind('<Return>', self.new_item)
+        self.entry.bind('<Control-Return>', self.move_item_to_entry_position)
         self.entry.bind('<Control-w>', self.deleting_state)
         self.entry.bind('<Control-Alt-r>', self.activate_reorganising_state)
         self.entry.bind('<F2>', self.activate_renaming_state)
         self.entry.bind('<Up>', self.move_item_up)
         self.entry.bind('<Down>', self.move_item_down)
-        self.entry.bind('<Escape>', self.stop_reorganising)
+        self.entry.bind('<Escape>', self.cancel)
+        self.entry.bind('<Control-f>', self.activate_filtering_state)
+        self.entry.bind('<KeyRelease>', self.filter_changed)
         
         self.focus2entry()
     
         self.new_item_button = ttk.Button(self, text=self.new_item_label, command=self.new_item)
-        self.new_item_button.grid(column=1, row=i + 2)
+        self.new_item_button.grid(column=1, row=2)
     
         self.delete_button = ttk.Button(self, text='Delete', command=self.deleting_state)
-        self.delete_button.grid(column=1, row=i + 3)
+        self.delete_button.grid(column=1, row=3)
+    
+        self.io_label = ttk.Label(self, textvariable=self.root.io_status)
+        self.io_label.grid(column=0, row=3)
     
         self.menubar = tk.Menu(self)
     
@@ -163,6 +443,7 @@ class BaseFrame(tk.Frame):
         self.menu1.add_command(label=self.new_item_label, command=self.new_item, accelerator='Enter')
         self.menu1.add_command(label='Delete', command=self.deleting_state, accelerator='Ctrl+w')
         self.menu1.add_command(label='Rename', command=self.activate_renaming_state, accelerator='F2')
+        self.menu1.add_command(label='Filter', command=self.activate_filtering_state, accelerator='Ctrl+f')
         
         
         self.game_switching_menu = tk.Menu(self.menu1, tearoff=0)
@@ -178,73 +459,157 @@ class BaseFrame(tk.Frame):
         
         self.menu2.add_command(label='Number', command=self.number_the_items)
         self.menu2.add_command(label='Reverse numbering', command=self.reverse_numbering)
+        if self.manifest is not None:
+            self.menu2.add_command(label='Write numbering to file names', command=self.export_numbering)
         
         self.menu2.add_command(label='Reorganise', command=self.activate_reorganising_state, accelerator='Ctrl-Alt-r')
+        self.menu2.add_command(label='Move focus to position', command=self.move_item_to_entry_position, accelerator='Ctrl+Enter')
         
         
+        self.menu5 = tk.Menu(self.menubar, tearoff=0)
+        self.menubar.add_cascade(label='Selection', menu=self.menu5)
+        self.menu5.add_command(label='Delete', command=self.delete_selection)
+        self.menu5.add_command(label='Clear', command=self.clear_selection, accelerator='Escape')
+        
         self.menu3 = tk.Menu(self.menubar, tearoff=0)
         self.menubar.add_cascade(label='Profile', menu=self.menu3)
+
+        self.menu4 = tk.Menu(self.menubar, tearoff=0)
+        self.menubar.add_cascade(label='Diagnostics', menu=self.menu4)
+        self.menu4.add_checkbutton(label='Record operations', variable=self.root.recording, command=self.root.toggle_recording)
+        self.menu4.add_command(label='Show recorded operations', command=self.root.show_operations)
+        self.menu4.add_command(label='Export trace', command=self.root.export_trace)
+        self.menu4.add_command(label='Clear', command=recorder.clear)
     
         self.root.configure(menu=self.menubar)
     
-        if self.sorting_type != 'default':
+        self.reinit_widgets()
+    
+        self.watcher = DirectoryWatcher(self.items_path, self.suffix, self.directory_changed, self.watch_interval)
+        self.watcher.start()
+        if stale:
+            self.check_items(None)
+    
+    def destroy(self):
+        if self.watcher is not None:
+            self.watcher.stop()
+            self.watcher = None
+        if self.model is not None:
+            self.model.listener = None
+        super().destroy()
+    
+    def directory_changed(self, names):
+        # called in the watcher thread
+        self.root.io.post(self.check_items, names)
+    
+    def check_items(self, names):
+        # the events are only hints, the files are checked after the queued operations of the directory.
+        # One check is queued at a time, the names reported meanwhile are checked by the next one
+        if names is None or self.unchecked is None:
+            self.unchecked = None
+        else:
+            self.unchecked |= names
+        if self.watcher is None or self.checking or self.unchecked == set():
+            return
+        names, self.unchecked = self.unchecked, set()
+        self.checking = True
+        self.run_io('refreshing the list', self.existing_items, self.watcher, names, on_done=lambda existing: self.apply_changes(names, existing))
+    
+    def existing_items(self, watcher, names):
+        if names is None:
+            return watcher.scan()
+        return {name for name in names if os.path.exists(self.item_path(name))}
+    
+    def apply_changes(self, names, existing):
+        self.checking = False
+        if self.root.io.busy(self.items_path):  # some operations were queued meanwhile
+            self.check_items(names)
+            return
+        if names is None:
+            names = existing | set(self.items)
+    
+        added = [name for name in names if name in existing and name not in self.items]
+        removed = [name for name in names if name not in existing and name in self.items]
+        for name in added:
+            self.model.add(name)
+        if removed:
+            self.model.discard(removed)
+        if added or removed:
+            self.model.save_order()
             self.reinit_widgets()
+        self.check_items(set())
 
+    def names_changed(self, renames, added, removed):
+        # called by the model: the widths, the selection, the filter and the focus follow its names.
+        # The renames are applied together, they can exchange two names
+        renamed = dict(renames)
+        removed = set(removed)
+        for name in [*removed, *renamed]:
+            self.widths.remove(self.items.pop(name))
+        if self.name_filter is not None:
+            for name in removed:
+                self.name_filter.remove(name)
+            self.name_filter.replace(list(renamed.items()))
+            for name in added:
+                if name not in self.items:
+                    self.name_filter.add(name)
+        for name in [*added, *renamed.values()]:
+            if name in self.items:  # overwritten
+                self.widths.remove(self.items[name])
+            self.items[name] = self.measure_item(name)
+            self.widths.add(self.items[name])
+    
+        if self.selection:
+            self.selection = {renamed.get(name, name) for name in self.selection if name not in removed}
+        if self.selection_anchor is not None:
+            self.selection_anchor = None if self.selection_anchor in removed else renamed.get(self.selection_anchor, self.selection_anchor)
+        if self.reorganization_focus:
+            self.reorganization_focus = '' if self.reorganization_focus in removed else renamed.get(self.reorganization_focus,
+                                                                                                    self.reorganization_focus)
+    
     def number_the_items(self):
-        new_dict = dict()
-        length = len(str(len(self.buttons)))
-        for i, (key, value) in enumerate(self.buttons.items()):
-            i += 1
-            button_name = '{:0>{}} '.format(i, length) + key
-            new_dict[button_name] = value
-            value['text'] = button_name
-            value['command'] = self.define_callback(button_name)
-            os.rename(self.items_path + f'\\{key}' + self.suffix, self.items_path + f'\\{button_name}' + self.suffix)
-    
-        self.buttons = new_dict
+        self.model.number()
         self.reinit_widgets()
     
+    @instrumented()
     def renumber_the_items(self):
-        new_dict = dict()
-        length = len(str(len(self.buttons)))
-        for i, (key, value) in enumerate(self.buttons.items()):
-            i += 1
-            try:
-                n, reversed_key = key.split(' ', 1)
-                if not n.isdecimal():
-                    reversed_key = key
-            except ValueError:
-                reversed_key = key
-            button_name = '{:0>{}} '.format(i, length) + reversed_key
-            new_dict[button_name] = value
-            value['text'] = button_name
-            value['command'] = self.define_callback(button_name)
-            os.rename(self.items_path + f'\\{key}' + self.suffix, self.items_path + f'\\{button_name}' + self.suffix)
-    
-        self.buttons = new_dict
+        self.model.renumber()
         self.reinit_widgets()
     
     def reverse_numbering(self):
-        new_dict = dict()
-        for key, value in self.buttons.items():
-            try:
-                n, button_name = key.split(' ', 1)
-            except ValueError:
-                n = ''
-            if n.isnumeric():
-                while button_name in new_dict:
-                    button_name += '\''
-                new_dict[button_name] = value
-                value['text'] = button_name
-                value['command'] = self.define_callback(button_name)
-                os.rename(self.items_path + f'\\{key}' + self.suffix, self.items_path + f'\\{button_name}' + self.suffix)
-            else:
-                new_dict[key] = value
-        
-        self.buttons = new_dict
+        self.model.reverse_numbering()
+        self.reinit_widgets()
+    
+    def export_numbering(self):
+        self.stop_reorganising()
+        self.model.export_numbering()
         self.reinit_widgets()
     
+    def display_name(self, position, name):
+        if self.manifest is None:
+            return name
+        return self.manifest.display_name(position, name)
+    
+    def measure_item(self, name):
+        # the display numbers all have the same width, so they are not part of the measure
+        if self.manifest is not None:
+            _, name = split_number(name)
+        return self.root.measure_cache.measure(self.root.font1, name)
+    
+    def item_text(self, position, name):
+        if self.filter_text:  # the position in the filtered list
+            position = self.order.position(name)
+        return self.display_name(position, name) + ((self.widths.max - self.items[name]) // self.root.car_width + 1) * ' '
+    
+    def item_style(self, name):
+        if name == self.reorganization_focus:
+            return 'FOCUS.TButton'
+        if name in self.selection:
+            return 'SEL.TButton'
+        return 'B.TButton'
+    
     def activate_reorganising_state(self, _=None):
+        self.stop_filtering()  # the items are moved in the whole list
         self.state = 'reorganising'
         self.txt_var.set('reorganising')
         self.label['style'] = 'G.TLabel'
@@ -254,18 +619,6 @@ class BaseFrame(tk.Frame):
         self.state = 'renaming'
         self.label['style'] = 'G.TLabel'
     
-    def adjust(self):
-        ref = 0
-        car_width = 0
-        measuring = dict()
-        for key, value in self.buttons.items():
-            style = value['style']
-            font = self.root.font1
-            measure = font.measure(key)
-            ref = max(measure, ref)
-            measuring[key] = measure
-        return measuring, ref
-    
     def rename_item(self, name):
         self.state = 'default'
         self.txt_var.set('')
@@ -273,55 +626,30 @@ class BaseFrame(tk.Frame):
         new_name = self.entry.get()
         if new_name:
             try:
-                n, _ = name.split(' ', 1)
-                if not n.isdecimal():
-                    raise ValueError
-            except ValueError:
-                pass
-            else:
-                new_name = n + ' ' + new_name
-            
-            try:
-                os.rename(self.items_path + f'\\{name}' + self.suffix, self.items_path + f'\\{new_name}' + self.suffix)
+                self.model.rename(name, new_name)
             except FileExistsError:
                 self.label['style'] = 'R.TLabel'
                 self.txt_var.set('this name already exists')
             else:
-                button = self.buttons[name]
-                self.buttons.pop(name)
-                self.buttons[new_name] = button
-    
-                button['text'] = new_name
-                button['command'] = self.define_callback(new_name)
-                if self.auto_renumber:
-                    self.sort_buttons()
-                    self.renumber_the_items()
-                else:
-                    self.reinit_widgets()
+                self.reinit_widgets()
     
             self.entry.delete(0, 'end')
         else:
             self.label['style'] = 'R.TLabel'
             self.txt_var.set('this entry should not be empty')
     
-    def define_callback(self, name):
-        def callback():
-            self.activate(name)
-        return callback
-    
     def deleting_state(self, _=None):#
         self.stop_reorganising()
         self.state = 'deleting'
         self.label['style'] = 'R.TLabel'
     
+    @instrumented()
     def activate(self, name): #
         if self.state == 'deleting':
             self.delete_item(name)
         elif self.state == 'renaming':
             self.rename_item(name)
         elif self.state == 'reorganising':
-            if self.reorganization_focus:
-                self.buttons[self.reorganization_focus]['style'] = 'B.TButton'
             self.reorganization_focus = name
             self.focus_message()
         else:
@@ -332,43 +660,46 @@ class BaseFrame(tk.Frame):
     
     def focus_message(self):
         self.txt_var.set('focus is currently to "' + self.reorganization_focus + '"')
-        self.buttons[self.reorganization_focus]['style'] = 'FOCUS.TButton'
+        self.list_view.refresh()
+    
+    def moved(self, move, *args):
+        # the focused item is moved by the model, which refuses the moves that the numbering or the sort cannot follow
+        if not self.reorganization_focus:
+            return
+        try:
+            move(self.reorganization_focus, *args)
+        except ValueError as error:
+            self.label['style'] = 'R.TLabel'
+            self.txt_var.set(str(error))
+            return
+        self.reinit_widgets()
+        self.focus_message()
+        self.list_view.see(self.order.position(self.reorganization_focus))
     
+    @instrumented()
     def _move_item(self, indicator):
-        if self.reorganization_focus:
-            new_dict = dict()
-    
-            name = self.reorganization_focus
-            str_number, without_number_name = name.split(' ', 1)
-            number = int(str_number)
-            new_number = number + indicator
-            new_str_number = '{:0>{}}'.format(new_number, len(str_number))
-    
-            if len(self.buttons) + 1 > new_number > 0 :
-                for key, value in self.buttons.items():
-    
-                    str_number2, without_number_name2 = key.split(' ', 1)
-                    if str_number2 == new_str_number:
-                        new_name = f'{str_number2} {without_number_name}'
-                        new_name2 = f'{str_number} {without_number_name2}'
-    
-                        new_dict[new_name] = self.buttons[name]
-                        self.buttons[name]['command'] = self.define_callback(new_name)
-                        self.buttons[name]['text'] = new_name
-                        os.rename(self.items_path + f'\\{name}' + self.suffix, self.items_path + f'\\{new_name}' + self.suffix)
-    
-                        new_dict[new_name2] = value
-                        value['command'] = self.define_callback(new_name2)
-                        value['text'] = new_name2
-                        os.rename(self.items_path + f'\\{key}' + self.suffix, self.items_path + f'\\{new_name2}' + self.suffix)
-    
-                    elif str_number2 != str_number:
-                        new_dict[key] = value
-    
-                self.reorganization_focus = new_name
-                self.buttons = new_dict
-                self.focus_message()
-                self.reinit_widgets()
+        self.moved(self.model.swap, indicator)
+    
+    def move_item_to(self, position):
+        self.moved(self.model.move, position)
+    
+    def move_item_to_entry_position(self, _=None):
+        try:
+            position = int(self.entry.get()) - 1
+        except ValueError:
+            self.label['style'] = 'R.TLabel'
+            self.txt_var.set('type the new position of the focused item')
+            return
+        self.entry.delete(0, 'end')
+        self.move_item_to(position)
+    
+    def drop_item(self, name, position):
+        # a click that ends on another row is not a move, the items are dragged in the reorganising state only
+        if self.state != 'reorganising' or self.filter_text:
+            return
+        self.reorganization_focus = name
+        self.move_item_to(position)
+        self.focus_message()
     
     def move_item_up(self, _=None):
         self._move_item(-1)
@@ -380,54 +711,109 @@ class BaseFrame(tk.Frame):
         self.state = 'default'
         self.txt_var.set('')
         if self.reorganization_focus:
-            self.buttons[self.reorganization_focus]['style'] = 'B.TButton'
             self.reorganization_focus = ''
             self.txt_var.set('')
+            self.list_view.refresh()
     
     def delete_item(self, name):
-        self.destroy_button(name)
-        self.reinit_widgets()
-                
+        self.delete_items([name])
+    
+    def delete_items(self, names):
+        # the files are removed by one operation, the list is renumbered or laid out once
+        self.model.delete(*names)
         self.state = 'default'
         self.txt_var.set('')
+        self.reinit_widgets()
     
-        if self.auto_renumber:
-            self.renumber_the_items()
-    
-    def destroy_button(self, name):
-        self.buttons[name].grid_forget()
-        self.buttons.pop(name)
-    
+    @instrumented()
     def reinit_widgets(self):
-        self.sort_buttons()
-        measuring, ref = self.adjust()
-    
-        i = 0
-        for i, (key, button) in enumerate(self.buttons.items()):
-            i += 1
-            button['text'] = key + ((ref - measuring[key]) // self.root.car_width + 1) * ' '
+        # the texts are computed when a row is displayed, so only the visible rows that changed are touched
+        self.list_view.set_items(self.visible_names())
+    
+    def visible_names(self):
+        # the matches of the filter are put back in display order, without going through the whole list
+        if not self.filter_text:
+            return self.order.names
+        return sorted(self.name_filter.matches(self.filter_text), key=self.order.position)
+    
+    def activate_filtering_state(self, _=None):
+        if self.name_filter is None:
+            self.name_filter = NameFilter(self.items)
+        self.stop_reorganising()
+        self.state = 'filtering'
+        self.entry.delete(0, 'end')
+        self.entry.insert(0, self.filter_text)
+        self.txt_var.set('type to filter, Enter to load the first item, Escape to show everything')
+        self.label['style'] = 'G.TLabel'
     
-            button.grid_forget()
-            button.grid(column=0, row=i, sticky='w')
+    def filter_changed(self, _=None):
+        if self.state != 'filtering':
+            return
+        text = self.entry.get()
+        if text != self.filter_text:
+            self.filter_text = text
+            self.reinit_widgets()
+            self.list_view.scroll_to(0)
     
-        self.label.grid_forget()
-        self.label.grid(column=0, row=0, columnspan=2)
+    def stop_filtering(self):
+        if self.state == 'filtering':
+            self.state = 'default'
+            self.entry.delete(0, 'end')
+        if self.filter_text:
+            self.filter_text = ''
+            self.reinit_widgets()
     
-        self.entry.grid_forget()
-        self.entry.grid(column=0, row=i + 2)
+    def cancel(self, _=None):
+        self.stop_filtering()
+        self.stop_reorganising()
+        self.clear_selection()
+    
+    def select_item(self, name, mode):
+        # a ctrl-click toggles an item, a shift-click selects the items shown between the previous click and this one
+        if self.state != 'filtering':
+            self.stop_reorganising()
+        if mode == 'range' and self.selection_anchor in self.items:
+            start, stop = sorted((self.order.position(self.selection_anchor), self.order.position(name)))
+            if self.filter_text:
+                self.selection.update(other for other in self.visible_names() if start <= self.order.position(other) <= stop)
+            else:
+                self.selection.update(self.order.names[start:stop + 1])
+        elif mode == 'toggle' and name in self.selection:
+            self.selection.discard(name)
+        else:
+            self.selection.add(name)
+        self.selection_anchor = name
+        self.selection_message()
+        self.list_view.refresh()
+    
+    def selection_message(self):
+        if self.selection:
+            self.txt_var.set(f'{len(self.selection)} selected, see the Selection menu')
+            self.label['style'] = 'G.TLabel'
+        else:
+            self.txt_var.set('')
     
-        self.new_item_button.grid_forget()
-        self.new_item_button.grid(column=1, row=i + 2)
+    def selected_names(self):
+        return sorted(self.selection, key=self.order.position)
     
-        self.delete_button.grid_forget()
-        self.delete_button.grid(column=1, row=i + 3)
+    def clear_selection(self):
+        self.selection_anchor = None
+        if self.selection:
+            self.selection = set()
+            self.selection_message()
+            self.list_view.refresh()
     
-    def new_button(self, name):
-        if name in self.buttons:
-            self.destroy_button(name)
-        self.buttons[name] = ttk.Button(self, text=name, command=self.define_callback(name), style='B.TButton')
+    def delete_selection(self):
+        names = self.selected_names()
+        if names and askokcancel('Delete', f'Are you sure you want to delete the {len(names)} selected items?'):
+            self.delete_items(names)
     
     def new_item(self, _=None):
+        if self.state == 'filtering':
+            names = self.visible_names()
+            if names:
+                self.load(names[0])
+            return
         self.stop_reorganising()
         self.state = 'default'
         name = self.entry.get()
@@ -438,40 +824,52 @@ class BaseFrame(tk.Frame):
             return
     
         self.txt_var.set('')
-        self._new_item(name)
-        self.new_button(name)
+        self.create_item(name)
         self.entry.select_range(0, 'end')
     
-        if self.auto_renumber:
-            self.renumber_the_items()
-        else:
-            self.reinit_widgets()
+    def create_item(self, name):
+        try:
+            self._new_item(name)
+        except FileExistsError:
+            self.label['style'] = 'R.TLabel'
+            self.txt_var.set('this name already exists')
+            return
+        self.reinit_widgets()
+        self.root.enforce_quota(self.items_path)
     
     def _new_item(self, asname):
         raise NotImplementedError
     
     
     def switch_to(self, game):
-        cfg = self.root.cfg
-        cfg['Main']['game'] = game
-        cfg['Main']['profile'] = 'no profile'
-        with open('config.ini', 'w', encoding='utf8') as configfile:
-            cfg.write(configfile)
-        os.system('launcher.cmd')
-        self.root.destroy()
+        self.root.switch_game(game)
     
     
 class Profile(BaseFrame):
     def __init__(self, root, cfg, *args, **kwargs):
         super().__init__(root, cfg, '.sl2', 'Import')
-        self.items_path = os.path.normpath(self.ds_path + '\\' + cfg['Main']['profile'])  # items are either profiles or saves
-        if not os.path.exists(self.items_path):
-            os.mkdir(self.items_path)    
+        self.profile_name = cfg['Main']['profile'][:-len('.profile')]
+        self.items_path = os.path.join(self.ds_path, cfg['Main']['profile'])  # items are either profiles or saves
         
-        self.base_save_name = {'ds1': 'DRAKS0005', 'ds3': 'DS30000'}[self.game]
+        self.live_save = self.root.settings.live_save
+        self.store = self.integrity = None  # those of the model: the snapshot store and the digests checked before loading
+        self.metadata = None  # characters of the saves, shown after their names
+        self.metadata_texts = dict()  # name -> text shown after the name
+        self.metadata_pending = set()  # names whose text is to be read
+        self.metadata_reading = set()  # names whose text is being read in the I/O worker
+        if cfg['Main'].getboolean('save_metadata', fallback=False):
+            self.metadata = MetadataCache(self.items_path)
         
         self.init_widgets()
         
+        self.auto_snapshot = None  # takes a snapshot when the game writes the live save
+        if cfg['Main'].getboolean('auto_snapshot', fallback=False):
+            self.auto_snapshot = AutoSnapshotter(self.live_save, self.auto_snapshot_changed, self.watch_interval,
+                                                 cfg['Main'].getfloat('auto_snapshot_debounce', fallback=2.0),
+                                                 cfg['Main'].getfloat('auto_snapshot_min_interval', fallback=60.0),
+                                                 self.root.load_engine.wrote)
+            self.auto_snapshot.start()
+        
         try:
             n, namewn = cfg['Main']['profile'].replace('.profile', '').split(' ', 1)
         except ValueError:
@@ -479,13 +877,88 @@ class Profile(BaseFrame):
         if not n.isnumeric():
             namewn = n + namewn
         self.root.title('"{}" in {}'.format(namewn, self.game))
+        if self.metadata is not None:  # forgets the saves that are gone
+            versions = [(entry.size, entry.mtime_ns) for entry in self.root.dir_index.entries(self.items_path, self.suffix).values()]
+            self.run_io('reading the saves', self.metadata.prune, versions)
 
             
+    def open_model(self):
+        return self.root.open_profile(self.profile_name)
+    
     def init_widgets(self):
         super().init_widgets()
+        self.store = self.model.store
+        self.integrity = self.model.integrity
         self.menu3.add_command(label='Change profile', command=self.destroy_, accelerator='Delete')
+        self.menu3.add_command(label='Export to an archive', command=self.export_archive)
+        self.menu3.add_command(label='Import from an archive', command=self.choose_archive)
         self.entry.bind('<Delete>', self.destroy_)
+        self.move_menu = tk.Menu(self.menu5, tearoff=0, postcommand=self.fill_move_menu)
+        self.menu5.add_cascade(label='Move to profile', menu=self.move_menu)
+        self.menu5.add_command(label='Export', command=self.export_selection)
+    
+    def fill_move_menu(self):
+        # the other profiles of the game, listed when the menu is opened
+        self.move_menu.delete(0, 'end')
+        current = os.path.basename(self.items_path)[:-len('.profile')]
+        for name in sorted(self.root.dir_index.entries(self.ds_path, '.profile')):
+            if name != current:
+                self.move_menu.add_command(label=name, command=lambda name=name: self.move_selection(name))
+    
+    def move_selection(self, profile):
+        # the saves are moved by one operation, the list is renumbered once
+        names = self.selected_names()
+        if not names:
+            return
+        self.model.move_to(profile, *names)
+        self.reinit_widgets()
+        self.txt_var.set(f'{len(names)} saves moved to "{profile}"')
+        self.label['style'] = 'G.TLabel'
     
+    def export_selection(self):
+        names = self.selected_names()
+        if not names:
+            return
+        directory = askdirectory(title='Export the selected saves')
+        if directory:
+            resolve = None if self.store is None else self.store.object_path
+            self.run_io(f'exporting {len(names)} saves', export_snapshots, [self.item_path(name) for name in names], directory, resolve)
+    
+    def export_archive(self):
+        name = os.path.basename(self.items_path)[:-len('.profile')]
+        path = asksaveasfilename(title='Export the profile', initialfile=name + '.zip', defaultextension='.zip', filetypes=[('Zip archive', '*.zip')])
+        if path:
+            resolve = None if self.store is None else self.store.object_path
+            self.run_io('exporting the profile', export_profile, self.items_path, path, resolve,
+                        on_done=lambda count: self.root.io_status.set(f'{count} files written to {os.path.basename(path)}'))
+
+    def choose_archive(self):
+        # the saves of a zip are listed from its central directory, one of them can be imported alone
+        path = askopenfilename(title='Import saves from an archive', filetypes=ARCHIVE_TYPES)
+        if not path:
+            return
+        if not zipfile.is_zipfile(path):
+            self.import_from_archive(path)
+            return
+        menu = tk.Menu(self, tearoff=0)
+        menu.add_command(label='Every save', command=lambda: self.import_from_archive(path))
+        menu.add_separator()
+        for name in archive_saves(path):
+            menu.add_command(label=name, command=lambda name=name: self.import_from_archive(path, name))
+        menu.tk_popup(self.winfo_pointerx(), self.winfo_pointery())
+
+    def import_from_archive(self, path, *names):
+        self.run_io(f'importing {os.path.basename(path)}', import_archive, self.root.settings, path, self.items_path, self.store, self.integrity,
+                    names or None, True, on_done=self.archive_imported)
+
+    def archive_imported(self, names):
+        # the list is renumbered or laid out once for every imported save
+        self.model.add_all(names)
+        self.reinit_widgets()
+        self.txt_var.set(f'{len(names)} saves imported')
+        self.label['style'] = 'G.TLabel'
+        self.root.enforce_quota(self.items_path)
+
     def activate_renaming_state(self, _=None):
         super().activate_renaming_state()
         self.txt_var.set('select a save to rename')
@@ -494,22 +967,92 @@ class Profile(BaseFrame):
         super().deleting_state()
         self.txt_var.set('select a save to delete')
     
+    @instrumented()
     def load(self, name):
-        self.txt_var.set(f'save "{name}" has been loaded')
+        resolve = None if self.store is None else self.store.object_path
+        self.run_io(f'loading "{name}"', load_snapshot, self.root.load_engine, self.item_path(name), self.live_save, resolve, self.integrity,
+                    on_done=lambda result: self.loaded(name, *result), on_error=self.load_failed)
+    
+    def item_text(self, position, name):
+        # the text of the metadata is read in the I/O worker the first time the item is shown
+        text = super().item_text(position, name)
+        if self.metadata is None:
+            return text
+        description = self.metadata_texts.get(name)
+        if description is None:
+            if name not in self.metadata_pending and name not in self.metadata_reading:
+                if not self.metadata_pending:
+                    self.after_idle(self.read_metadata)
+                self.metadata_pending.add(name)
+            return text
+        return text + description
+
+    def read_metadata(self):
+        # the names shown meanwhile are read together
+        names = [name for name in self.metadata_pending if name in self.items]
+        self.metadata_pending = set()
+        self.metadata_reading.update(names)
+        resolve = None if self.store is None else self.store.object_path
+        self.run_io('reading the saves', self.metadata.describe_saves, [self.item_path(name) for name in names], resolve,
+                    on_done=lambda texts: self.metadata_read(names, texts))
+
+    def metadata_read(self, names, texts):
+        for name in names:
+            self.metadata_reading.discard(name)
+            if name in self.items:  # an empty text when the save is gone, so it is not read again
+                self.metadata_texts[name] = texts.get(self.item_path(name), '')
+        self.list_view.refresh()
+
+    def names_changed(self, renames, added, removed):
+        # an overwritten save is read again
+        texts = self.metadata_texts
+        moved = [(new_name, texts.pop(name)) for name, new_name in renames if name in texts]
+        for name in (*added, *removed):
+            texts.pop(name, None)
+        texts.update(moved)
+        super().names_changed(renames, added, removed)
+    
+    def load_failed(self, error):
+        self.txt_var.set(f'not loaded: {error}')
+        self.label['style'] = 'R.TLabel'
+
+    def loaded(self, name, copied, duration):
+        if copied:
+            self.txt_var.set(f'save "{name}" has been loaded ({duration * 1000:.1f} ms)')
+        else:
+            self.txt_var.set(f'save "{name}" is already loaded ({duration * 1000:.1f} ms)')
         self.label['style'] = 'G.TLabel'
-        copyfile(self.items_path + f'\\{name}.sl2', self.ds_path + '\\' + self.base_save_name + '.sl2')        
+        budget = self.root.settings.load_budget
+        if duration > budget:
+            self.txt_var.set(self.txt_var.get() + f', over the {budget * 1000:.0f} ms budget')
+            self.label['style'] = 'R.TLabel'
         
+    @instrumented()
     def _new_item(self, asname):
-        copyfile(self.ds_path + '\\' + self.base_save_name + '.sl2', self.items_path + f'\\{asname}.sl2')
+        self.model.import_saves([(asname, None)])
         
+    def auto_snapshot_changed(self):
+        # called in the auto-snapshot thread
+        self.root.io.post(self.take_auto_snapshot)
+    
+    def take_auto_snapshot(self):
+        if self.auto_snapshot is None:
+            return
+        name = auto_name()
+        self.create_item(name)
+        if self.state == 'default':
+            self.txt_var.set(f'the game saved, snapshot "{name}" taken')
+            self.label['style'] = 'G.TLabel'
+    
+    def destroy(self):
+        if self.auto_snapshot is not None:
+            self.auto_snapshot.stop()
+            self.auto_snapshot = None
+        super().destroy()
+    
     def destroy_(self, _=None):
         self.root.destroy_profile()                
     
-    def delete_item(self, name):
-        super().delete_item(name)
-        os.remove(self.items_path + f'\\{name}' + self.suffix)
-
-    
 class ChangeProfileMenu(BaseFrame):
     def __init__(self, root, cfg, *args, **kwargs):
         super().__init__(root, cfg, '.profile', 'New', *args, **kwargs)
@@ -519,9 +1062,15 @@ class ChangeProfileMenu(BaseFrame):
         
         self.root.title('Change profile menu')
         
+    def open_model(self):
+        return self.root.open_game()
+    
     def init_widgets(self):
         super().init_widgets()
         self.menu3.add_command(label='Clean former profiles', command=self.root.remove_former_profiles)
+        self.menu3.add_command(label='Compress the saves', command=self.root.compress_saves)
+        self.menu3.add_command(label='Verify all profiles', command=self.root.verify_profiles)
+        self.menu3.add_command(label='Import a profile', command=self.import_archive)
         
     def activate_renaming_state(self, _=None):
         super().activate_renaming_state()
@@ -531,30 +1080,52 @@ class ChangeProfileMenu(BaseFrame):
         super().deleting_state()
         self.txt_var.set('select a profile to delete')
     
+    def names_changed(self, renames, added, removed):
+        # the model keeps the current profile of the settings, config.ini follows it.
+        # The models kept for the profiles renamed or deleted are dropped
+        super().names_changed(renames, added, removed)
+        for name in [*dict(renames), *removed]:
+            self.root.models.pop(self.item_path(name), None)
+        if self.root.cfg['Main']['profile'] != self.root.settings.profile:
+            self.root.cfg['Main']['profile'] = self.root.settings.profile
+            self.root.save_config()
+
     def load(self, name):
         self.root.change_to_profile(name + '.profile')
+
+    def import_archive(self):
+        # the profile is named after the archive, it is listed once its saves are imported
+        path = askopenfilename(title='Import a profile', filetypes=ARCHIVE_TYPES)
+        if not path:
+            return
+        name = archive_stem(path)
+        while name in self.items:
+            name += "'"
+        self.run_io(f'importing "{name}"', import_profile, self.root.settings, path, os.path.join(self.items_path, name + '.profile'),
+                    on_done=lambda saves: self.profile_imported(name, saves))
+
+    def profile_imported(self, name, saves):
+        self.model.add_all([name])
+        self.reinit_widgets()
+        self.txt_var.set(f'profile "{name}" imported with {len(saves)} saves')
+        self.label['style'] = 'G.TLabel'
+        self.root.enforce_quota(self.items_path)
     
+    @instrumented()
     def _new_item(self, asname):
-        os.mkdir(os.path.join(self.items_path, asname + '.profile'))
+        self.model.create_profile(asname)
         
-    def delete_item(self, name):
-        super().delete_item(name)
-        didit = False
-        to_add = ''
-        while not didit:
-            try:
-                os.rename(self.ds_path + f'\\{name}.profile', self.ds_path + f'\\{name}{to_add}.formerprofile')
-            except FileExistsError:
-                to_add += "'"
-            else:
-                didit = True        
+    def delete_items(self, names):
+        super().delete_items(names)
+        self.root.enforce_quota(self.items_path)
         
 if __name__ == "__main__":
-    cfg = read_configs()
+    cfg = read_config()
     root = App(cfg)
-    if cfg['Main']['profile'] != 'no profile':
+    if cfg['Main']['profile'] != NO_PROFILE:
         root.create_profile_window()
     else:
         root.create_change_profile_menu()
+    root.enforce_quota()
     root.mainloop()
 
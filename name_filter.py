@@ -0,0 +1,92 @@
+# -*- coding:Utf-8 -*-
+
+from order_manifest import split_number
+
+
+def filter_key(name):
+    # the number that renumbering gives to a name is not part of its key, so a renumbered name keeps its trigrams
+    return split_number(name)[1].casefold()
+
+
+def trigrams(key):
+    return {key[i:i + 3] for i in range(len(key) - 2)}
+
+
+class NameFilter:
+    # finds the names that contain a text, ignoring the case and the number prefix. The keys are indexed by trigram,
+    # a query of three characters or more only checks the keys that have all its trigrams. When a query extends the
+    # previous one, only the previous matches are checked, so typing costs less and less at each keystroke.
+    # The trigrams are only indexed for the first query that needs them
+    def __init__(self, names=()):
+        self.names = dict()  # key -> set of names
+        self.index = None  # trigram -> set of keys
+        self.last = None  # (query, set of matching keys) of the last search
+        for name in names:
+            self.names.setdefault(filter_key(name), set()).add(name)
+
+    def add(self, name):
+        key = filter_key(name)
+        names = self.names.get(key)
+        if names is not None:
+            names.add(name)
+            return
+        self.names[key] = {name}
+        if self.index is not None:
+            for trigram in trigrams(key):
+                self.index.setdefault(trigram, set()).add(key)
+        if self.last is not None and self.last[0] in key:
+            self.last[1].add(key)
+
+    def remove(self, name):
+        key = filter_key(name)
+        names = self.names[key]
+        names.discard(name)
+        if names:
+            return
+        self._drop(key)
+
+    def _drop(self, key):
+        del self.names[key]
+        if self.index is not None:
+            for trigram in trigrams(key):
+                keys = self.index[trigram]
+                keys.discard(key)
+                if not keys:
+                    del self.index[trigram]
+        if self.last is not None:
+            self.last[1].discard(key)
+
+    def replace(self, renames):
+        # (name, new name) pairs applied together, they can exchange two names. The trigrams are only indexed again
+        # for the keys that appear or disappear, not for the renumbered names
+        emptied = []
+        for name, _ in renames:
+            names = self.names[filter_key(name)]
+            names.discard(name)
+            if not names:
+                emptied.append(filter_key(name))
+        for _, new_name in renames:
+            self.add(new_name)
+        for key in emptied:
+            if key in self.names and not self.names[key]:
+                self._drop(key)
+
+    def matches(self, query):
+        # the set of names containing the query
+        query = query.casefold()
+        if self.last is not None and self.last[0] == query:
+            keys = self.last[1]
+        elif self.last is not None and self.last[0] in query:
+            keys = {key for key in self.last[1] if query in key}
+        elif len(query) >= 3:
+            if self.index is None:
+                self.index = dict()
+                for key in self.names:
+                    for trigram in trigrams(key):
+                        self.index.setdefault(trigram, set()).add(key)
+            sets = sorted((self.index.get(trigram, set()) for trigram in trigrams(query)), key=len)
+            keys = {key for key in sets[0] if query in key} if sets[0] else set()
+        else:
+            keys = {key for key in self.names if query in key}
+        self.last = query, keys
+        return {name for key in keys for name in self.names[key]}
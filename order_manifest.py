@@ -0,0 +1,212 @@
+# -*- coding:Utf-8 -*-
+
+import json
+import os
+import tempfile
+import time
+
+from ordering import OrderedIndex
+
+MANIFEST_NAME = '.order.json'
+JOURNAL_NAME = '.order.journal'
+IMPORTS_NAME = '.imports.json'
+
+
+def split_number(name):
+    # "03 name" -> ('03', 'name'), "name" -> ('', 'name')
+    try:
+        n, rest = name.split(' ', 1)
+    except ValueError:
+        return '', name
+    if n.isdecimal():
+        return n, rest
+    return '', name
+
+
+def write_json_atomically(path, data):
+    # each writer has its own temporary file, two threads writing the same index never mix their contents
+    fd, tmp = tempfile.mkstemp(suffix='.tmp', dir=os.path.dirname(path))
+    try:
+        with open(fd, 'w', encoding='utf8') as file:
+            json.dump(data, file, ensure_ascii=False)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+
+class ImportLog:
+    # the time each item of a directory was imported, for the sort by import. The mtime of a file cannot be used:
+    # the saves deduplicated by the store are hard links to the first import of the same content and share its mtime
+    def __init__(self, directory):
+        self.path = os.path.join(directory, IMPORTS_NAME)
+        self.times = dict()  # name -> time_ns of the last import
+        self.last = 0  # the latest time, a new one is always after it
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, encoding='utf8') as file:
+                self.times = {name: int(value) for name, value in json.load(file).items()}
+        except (FileNotFoundError, ValueError, AttributeError, TypeError):
+            self.times = dict()
+        self.last = max(self.times.values(), default=0)
+
+    def snapshot(self):
+        return dict(self.times)
+
+    def save(self):
+        write_json_atomically(self.path, self.snapshot())
+
+    def get(self, name):
+        return self.times.get(name)
+
+    def stamp(self, name):
+        # an item imported now comes after every other one, even within the resolution of the clock
+        self.last = self.times[name] = max(time.time_ns(), self.last + 1)
+
+    def rename(self, renames):
+        # (name, new name) pairs, in any order
+        moved = [(new_name, self.times.pop(name, None)) for name, new_name in renames]
+        for new_name, value in moved:
+            if value is None:
+                self.times.pop(new_name, None)
+            else:
+                self.times[new_name] = value
+
+    def forget(self, names):
+        for name in names:
+            self.times.pop(name, None)
+
+    def prune(self, names):
+        # drops the items that are no longer on disk
+        self.times = {name: value for name, value in self.times.items() if name in names}
+
+
+class OrderManifest:
+    # keeps the display order and the numbering of the items of a directory in a single file,
+    # so that reordering never renames the items themselves
+    def __init__(self, directory, suffix):
+        self.directory = directory
+        self.suffix = suffix
+        self.path = os.path.join(directory, MANIFEST_NAME)
+        self.journal_path = os.path.join(directory, JOURNAL_NAME)
+
+        self.order = OrderedIndex()
+        self.numbered = False
+        self.load()
+        self.recover()
+
+    def load(self):
+        try:
+            with open(self.path, encoding='utf8') as file:
+                data = json.load(file)
+            self.order = OrderedIndex(data['order'])
+            self.numbered = bool(data['numbered'])
+        except (FileNotFoundError, ValueError, KeyError, TypeError):
+            self.order = OrderedIndex()
+            self.numbered = False
+
+    def snapshot(self):
+        return {'order': list(self.order.names), 'numbered': self.numbered}
+
+    def save(self):
+        write_json_atomically(self.path, self.snapshot())
+
+    def sync(self, names):
+        # drops the entries that are no longer on disk and appends the new ones in the given order
+        present = set(names)
+        order = [name for name in self.order if name in present]
+        known = set(order)
+        order.extend(name for name in names if name not in known)
+        changed = order != self.order.names
+        self.order = OrderedIndex(order)
+        if changed:
+            self.save()
+        return self.order
+
+    def display_name(self, position, name):
+        _, base_name = split_number(name)
+        if self.numbered:
+            return '{:0>{}} '.format(position + 1, len(str(len(self.order)))) + base_name
+        return base_name
+
+    def plan_export(self):
+        # prepares the renaming of every item to its displayed name and updates the order in memory.
+        # A displayed name already taken by another item gets apostrophes, as "1 a" and "a" unnumbered.
+        # apply_journal() does the renames, it can be run in another thread
+        targets = [(name, self.display_name(i, name)) for i, name in enumerate(self.order)]
+        taken = {name for name, new_name in targets if new_name == name}  # the names renamed are freed
+        renames = []
+        for name, new_name in targets:
+            if new_name == name:
+                continue
+            while new_name in taken:
+                new_name += '\''
+            taken.add(new_name)
+            if new_name != name:
+                renames.append([name, new_name])
+        if not renames:
+            return None
+
+        new_names = dict(renames)
+        self.order = OrderedIndex(new_names.get(name, name) for name in self.order)
+        return {'phase': 1, 'renames': renames, 'manifest': self.snapshot()}
+
+    def apply_journal(self, journal):
+        # the journal is written first and the renames are done in two phases through temporary names,
+        # so an interrupted export is completed by the next recover(). No item is renamed onto a file outside of the export
+        if journal['phase'] == 1:
+            sources = {name for name, _ in journal['renames']}
+            for _, new_name in journal['renames']:
+                if new_name not in sources and os.path.exists(self._item_path(new_name)):
+                    raise FileExistsError(f'"{new_name}" already exists')
+            write_json_atomically(self.journal_path, journal)
+        self._apply(journal)
+
+    def recover(self):
+        try:
+            with open(self.journal_path, encoding='utf8') as file:
+                journal = json.load(file)
+        except FileNotFoundError:
+            return
+        except ValueError:  # the journal itself was interrupted, nothing has been renamed yet
+            os.remove(self.journal_path)
+            return
+        self._apply(journal)
+        self.order = OrderedIndex(journal['manifest']['order'])
+        self.numbered = journal['manifest']['numbered']
+
+    def _item_path(self, name):
+        return os.path.join(self.directory, name + self.suffix)
+
+    def _temporary_path(self, i):
+        return os.path.join(self.directory, f'.{i}.export')
+
+    def _apply(self, journal):
+        renames = journal['renames']
+        if journal['phase'] == 1:
+            for i, (name, _) in enumerate(renames):
+                if not os.path.exists(self._temporary_path(i)) and os.path.exists(self._item_path(name)):
+                    os.rename(self._item_path(name), self._temporary_path(i))
+            journal['phase'] = 2
+            write_json_atomically(self.journal_path, journal)
+
+        order = journal['manifest']['order']
+        for i, (_, new_name) in enumerate(renames):
+            if not os.path.exists(self._temporary_path(i)):
+                continue
+            final_name = new_name
+            while os.path.exists(self._item_path(final_name)):  # taken meanwhile, or by a journal written before the check
+                final_name += '\''
+            if final_name != new_name:
+                renames[i][1] = final_name
+                positions = [k for k, name in enumerate(order) if name == new_name]
+                if positions:
+                    order[positions[-1]] = final_name
+            os.rename(self._temporary_path(i), self._item_path(final_name))
+
+        write_json_atomically(self.path, journal['manifest'])
+        os.remove(self.journal_path)
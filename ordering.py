@@ -0,0 +1,161 @@
+# -*- coding:Utf-8 -*-
+
+import re
+from bisect import bisect_left, bisect_right
+from operator import itemgetter
+
+NAME_SORTS = ('alphabetical', 'natural')  # the order follows the names, moving an item renames it
+FILE_SORTS = ('mtime', 'size', 'import')  # the order follows the files, the items cannot be moved
+DIGITS = re.compile(r'(\d+)')
+
+
+def natural_key(name):
+    # "2 b" before "10 a": the runs of digits are compared as numbers
+    parts = DIGITS.split(name.casefold())
+    parts[1::2] = map(int, parts[1::2])
+    return parts
+
+
+def sort_key(sorting_type, name, entry=None, imported=None):
+    # the key of an item for a sorting type of config.ini, entry is the ItemEntry of the file for the sorts by file
+    # and imported the time recorded by the import log, if any. The name ends every key, so two items never have the same key
+    if sorting_type == 'natural':
+        return natural_key(name), name
+    if sorting_type == 'mtime':  # the newest first
+        return -entry.mtime_ns, name
+    if sorting_type == 'size':  # the largest first
+        return -entry.size, name
+    if sorting_type == 'import':  # the oldest first, so an imported save comes last. The mtime for the items imported before the log
+        return entry.mtime_ns if imported is None else imported, name
+    return name
+
+
+class OrderedIndex:
+    # names in display order with their positions, swapping or replacing a name is O(1)
+    sorted = False
+
+    def __init__(self, names=()):
+        self.names = list(names)
+        self.positions = {name: i for i, name in enumerate(self.names)}
+
+    def __len__(self):
+        return len(self.names)
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __contains__(self, name):
+        return name in self.positions
+
+    def __getitem__(self, position):
+        return self.names[position]
+
+    def position(self, name):
+        return self.positions[name]
+
+    def append(self, name):
+        self.positions[name] = len(self.names)
+        self.names.append(name)
+
+    def remove(self, name):
+        position = self.positions.pop(name)
+        del self.names[position]
+        self._reindex(position, len(self.names))
+
+    def remove_all(self, names):
+        # one pass over the list, whatever the number of names
+        removed = set(names)
+        if not removed:
+            return
+        start = min(self.positions.pop(name) for name in removed)
+        self.names[start:] = [name for name in self.names[start:] if name not in removed]
+        self._reindex(start, len(self.names))
+
+    def replace(self, name, new_name):
+        position = self.positions.pop(name)
+        self.names[position] = new_name
+        self.positions[new_name] = position
+
+    def swap(self, i, j):
+        names = self.names
+        names[i], names[j] = names[j], names[i]
+        self.positions[names[i]] = i
+        self.positions[names[j]] = j
+
+    def move(self, i, j):
+        # moves the name at i to j, shifting everything in between by one
+        name = self.names.pop(i)
+        self.names.insert(j, name)
+        self._reindex(min(i, j), max(i, j) + 1)
+
+    def sort(self, key=None):
+        self.names.sort(key=key)
+        self._reindex(0, len(self.names))
+
+    def _reindex(self, start, stop):
+        names = self.names
+        positions = self.positions
+        for position in range(start, stop):
+            positions[names[position]] = position
+
+
+class SortedIndex(OrderedIndex):
+    # names kept in the order of their keys, which are computed once per name. A name is placed by bisection on the
+    # sorted keys, so adding, removing or renaming one costs O(log n) comparisons and the shift of two lists instead
+    # of a sort. The positions are found by bisection too. The order cannot be changed by hand: swap and move are
+    # done by renaming the items
+    sorted = True
+
+    def __init__(self, names=(), key=None):
+        self.key = key
+        self.keys = {name: key(name) for name in names}
+        pairs = sorted(self.keys.items(), key=itemgetter(1))
+        self.names = [name for name, _ in pairs]
+        self.sorted_keys = [key for _, key in pairs]
+
+    def __contains__(self, name):
+        return name in self.keys
+
+    def position(self, name):
+        return bisect_left(self.sorted_keys, self.keys[name])
+
+    def append(self, name):
+        # inserted at its place
+        key = self.keys[name] = self.key(name)
+        position = bisect_right(self.sorted_keys, key)
+        self.sorted_keys.insert(position, key)
+        self.names.insert(position, name)
+
+    def remove(self, name):
+        position = self.position(name)
+        del self.keys[name]
+        del self.sorted_keys[position]
+        del self.names[position]
+
+    def remove_all(self, names):
+        removed = set(names)
+        for name in removed:
+            del self.keys[name]
+        kept = [(name, key) for name, key in zip(self.names, self.sorted_keys) if name not in removed]
+        self.names = [name for name, _ in kept]
+        self.sorted_keys = [key for _, key in kept]
+
+    def replace(self, name, new_name):
+        self.remove(name)
+        self.append(new_name)
+
+    def swap(self, i, j):
+        raise TypeError('a sorted index cannot be reordered')
+
+    move = swap
+
+
+def moved_range(names, i, j):
+    # (start, names between i and j once the name at i is moved to j)
+    start, stop = min(i, j), max(i, j) + 1
+    moved = names[start:stop]
+    if i < j:
+        moved.append(moved.pop(0))
+    else:
+        moved.insert(0, moved.pop())
+    return start, moved
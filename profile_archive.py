@@ -0,0 +1,246 @@
+# -*- coding:Utf-8 -*-
+
+import os
+import shutil
+import struct
+import tarfile
+import tempfile
+import time
+import zipfile
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from hashing import CHUNK_SIZE, file_digest
+from order_manifest import MANIFEST_NAME, split_number
+from snapshot_codec import compress_file, iter_raw
+
+ARCHIVE_LEVEL = 6
+SPOOL_SIZE = 256 << 10  # compressed bytes of an entry kept in memory, the rest goes to a temporary file
+ZIP64_LIMIT = 0xFFFFFFFF
+
+LOCAL_HEADER = struct.Struct('<IHHHHHIIIHH')  # signature, version, flags, method, time, date, crc, compressed size, size, name and extra lengths
+CENTRAL_HEADER = struct.Struct('<IHHHHHHIIIHHHHHII')  # signature, made by, version, flags, method, time, date, crc, sizes, lengths,
+                                                      # disk, internal and external attributes, offset of the local header
+END_RECORD = struct.Struct('<IHHHHIIH')  # signature, disks, entries on the disk, entries, size and offset of the central directory, comment
+ZIP64_END_RECORD = struct.Struct('<IQHHIIQQQQ')
+ZIP64_LOCATOR = struct.Struct('<IIQI')
+UTF8_NAMES = 0x800
+ARCHIVE_SUFFIXES = ('.zip', '.tar', '.gz', '.tgz', '.bz2', '.xz', '.profile')
+
+
+def dos_time(mtime):
+    t = time.localtime(max(mtime, 315532800))  # 1980, the first date of the format
+    return t.tm_hour << 11 | t.tm_min << 5 | t.tm_sec // 2, (t.tm_year - 1980) << 9 | t.tm_mon << 5 | t.tm_mday
+
+
+class CompressedEntry:
+    # an entry deflated in a worker thread, waiting to be written into the archive
+    def __init__(self, name, mtime):
+        self.name = name
+        self.mtime = mtime
+        self.crc = 0
+        self.size = 0
+        self.compressed_size = 0
+        self.data = tempfile.SpooledTemporaryFile(SPOOL_SIZE)
+
+    def write(self, chunks, level):
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15)  # raw deflate, the zip headers are written by ZipWriter
+        for chunk in chunks:
+            self.crc = zlib.crc32(chunk, self.crc)
+            self.size += len(chunk)
+            self.data.write(compressor.compress(chunk))
+        self.data.write(compressor.flush())
+        self.compressed_size = self.data.tell()
+        self.data.seek(0)
+        return self
+
+
+class ZipWriter:
+    # writes entries compressed beforehand, zipfile can only compress them itself, one at a time.
+    # The Zip64 records are only written for what goes over 4 GB
+    def __init__(self, file):
+        self.file = file
+        self.entries = []  # (entry, offset of its local header)
+
+    def add(self, entry):
+        offset = self.file.tell()
+        name = entry.name.encode('utf8')
+        zip64 = entry.size >= ZIP64_LIMIT or entry.compressed_size >= ZIP64_LIMIT
+        extra = struct.pack('<HHQQ', 1, 16, entry.size, entry.compressed_size) if zip64 else b''
+        sizes = (ZIP64_LIMIT, ZIP64_LIMIT) if zip64 else (entry.compressed_size, entry.size)
+        self.file.write(LOCAL_HEADER.pack(0x04034b50, 45 if zip64 else 20, UTF8_NAMES, zipfile.ZIP_DEFLATED, *dos_time(entry.mtime), entry.crc,
+                                          *sizes, len(name), len(extra)))
+        self.file.write(name)
+        self.file.write(extra)
+        shutil.copyfileobj(entry.data, self.file, CHUNK_SIZE)
+        entry.data.close()
+        self.entries.append((entry, offset))
+
+    def close(self):
+        start = self.file.tell()
+        for entry, offset in self.entries:
+            name = entry.name.encode('utf8')
+            values = [entry.size, entry.compressed_size, offset]
+            large = [value for value in values if value >= ZIP64_LIMIT]
+            extra = struct.pack(f'<HH{len(large)}Q', 1, 8 * len(large), *large) if large else b''
+            size, compressed_size, offset = (min(value, ZIP64_LIMIT) for value in values)
+            version = 45 if large else 20
+            self.file.write(CENTRAL_HEADER.pack(0x02014b50, 3 << 8 | version, version, UTF8_NAMES, zipfile.ZIP_DEFLATED, *dos_time(entry.mtime),
+                                                entry.crc, compressed_size, size, len(name), len(extra), 0, 0, 0, 0o100644 << 16, offset))
+            self.file.write(name)
+            self.file.write(extra)
+        end = self.file.tell()
+
+        count = len(self.entries)
+        if count > 0xFFFF or start >= ZIP64_LIMIT or end - start >= ZIP64_LIMIT:
+            self.file.write(ZIP64_END_RECORD.pack(0x06064b50, ZIP64_END_RECORD.size - 12, 3 << 8 | 45, 45, 0, 0, count, count, end - start, start))
+            self.file.write(ZIP64_LOCATOR.pack(0x07064b50, 0, end, 1))
+        self.file.write(END_RECORD.pack(0x06054b50, 0, 0, min(count, 0xFFFF), min(count, 0xFFFF), min(end - start, ZIP64_LIMIT),
+                                        min(start, ZIP64_LIMIT), 0))
+
+
+def profile_files(directory):
+    # the saves of a profile directory and its order manifest, what an archive holds
+    with os.scandir(directory) as iterator:
+        return sorted(entry.name for entry in iterator if entry.is_file() and (entry.name.endswith('.sl2') or entry.name == MANIFEST_NAME))
+
+
+def _compress(path, resolve, level):
+    return CompressedEntry(os.path.basename(path), os.stat(path).st_mtime).write(iter_raw(path, resolve), level)
+
+
+def export_profile(directory, archive, resolve=None, level=ARCHIVE_LEVEL, workers=None):
+    # writes the saves of a profile directory into a zip archive, as plain saves. The entries are compressed in
+    # parallel threads, zlib releases the GIL, and written in order as they are done. Only one entry per worker is
+    # waiting at a time, so the memory used does not depend on the size of the profile. Returns the number of entries
+    names = profile_files(directory)
+    workers = workers or os.cpu_count() or 1
+    tmp = archive + '.tmp'
+    with open(tmp, 'wb') as file, ThreadPoolExecutor(max_workers=workers) as pool:
+        writer = ZipWriter(file)
+        pending = deque()
+        for name in names:
+            pending.append(pool.submit(_compress, os.path.join(directory, name), resolve, level))
+            if len(pending) > workers:
+                writer.add(pending.popleft().result())
+        while pending:
+            writer.add(pending.popleft().result())
+        writer.close()
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp, archive)
+    return len(names)
+
+
+def archive_stem(path):
+    # the name of the profile of an archive: saves.profile.tar.gz -> saves
+    name = os.path.basename(path)
+    while os.path.splitext(name)[1].lower() in ARCHIVE_SUFFIXES:
+        name = os.path.splitext(name)[0]
+    return name
+
+
+def member_name(name):
+    # the file name of a member, an archive made by hand may have the profile directory in its names
+    return name.replace('\\', '/').rpartition('/')[2]
+
+
+def archive_saves(archive):
+    # the names of the saves of an archive. A zip is only read through its central directory, a tar is read through
+    if zipfile.is_zipfile(archive):
+        with zipfile.ZipFile(archive) as file:
+            names = [member_name(info.filename) for info in file.infolist() if not info.is_dir()]
+    else:
+        with tarfile.open(archive, 'r:*') as file:
+            names = [member_name(info.name) for info in file if info.isfile()]
+    return [name[:-len('.sl2')] for name in names if name.endswith('.sl2')]
+
+
+def _members(archive):
+    # (file name, readable file) of every file of the archive, read as they come
+    if zipfile.is_zipfile(archive):
+        with zipfile.ZipFile(archive) as file:
+            for info in file.infolist():
+                if not info.is_dir():
+                    with file.open(info) as member:
+                        yield member_name(info.filename), member
+        return
+    with tarfile.open(archive, 'r:*') as file:
+        for info in file:
+            if info.isfile():
+                yield member_name(info.name), file.extractfile(info)
+
+
+def _zip_members(archive, names):
+    # only the given saves, found through the central directory without reading the other entries. Every name is
+    # checked before anything is imported
+    with zipfile.ZipFile(archive) as file:
+        infos = {member_name(info.filename): info for info in file.infolist() if not info.is_dir()}
+        for name in names:
+            if name + '.sl2' not in infos:
+                raise FileNotFoundError(f'no save "{name}" in the archive')
+        for name in names:
+            info = infos[name + '.sl2']
+            with file.open(info) as member:
+                yield info.filename, member
+
+
+def import_archive(settings, archive, target, store=None, integrity=None, names=None, renamed=False):
+    # imports the saves of an archive into the profile directory target, all of them or the given names, one file
+    # at a time through a temporary file, stored like the imported saves. The order manifest of the archive is kept
+    # when the profile has none. With renamed, the saves lose their numbers and the names already taken get
+    # apostrophes, as when they are moved, and the manifest is not kept. Returns the names of the saves
+    if names is None:
+        members = _members(archive)
+    elif zipfile.is_zipfile(archive):
+        members = _zip_members(archive, names)
+    else:
+        wanted = {name + '.sl2' for name in names}
+        members = ((name, member) for name, member in _members(archive) if name in wanted)
+
+    taken = {name[:-len('.sl2')] for name in os.listdir(target) if name.endswith('.sl2')} if renamed else None
+    imported = []
+    found = set()
+    for name, member in members:
+        name = member_name(name)
+        if name != MANIFEST_NAME and not name.endswith('.sl2'):
+            continue
+        if name == MANIFEST_NAME and (renamed or names is not None or os.path.exists(os.path.join(target, name))):
+            continue
+        if name != MANIFEST_NAME:
+            found.add(name[:-len('.sl2')])
+        if taken is not None and name != MANIFEST_NAME:
+            _, new_name = split_number(name[:-len('.sl2')])
+            while new_name in taken:
+                new_name += '\''
+            taken.add(new_name)
+            name = new_name + '.sl2'
+        dest = os.path.join(target, name)
+        fd, tmp = tempfile.mkstemp(suffix='.tmp', dir=target)
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                shutil.copyfileobj(member, file, CHUNK_SIZE)
+            if name == MANIFEST_NAME:  # read as plain JSON, never stored as a snapshot
+                os.replace(tmp, dest)
+            elif store is not None:
+                store.add(tmp, dest)
+            elif settings.compression is not None:
+                compress_file(tmp, dest, settings.compression, settings.compression_level)
+            else:
+                os.replace(tmp, dest)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        if name == MANIFEST_NAME:
+            continue
+        if integrity is not None:
+            st = os.stat(dest)
+            integrity.add(name, st, file_digest(dest, st))
+        imported.append(name[:-len('.sl2')])
+
+    if integrity is not None and imported:
+        integrity.save()
+    if names is not None and len(found) < len(set(names)):
+        raise FileNotFoundError(f'no save "{sorted(set(names) - found)[0]}" in the archive')
+    return imported
@@ -0,0 +1,165 @@
+# -*- coding:Utf-8 -*-
+
+import os
+import time
+from collections import Counter
+from shutil import rmtree
+
+from auto_snapshot import auto_time, is_auto_name
+from order_manifest import IMPORTS_NAME, ImportLog
+from snapshot_store import STORE_DIRECTORY, SnapshotStore
+
+TOMBSTONE_SUFFIX = '.formerprofile'
+
+
+def bury(path):
+    # <path>.profile -> <path>~<deletion time in ns>.formerprofile, the time makes the name unique without probing
+    stamp = time.time_ns()
+    while os.path.exists(f'{path}~{stamp}{TOMBSTONE_SUFFIX}'):  # two deletions in the same clock tick
+        stamp += 1
+    os.rename(path + '.profile', f'{path}~{stamp}{TOMBSTONE_SUFFIX}')
+
+
+def tombstone_time(entry):
+    # deletion time of a tombstone, the mtime for the ones named with apostrophes
+    _, _, stamp = entry.name[:-len(TOMBSTONE_SUFFIX)].rpartition('~')
+    if stamp.isdecimal():
+        return int(stamp)
+    return entry.stat().st_mtime_ns
+
+
+class QuotaManager:
+    # disk usage of a game directory and eviction when it goes over the budget. Every directory is listed again at
+    # each refresh, a save overwritten in place changes neither the mtime of its directory nor its inode, only the
+    # links that changed are counted again. Hard links are counted once.
+    # Eviction removes the oldest tombstones first, then plans the removal of the oldest auto-snapshots if allowed,
+    # never anything else. The profiles remove them, so their indexes and lists forget them
+    def __init__(self, ds_path, budget, evict_auto_snapshots=False):
+        self.ds_path = ds_path
+        self.budget = budget  # bytes, 0 for no budget
+        self.evict_auto_snapshots = evict_auto_snapshots
+        self.directories = dict()  # path -> ({file name: inode number}, [subdirectory paths])
+        self.links = Counter()  # inode number -> links seen
+        self.sizes = dict()  # inode number -> size
+        self.usage = 0
+
+    def refresh(self):
+        seen = set()
+        self._refresh(self.ds_path, seen)
+        for path in [path for path in self.directories if path not in seen]:  # removed directories
+            self._forget(path)
+        return self.usage
+
+    def over_budget(self):
+        return self.budget > 0 and self.usage > self.budget
+
+    def enforce(self):
+        # returns the names of the tombstones removed and the auto-snapshots to remove, {profile name: [save names]}
+        self.refresh()
+        evicted = []
+        if not self.over_budget():
+            return evicted, dict()
+
+        for entry in sorted(self._tombstones(), key=tombstone_time):
+            rmtree(entry.path, ignore_errors=True)  # it may be cleaned meanwhile
+            evicted.append(entry.name)
+            self._collect(os.path.join(self.ds_path, STORE_DIRECTORY))
+            if not self.over_budget():
+                return evicted, dict()
+        return evicted, self.plan_evictions()
+
+    def plan_evictions(self):
+        # the oldest auto-snapshots until the usage is under the budget. A save only frees its size when its inode is
+        # not linked anywhere else than in a store, the caller measures again what was really freed
+        if not (self.evict_auto_snapshots and self.over_budget()):
+            return dict()
+        stored = Counter(key for path, (files, _) in self.directories.items()
+                         if STORE_DIRECTORY in os.path.relpath(path, self.ds_path).split(os.sep) for key in files.values())
+        removed = Counter()
+        planned = dict()
+        usage = self.usage
+        for _, profile, name, key in sorted(self._auto_snapshots()):
+            planned.setdefault(profile, []).append(name)
+            removed[key] += 1
+            if self.links[key] - removed[key] - stored[key] <= 0:
+                usage -= self.sizes.get(key, 0)
+            if usage <= self.budget:
+                break
+        return planned
+
+    def _collect(self, store_path):
+        if os.path.isdir(store_path):
+            SnapshotStore(store_path).collect()
+        self.refresh()
+
+    def _tombstones(self):
+        with os.scandir(self.ds_path) as iterator:
+            return [entry for entry in iterator if entry.name.endswith(TOMBSTONE_SUFFIX) and entry.is_dir()]
+
+    def _auto_snapshots(self):
+        # (time, profile name, save name, inode number). The time is the one recorded by the import log of the profile,
+        # else the one of the name: the saves deduplicated by the store share the mtime of the first one
+        snapshots = []
+        for path, (files, _) in self.directories.items():
+            if os.path.dirname(path) != self.ds_path or not path.endswith('.profile'):
+                continue
+            times = ImportLog(path).times if os.path.exists(os.path.join(path, IMPORTS_NAME)) else dict()
+            for file_name, key in files.items():
+                name = file_name[:-len('.sl2')]
+                if file_name.endswith('.sl2') and is_auto_name(name):
+                    recorded = times.get(name) or auto_time(name) or 0
+                    snapshots.append((recorded, os.path.basename(path)[:-len('.profile')], name, key))
+        return snapshots
+
+    def _refresh(self, path, seen):
+        seen.add(path)
+        files = dict()
+        sizes = dict()
+        subdirectories = []
+        try:
+            with os.scandir(path) as iterator:
+                for entry in iterator:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirectories.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            key = entry.inode() or entry.path  # without inode numbers, every file is counted
+                            sizes[key] = entry.stat(follow_symlinks=False).st_size
+                            files[entry.name] = key
+                    except FileNotFoundError:  # removed by an operation of a profile meanwhile
+                        pass
+        except (FileNotFoundError, NotADirectoryError):
+            seen.discard(path)
+            return
+
+        cached = self.directories.get(path)
+        if cached is None or cached[0] != files or any(self.sizes.get(key) != size for key, size in sizes.items()):
+            self._link(files.values(), sizes)
+            if cached is not None:
+                self._unlink(cached[0].values())
+            self.directories[path] = files, subdirectories
+        else:
+            self.directories[path] = cached[0], subdirectories
+
+        for subdirectory in subdirectories:
+            self._refresh(subdirectory, seen)
+
+    def _forget(self, path):
+        files, _ = self.directories.pop(path)
+        self._unlink(files.values())
+
+    def _link(self, keys, sizes):
+        for key in keys:
+            if self.links[key] == 0:
+                self.usage += sizes[key]
+            else:  # the size changes when it is overwritten in place
+                self.usage += sizes[key] - self.sizes[key]
+            self.sizes[key] = sizes[key]
+            self.links[key] += 1
+
+    def _unlink(self, keys):
+        for key in keys:
+            self.links[key] -= 1
+            if self.links[key] <= 0:
+                del self.links[key]
+                self.usage -= self.sizes.pop(key, 0)
@@ -0,0 +1,765 @@
+# -*- coding:Utf-8 -*-
+
+import os
+import tempfile
+import time
+from configparser import ConfigParser, Error as ConfigError
+from glob import iglob
+from io import StringIO
+from shutil import copyfile, rmtree
+
+from dir_index import DirectoryIndex, ItemEntry
+from hashing import file_digest
+from instrumentation import instrumented, recorder
+from integrity import INDEX_NAME, IntegrityIndex
+from load_engine import LoadEngine
+from order_manifest import ImportLog, OrderManifest, split_number, write_json_atomically
+from ordering import FILE_SORTS, NAME_SORTS, OrderedIndex, SortedIndex, moved_range, sort_key
+from profile_archive import export_profile, import_archive
+from quota import QuotaManager, bury
+from snapshot_codec import compress_file, decompress_file, recompress_all
+from snapshot_store import STORE_DIRECTORY, SnapshotStore
+
+SAVE_NAMES = {'ds1': 'DRAKS0005', 'ds3': 'DS30000'}
+NO_PROFILE = 'no profile'
+CONFIG_PATH = 'config.ini'
+BACKUP_SUFFIX = '.bak'  # the last version of config.ini known to be good
+
+
+class Settings:
+    # the options of the [Main] section of config.ini, with their defaults
+    def __init__(self, cfg):
+        main = cfg['Main']
+        self.game = main['game']
+        self.ds_path = os.path.normpath(main[self.game + '_path'])
+        self.live_save = os.path.join(self.ds_path, SAVE_NAMES[self.game] + '.sl2')
+        self.profile = main.get('profile', fallback=NO_PROFILE)
+
+        self.sorting_type = main.get('sorting_type', fallback='alphabetical')
+        self.auto_renumber = main.getboolean('automatically_renumber', fallback=False)
+        self.use_manifest = main.getboolean('order_manifest', fallback=False)
+
+        self.deduplicate = main.getboolean('deduplicate_saves', fallback=False)
+        self.compression = main.get('compression', fallback='none')
+        if self.compression == 'none':
+            self.compression = None
+        self.compression_level = main.getint('compression_level', fallback=6)
+        self.load_budget = main.getfloat('load_latency_budget_ms', fallback=250) / 1000
+        self.delta_saves = main.getboolean('delta_saves', fallback=False)
+        self.keyframe_interval = main.getint('delta_keyframe_interval', fallback=16)
+        self.verify_saves = main.getboolean('verify_saves', fallback=False)
+
+        self.quota = main.getfloat(self.game + '_quota_mb', fallback=0) * (1 << 20)
+        self.quota_evicts_auto_snapshots = main.getboolean('quota_evicts_auto_snapshots', fallback=False)
+
+
+def validate_config(cfg):
+    # raises ValueError when an option needed to start is missing
+    if not cfg.has_section('Main'):
+        raise ValueError('no [Main] section')
+    game = cfg['Main'].get('game')
+    if game not in SAVE_NAMES:
+        raise ValueError(f'unknown game "{game}"')
+    if not cfg['Main'].get(game + '_path'):
+        raise ValueError(f'no {game}_path')
+
+
+def parse_config(path):
+    cfg = ConfigParser()
+    if not cfg.read(path, encoding='utf8'):
+        raise FileNotFoundError(f'{path} not found')
+    validate_config(cfg)
+    return cfg
+
+
+def read_config(path=CONFIG_PATH):
+    # falls back to the backup when the file is missing, truncated or invalid
+    errors = []
+    for candidate in (path, path + BACKUP_SUFFIX):
+        try:
+            return parse_config(candidate)
+        except (OSError, ValueError, ConfigError) as error:
+            errors.append(str(error))
+    raise ValueError(f'no valid configuration, run auto_config.py ({"; ".join(errors)})')
+
+
+def config_text(cfg):
+    text = StringIO()
+    cfg.write(text)
+    return text.getvalue()
+
+
+@instrumented('write_config', 'config')
+def write_config_text(text, path=CONFIG_PATH):
+    # written to a temporary file and swapped in, so the file is never half written.
+    # The replaced version becomes the backup if it is valid
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf8') as file:
+        file.write(text)
+        file.flush()
+        os.fsync(file.fileno())
+    try:
+        parse_config(path)
+    except (OSError, ValueError, ConfigError):
+        pass
+    else:
+        os.replace(path, path + BACKUP_SUFFIX)  # read_config reads the backup until the new version is in place
+    os.replace(tmp, path)
+
+
+def write_config(cfg, path=CONFIG_PATH):
+    write_config_text(config_text(cfg), path)
+
+
+def number_names(names):
+    length = len(str(len(names)))
+    return ['{:0>{}} '.format(i, length) + name for i, name in enumerate(names, 1)]
+
+
+def renumber_names(names):
+    length = len(str(len(names)))
+    return ['{:0>{}} '.format(i, length) + split_number(name)[1] for i, name in enumerate(names, 1)]
+
+
+def unnumber_names(names):
+    # the names that become equal get apostrophes
+    new_names = []
+    taken = set()
+    for name in names:
+        n, new_name = split_number(name)
+        if n:
+            while new_name in taken:
+                new_name += '\''
+        new_names.append(new_name)
+        taken.add(new_name)
+    return new_names
+
+
+def rename_all(renames):
+    # goes through temporary names when a file is renamed to the former name of another one.
+    # When a rename fails, the ones already done are undone, so no file is left under a temporary name
+    sources = {path for path, _ in renames}
+    if any(new_path in sources for _, new_path in renames):
+        temporary = [f'{path}.{i}.renaming' for i, (path, _) in enumerate(renames)]
+        steps = [(path, tmp) for (path, _), tmp in zip(renames, temporary)]
+        steps.extend((tmp, new_path) for tmp, (_, new_path) in zip(temporary, renames))
+    else:
+        steps = renames
+    done = []
+    try:
+        for path, new_path in steps:
+            os.rename(path, new_path)
+            done.append((path, new_path))
+    except BaseException:
+        for path, new_path in reversed(done):
+            try:
+                os.rename(new_path, path)
+            except OSError:  # the others are still put back
+                pass
+        raise
+
+
+def rename_saves(renames, integrity=None):
+    rename_all(renames)
+    if integrity is not None:
+        integrity.rename(renames)
+
+
+def export_journal(manifest, journal, integrity=None):
+    # writes the numbering of the manifest to the file names
+    manifest.apply_journal(journal)
+    if integrity is not None:
+        integrity.rename([(os.path.join(manifest.directory, name + manifest.suffix), os.path.join(manifest.directory, new_name + manifest.suffix))
+                          for name, new_name in journal['renames']])
+
+
+def open_store(settings, profile_path):
+    if settings.delta_saves:  # the deltas are made against the previous import of the same profile
+        return SnapshotStore(os.path.join(profile_path, STORE_DIRECTORY), settings.compression, settings.compression_level,
+                             settings.keyframe_interval)
+    if settings.deduplicate:
+        return SnapshotStore(os.path.join(settings.ds_path, STORE_DIRECTORY), settings.compression, settings.compression_level)
+    return None
+
+
+def open_integrity(settings, profile_path):
+    if settings.verify_saves:
+        return IntegrityIndex(profile_path)
+    return None
+
+
+def open_imports(settings, path):
+    if settings.sorting_type == 'import':
+        return ImportLog(path)
+    return None
+
+
+def import_snapshots(settings, store, sources, integrity=None):
+    # (source, destination) pairs, returns the sizes of the written saves. The digests are added as the saves are
+    # written, the index is saved once
+    sizes = []
+    imported = False
+    try:
+        for src, dest in sources:
+            if store is not None:
+                store.add(src, dest)
+            elif settings.compression is not None:
+                compress_file(src, dest, settings.compression, settings.compression_level)
+            else:
+                copyfile(src, dest)
+            if recorder.enabled:
+                recorder.add_bytes(os.path.getsize(src))
+            st = os.stat(dest)
+            sizes.append(st.st_size)
+            if integrity is not None:
+                integrity.add(os.path.basename(dest), st, file_digest(dest, st))
+                imported = True
+    finally:
+        if imported:
+            integrity.save()
+    return sizes
+
+
+def load_snapshot(engine, src, dst, resolve=None, integrity=None):
+    # the save is checked against its recorded digest before the live save is overwritten
+    if integrity is not None:
+        integrity.check(src)
+    return engine.load(src, dst, resolve)
+
+
+def remove_snapshots(store, paths, integrity=None):
+    # the store is collected and the integrity index saved once for all the saves
+    if store is None:
+        for path in paths:
+            os.remove(path)
+    else:
+        store.remove_all(paths)
+    if integrity is not None:
+        integrity.forget(*paths)
+
+
+def move_snapshots(settings, store, paths, target, integrity=None):
+    # moves saves into the profile directory target, without their numbers, the names already taken get apostrophes.
+    # A save is renamed unless it is a delta built on the store of its profile, then its content is imported again.
+    # Returns the new names
+    target_integrity = open_integrity(settings, target)
+    target_imports = open_imports(settings, target)
+    target_store = open_store(settings, target) if settings.delta_saves else None
+    taken = {name[:-len('.sl2')] for name in os.listdir(target) if name.endswith('.sl2')}
+    new_names = []
+    for path in paths:
+        _, new_name = split_number(os.path.basename(path)[:-len('.sl2')])
+        while new_name in taken:
+            new_name += '\''
+        taken.add(new_name)
+        new_names.append(new_name)
+        dest = os.path.join(target, new_name + '.sl2')
+
+        digest = None
+        if target_store is not None:
+            fd, tmp = tempfile.mkstemp(suffix='.tmp', dir=target)
+            os.close(fd)
+            try:
+                decompress_file(path, tmp, store.object_path)
+                target_store.add(tmp, dest)
+            finally:
+                os.remove(tmp)
+        else:
+            entry = None if integrity is None else integrity.entries.get(os.path.basename(path))
+            os.replace(path, dest)  # a link to the store of the game directory stays valid
+            if entry is not None:
+                digest = entry[3]
+        if target_integrity is not None:
+            st = os.stat(dest)
+            target_integrity.add(new_name + '.sl2', st, file_digest(dest, st) if digest is None else digest)
+        if target_imports is not None:
+            target_imports.stamp(new_name)
+
+    if target_store is not None:
+        remove_snapshots(store, paths, integrity)
+    elif integrity is not None:
+        integrity.forget(*paths)
+    if target_integrity is not None:
+        target_integrity.save()
+    if target_imports is not None:
+        target_imports.save()
+    return new_names
+
+
+def export_snapshots(paths, directory, resolve=None):
+    # writes the raw saves into directory, so they can be loaded without the manager
+    for path in paths:
+        decompress_file(path, os.path.join(directory, os.path.basename(path)), resolve)
+
+
+def import_profile(settings, archive, directory):
+    # a new profile directory with every save of the archive, removed when the import fails
+    os.mkdir(directory)
+    try:
+        return import_archive(settings, archive, directory, open_store(settings, directory), open_integrity(settings, directory))
+    except BaseException:
+        rmtree(directory, ignore_errors=True)
+        raise
+
+
+def snapshot_paths(ds_path):
+    # the saves of the profiles and the stored snapshots, not the live save
+    for entry in os.scandir(ds_path):
+        if entry.name.endswith('.profile') and entry.is_dir():
+            yield from iglob(os.path.join(entry.path, '*.sl2'))
+            yield from store_objects(os.path.join(entry.path, STORE_DIRECTORY))
+    yield from store_objects(os.path.join(ds_path, STORE_DIRECTORY))
+
+
+def store_objects(store_path):
+    if os.path.isdir(store_path):
+        for subdir in os.scandir(store_path):
+            if subdir.is_dir():
+                yield from (entry.path for entry in os.scandir(subdir.path))
+
+
+def recompress_profiles(ds_path, method, level, workers=None, progress=None, indexes=None):
+    # rewrites the saves and the stored snapshots of every profile with the compression method, None to store them raw.
+    # The recorded saves are checked first, a damaged one is left as it is. The rewritten ones get new inodes and
+    # digests, their entries are recorded again. indexes are the IntegrityIndex already open, by profile path
+    indexes = dict(indexes or ())
+    paths = list(snapshot_paths(ds_path))
+    recorded = []
+    damaged = set()
+    for path in paths:
+        directory = os.path.dirname(path)
+        if not path.endswith('.sl2'):  # a stored snapshot
+            continue
+        if directory not in indexes:
+            indexes[directory] = IntegrityIndex(directory) if os.path.exists(os.path.join(directory, INDEX_NAME)) else None
+        index = indexes[directory]
+        st = os.stat(path)
+        if index is None or index.find(path, st) is None:
+            continue
+        if index.problem(path, st, file_digest(path, st)) is not None:
+            damaged.add(path)
+        else:
+            recorded.append((index, path))
+
+    saved = recompress_all([path for path in paths if path not in damaged], method, level, workers, progress)
+    changed = dict()
+    for index, path in recorded:
+        st = os.stat(path)
+        if index.find(path, st) is None:
+            index.add(os.path.basename(path), st, file_digest(path, st))
+            changed[index.path] = index
+    for index in changed.values():
+        index.save()
+    return saved
+
+
+def run_now(label, function, *args, on_done=None):
+    # the models do their file operations at once, the window queues them in its I/O worker instead
+    result = function(*args)
+    if on_done is not None:
+        on_done(result)
+    return result
+
+
+class ItemDirectory:
+    # the items of a directory in display order: the profiles of a game or the saves of a profile.
+    # The order in memory is updated at once, the file operations go through run
+    def __init__(self, settings, path, suffix, dir_index=None, run=None):
+        self.settings = settings
+        self.path = path
+        self.suffix = suffix
+        self.dir_index = DirectoryIndex() if dir_index is None else dir_index
+        self.run = run_now if run is None else run  # called with (label, function, *args, on_done=None)
+        self.listener = None  # called with (renames, added, removed) when the names change, to update a view
+        self.integrity = None  # the digests of the saves, for the profiles
+
+        self.entries = dict(self.dir_index.entries(path, suffix))  # name -> ItemEntry, for the sorts by file
+        self.imports = open_imports(settings, path)
+        if self.imports is not None:
+            self.imports.prune(self.entries)
+        self.manifest = None
+        if settings.use_manifest:
+            self.manifest = OrderManifest(path, suffix)
+            self.order = self.manifest.sync(self.make_order(self.entries).names)
+        else:
+            self.order = self.make_order(self.entries)
+
+    def item_path(self, name):
+        return os.path.join(self.path, name + self.suffix)
+
+    def names(self):
+        return list(self.order)
+
+    def display_names(self):
+        if self.manifest is None:
+            return self.names()
+        return [self.manifest.display_name(i, name) for i, name in enumerate(self.order)]
+
+    def make_order(self, names):
+        # the items in the order of the sorting type, in the order of the listing for the other types
+        if self.settings.sorting_type in NAME_SORTS + FILE_SORTS:
+            return SortedIndex(names, self.sort_key)
+        return OrderedIndex(names)
+
+    def sort_key(self, name):
+        if self.settings.sorting_type not in FILE_SORTS:
+            return sort_key(self.settings.sorting_type, name)
+        entry = self.entries.get(name)
+        if entry is None:  # found since the listing
+            try:
+                st = os.stat(self.item_path(name))
+            except OSError:  # not written yet
+                entry = self.new_entry(name)
+            else:
+                entry = ItemEntry(name, st.st_size, st.st_mtime_ns)
+            self.entries[name] = entry
+        return sort_key(self.settings.sorting_type, name, entry, None if self.imports is None else self.imports.get(name))
+
+    def new_entry(self, name):
+        return ItemEntry(name, 0, time.time_ns())
+
+    def notify(self, renames=(), added=(), removed=()):
+        if self.listener is not None:
+            self.listener(renames, added, removed)
+
+    def save_order(self):
+        if self.manifest is not None:
+            self.run('saving the order', write_json_atomically, self.manifest.path, self.manifest.snapshot())
+        self.save_imports()
+
+    def save_imports(self):
+        if self.imports is not None:
+            self.run('saving the import order', write_json_atomically, self.imports.path, self.imports.snapshot())
+
+    def rename(self, name, new_name):
+        if self.manifest is None:  # otherwise the number is not part of the name
+            n, _ = split_number(name)
+            if n:
+                new_name = n + ' ' + new_name
+        if new_name in self.order:
+            raise FileExistsError(f'"{new_name}" already exists')
+        self.run(f'renaming "{name}"', rename_saves, [(self.item_path(name), self.item_path(new_name))], self.integrity)
+        self.replace(name, new_name)
+        self.save_order()
+        self.changed()
+        return new_name
+
+    def item_paths(self, names):
+        # checks every name before anything is done
+        for name in names:
+            if name not in self.order:
+                raise FileNotFoundError(f'"{name}" does not exist')
+        return [self.item_path(name) for name in names]
+
+    def delete(self, *names):
+        self.item_paths(names)
+        self._delete(names)
+        self.forget(names)
+
+    def forget(self, names):
+        self.discard(names)
+        self.save_order()
+        self.changed()
+
+    def discard(self, names):
+        # the names are removed from the order in one pass, nothing is done on disk
+        if len(names) == 1:
+            self.order.remove(names[0])
+        else:
+            self.order.remove_all(names)
+        for name in names:
+            self.entries.pop(name, None)
+        if self.imports is not None:
+            self.imports.forget(names)
+        self.notify(removed=names)
+
+    def number(self):
+        if self.manifest is not None:
+            self.set_numbering(True)
+        else:
+            self._rename_all('numbering', number_names(self.order.names))
+
+    def renumber(self):
+        if self.manifest is not None:
+            self.set_numbering(True)
+        else:
+            self._rename_all('renumbering', renumber_names(self.order.names))
+
+    def reverse_numbering(self):
+        if self.manifest is not None:
+            self.set_numbering(False)
+        else:
+            self._rename_all('removing the numbers', unnumber_names(self.order.names))
+
+    def set_numbering(self, numbered):
+        # the numbers are only displayed, nothing is renamed on disk
+        if self.manifest.numbered != numbered:
+            self.manifest.numbered = numbered
+            self.save_order()
+
+    def check_movable(self):
+        if self.manifest is None and self.settings.sorting_type in FILE_SORTS:
+            raise ValueError(f'the items are sorted by {self.settings.sorting_type}, they cannot be moved')
+
+    def move(self, name, position):
+        self.item_paths([name])
+        self.check_movable()
+        i = self.order.position(name)
+        j = max(0, min(position, len(self.order) - 1))
+        if i == j:
+            return
+        if self.manifest is None:  # the numbers of the moved items are their new positions
+            start, names = moved_range(self.order.names, i, j)
+            if not all(split_number(name)[0] for name in names):
+                raise ValueError('the items have to be numbered to be moved')
+            if not self.order.sorted:  # a sorted order follows the new names
+                self.order.move(i, j)
+            length = len(str(len(self.order)))
+            new_names = ['{:0>{}} '.format(k + 1, length) + split_number(name)[1] for k, name in enumerate(names, start)]
+            self.run('moving', rename_saves, [(self.item_path(name), self.item_path(new_name)) for name, new_name in zip(names, new_names)
+                                              if name != new_name], self.integrity)
+            for name, new_name in zip(names, new_names):
+                if name != new_name:
+                    self.replace(name, new_name)
+        else:
+            self.order.move(i, j)
+        self.save_order()
+
+    def swap(self, name, offset):
+        # exchanges an item with the one offset positions away. Without manifest, their numbers are exchanged on disk
+        self.item_paths([name])
+        self.check_movable()
+        i = self.order.position(name)
+        j = i + offset
+        if not 0 <= j < len(self.order):
+            return
+        if self.manifest is None:
+            other = self.order[j]
+            n, base_name = split_number(name)
+            other_n, other_base_name = split_number(other)
+            if not (n and other_n):
+                raise ValueError('the items have to be numbered to be moved')
+            new_name, new_other = f'{other_n} {base_name}', f'{n} {other_base_name}'
+            self.run('moving', rename_saves, [(self.item_path(name), self.item_path(new_name)), (self.item_path(other), self.item_path(new_other))],
+                     self.integrity)
+            if new_name == other:  # the same name, only the files are exchanged
+                return
+            self.replace(name, new_name)
+            self.replace(other, new_other)
+        if not self.order.sorted:  # a sorted order follows the new names
+            self.order.swap(i, j)
+        self.save_order()
+
+    def export_numbering(self):
+        if self.manifest is None:
+            return
+        journal = self.manifest.plan_export()
+        if journal is not None:
+            self.run('writing the numbering', export_journal, self.manifest, journal, self.integrity)
+            self.order = self.manifest.order
+            self._rename_entries(journal['renames'])
+            self.save_imports()
+            self.notify(renames=journal['renames'])
+
+    def changed(self):
+        if self.settings.auto_renumber:
+            self.renumber()
+
+    def add(self, name, entry=None):
+        # a new item, entry is its ItemEntry when its file is not written yet. An overwritten item gets a new key
+        if name in self.order and self.order.sorted:
+            self.order.remove(name)
+            self.entries.pop(name, None)
+        if entry is not None:
+            self.entries[name] = entry
+        if name not in self.order:
+            if self.imports is not None:  # before its key is computed
+                self.imports.stamp(name)
+            self.order.append(name)
+        self.notify(added=[name])
+
+    def add_all(self, names):
+        # items written by another operation, the order is saved and renumbered once
+        for name in names:
+            self.add(name)
+        self.save_order()
+        self.changed()
+
+    def replace(self, name, new_name):
+        entry = self.entries.pop(name, None)
+        if entry is not None:  # a rename keeps the size and the mtime
+            self.entries[new_name] = entry._replace(name=new_name)
+        if self.imports is not None:
+            self.imports.rename([(name, new_name)])
+        self.order.replace(name, new_name)
+        self.notify(renames=[(name, new_name)])
+
+    def _rename_all(self, label, new_names):
+        renames = [(name, new_name) for name, new_name in zip(self.order, new_names) if name != new_name]
+        if not renames:
+            return
+        self.run(label, rename_saves, [(self.item_path(name), self.item_path(new_name)) for name, new_name in renames], self.integrity)
+        self._rename_entries(renames)
+        self.order = self.make_order(new_names)
+        self.save_imports()
+        self.notify(renames=renames)
+
+    def _rename_entries(self, renames):
+        entries = [(new_name, self.entries.pop(name, None)) for name, new_name in renames]
+        self.entries.update((new_name, entry._replace(name=new_name)) for new_name, entry in entries if entry is not None)
+        if self.imports is not None:
+            self.imports.rename(renames)
+
+    def _delete(self, names):
+        raise NotImplementedError
+
+
+class Profile(ItemDirectory):
+    # the saves of a profile
+    def __init__(self, game, name, run=None):
+        # the operations of the profile run with those of the game unless it has its own run
+        path = os.path.join(game.path, name + '.profile')
+        os.makedirs(path, exist_ok=True)
+        super().__init__(game.settings, path, '.sl2', game.dir_index, game.run if run is None else run)
+        self.game = game
+        self.name = name
+        self.store = open_store(self.settings, path)
+        self.integrity = open_integrity(self.settings, path)
+
+    def import_save(self, name, src=None):
+        self.import_saves([(name, src)])
+
+    def import_saves(self, sources):
+        # (name, path of the save) pairs, the live save when the path is None. The order is saved once at the end
+        sources = [(name, self.settings.live_save if src is None else src) for name, src in sources]
+        for name, _ in sources:
+            if name in self.order:  # overwritten, the directory mtime does not change
+                self.dir_index.invalidate(self.path)
+        names = [name for name, _ in sources]
+        for name in names:  # their sizes are known once they are written
+            self.add(name, self.new_entry(name))
+        label = f'importing "{names[0]}"' if len(names) == 1 else f'importing {len(names)} saves'
+        self.run(label, import_snapshots, self.settings, self.store, [(src, self.item_path(name)) for name, src in sources], self.integrity,
+                 on_done=lambda sizes: self.resize(names, sizes))
+        self.save_order()
+        self.changed()
+
+    def resize(self, names, sizes):
+        # the sizes of the written saves, the ones renamed meanwhile are read with the list. A list sorted by size is
+        # ordered again
+        by_size = self.settings.sorting_type == 'size' and self.order.sorted
+        for name, size in zip(names, sizes):
+            entry = self.entries.get(name)
+            if entry is None:
+                continue
+            if by_size:
+                self.add(name, entry._replace(size=size))
+            else:
+                self.entries[name] = entry._replace(size=size)
+        if by_size:
+            self.changed()
+
+    def load(self, name):
+        # returns (copied, seconds)
+        resolve = None if self.store is None else self.store.object_path
+        return load_snapshot(self.game.load_engine, self.item_path(name), self.settings.live_save, resolve, self.integrity)
+
+    def move_to(self, profile, *names):
+        # moves saves to another profile of the game, returns their names there when the move is done at once
+        if profile == self.name or not os.path.isdir(self.game.item_path(profile)):
+            raise FileNotFoundError(f'no other profile "{profile}"')
+        new_names = self.game.run(f'moving {len(names)} saves to "{profile}"', move_snapshots, self.settings, self.store, self.item_paths(names),
+                             self.game.item_path(profile), self.integrity)
+        self.forget(names)
+        return new_names
+
+    def export(self, directory, *names):
+        resolve = None if self.store is None else self.store.object_path
+        export_snapshots(self.item_paths(names), directory, resolve)
+
+    def export_archive(self, archive, workers=None):
+        # returns the number of files written
+        resolve = None if self.store is None else self.store.object_path
+        return export_profile(self.path, archive, resolve, workers=workers)
+
+    def import_archive(self, archive, *names):
+        # every save of the archive, or the given ones, without their numbers. Returns their names in the profile
+        imported = import_archive(self.settings, archive, self.path, self.store, self.integrity, names or None, True)
+        self.add_all(imported)
+        return imported
+
+    def _delete(self, names):
+        label = f'deleting "{names[0]}"' if len(names) == 1 else f'deleting {len(names)} saves'
+        self.run(label, remove_snapshots, self.store, [self.item_path(name) for name in names], self.integrity)
+
+
+class Game(ItemDirectory):
+    # the profiles of a game directory
+    def __init__(self, settings, dir_index=None, run=None, load_engine=None, quota=None):
+        # the load engine and the quota manager of the application are shared by its models of the game
+        super().__init__(settings, settings.ds_path, '.profile', dir_index, run)
+        self.load_engine = LoadEngine() if load_engine is None else load_engine
+        if quota is None:
+            quota = QuotaManager(settings.ds_path, settings.quota, settings.quota_evicts_auto_snapshots)
+        self.quota = quota
+
+    def profile(self, name):
+        if name not in self.order:
+            raise FileNotFoundError(f'no profile "{name}"')
+        return Profile(self, name)
+
+    def current_profile(self):
+        if self.settings.profile == NO_PROFILE:
+            return None
+        return self.profile(self.settings.profile[:-len('.profile')])
+
+    def create_profile(self, name):
+        if name in self.order:
+            raise FileExistsError(f'"{name}" already exists')
+        self.run(f'creating "{name}"', os.mkdir, self.item_path(name))
+        self.add_all([name])
+
+    def import_profile(self, archive, name):
+        # a new profile with every save of the archive, returns the names of the saves
+        if name in self.order:
+            raise FileExistsError(f'"{name}" already exists')
+        imported = import_profile(self.settings, archive, self.item_path(name))
+        self.add_all([name])
+        return imported
+
+    def notify(self, renames=(), added=(), removed=()):
+        # the current profile follows its renames, it is unset when deleted
+        current = self.settings.profile[:-len('.profile')]
+        if self.settings.profile != NO_PROFILE:
+            if current in removed:
+                self.settings.profile = NO_PROFILE
+            else:
+                self.settings.profile = dict(renames).get(current, current) + '.profile'
+        super().notify(renames, added, removed)
+
+    def switch(self, cfg, name, path=CONFIG_PATH):
+        cfg['Main']['profile'] = NO_PROFILE if name is None else name + '.profile'
+        self.settings.profile = cfg['Main']['profile']
+        write_config(cfg, path)
+
+    def enforce_quota(self):
+        # returns the names of what has been removed. The auto-snapshots are deleted by their profiles, the usage is
+        # measured again after each round
+        evicted, planned = self.quota.enforce()
+        while planned:
+            count = len(evicted)
+            for profile, names in planned.items():
+                profile = self.profile(profile)
+                names = [name for name in names if name in profile.order]
+                if names:
+                    profile.delete(*names)
+                    evicted.extend(names)
+            if len(evicted) == count:
+                break
+            self.quota.refresh()
+            planned = self.quota.plan_evictions()
+        return evicted
+
+    def _delete(self, names):
+        for name in names:
+            self.run(f'deleting "{name}"', bury, os.path.join(self.path, name))
@@ -0,0 +1,209 @@
+# -*- coding:Utf-8 -*-
+
+import argparse
+import os
+import sys
+
+from integrity import verify_profiles
+from profile_archive import archive_saves, archive_stem
+from save_core import CONFIG_PATH, NO_PROFILE, Game, Settings, read_config, recompress_profiles, write_config
+from sl2_parser import MetadataCache, read_save_info
+
+
+def profile_of(game, args):
+    if args.profile is not None:
+        return game.profile(args.profile)
+    profile = game.current_profile()
+    if profile is None:
+        raise FileNotFoundError('no current profile, use --profile')
+    return profile
+
+
+def target_of(game, args):
+    # the organising commands apply to the saves of a profile, or to the profiles with --profiles
+    if args.profiles:
+        return [game]
+    if args.all:
+        return [game.profile(name) for name in game.names()]
+    return [profile_of(game, args)]
+
+
+def list_items(directory):
+    for name in directory.display_names():
+        print(name)
+
+
+def run(args, cfg):
+    if args.game is not None:
+        cfg['Main']['game'] = args.game
+    game = Game(Settings(cfg))
+    command = args.command
+
+    if command == 'profiles':
+        list_items(game)
+    elif command == 'create-profile':
+        game.create_profile(args.name)
+    elif command == 'delete-profile':
+        game.delete(*args.names)
+    elif command == 'rename-profile':
+        game.rename(args.name, args.new_name)
+    elif command == 'switch':
+        game.profile(args.name)
+        game.switch(cfg, args.name, args.config)
+
+    elif command == 'saves':
+        profile = profile_of(game, args)
+        if args.metadata:
+            resolve = None if profile.store is None else profile.store.object_path
+            names = profile.display_names()
+            texts = MetadataCache(profile.path).describe_saves([profile.item_path(name) for name in profile.names()], resolve)
+            for name, display_name in zip(profile.names(), names):
+                print(f'{display_name}  {texts.get(profile.item_path(name), "")}'.rstrip())
+        else:
+            list_items(profile)
+    elif command == 'info':
+        profile = profile_of(game, args)
+        info = read_save_info(profile.item_path(args.name), None if profile.store is None else profile.store.object_path)
+        print(f'BND4 version {info.version}, {len(info.entries)} entries')
+        for entry in info.entries:
+            print(f'  {entry.name}: {entry.size} bytes at {entry.offset:#x}')
+        for slot in info.slots:
+            if slot.occupied is None:
+                state = 'encrypted'
+            elif slot.occupied:
+                state = f'{slot.character} SL{slot.level}'
+            else:
+                state = 'empty'
+            print(f'slot {slot.index}: {state}')
+    elif command == 'import':
+        profile = profile_of(game, args)
+        if args.files:
+            profile.import_saves([(os.path.splitext(os.path.basename(path))[0], path) for path in args.names])
+        else:
+            profile.import_saves([(name, None) for name in args.names])
+    elif command == 'load':
+        copied, duration = profile_of(game, args).load(args.name)
+        print(f'{"loaded" if copied else "already loaded"} in {duration * 1000:.1f} ms')
+    elif command == 'rename':
+        profile_of(game, args).rename(args.name, args.new_name)
+    elif command == 'delete':
+        profile_of(game, args).delete(*args.names)
+    elif command == 'move':
+        profile_of(game, args).move(args.name, args.position - 1)
+    elif command == 'move-to':
+        for name, new_name in zip(args.names, profile_of(game, args).move_to(args.target, *args.names)):
+            print(f'{name} -> {args.target}/{new_name}')
+    elif command == 'export':
+        profile_of(game, args).export(args.directory, *args.names)
+
+    elif command == 'export-profile':
+        count = profile_of(game, args).export_archive(args.archive, args.workers)
+        print(f'{count} files written to {args.archive}')
+    elif command == 'import-profile':
+        names = game.import_profile(args.archive, args.name or archive_stem(args.archive))
+        print(f'{len(names)} saves imported')
+    elif command == 'archive-saves':
+        for name in archive_saves(args.archive):
+            print(name)
+    elif command == 'import-archive':
+        for name in profile_of(game, args).import_archive(args.archive, *args.names):
+            print(f'imported {name}')
+
+    elif command in ('number', 'renumber', 'reverse-numbering', 'export-numbering'):
+        method = command.replace('-', '_')
+        for directory in target_of(game, args):
+            getattr(directory, method)()
+
+    elif command == 'enforce-quota':
+        for name in game.enforce_quota():
+            print(f'removed {name}')
+        print(f'{game.quota.usage / (1 << 20):.1f} MB used')
+
+    elif command == 'recompress':
+        def progress(done, total):
+            print(f'\r{done}/{total} snapshots', end='', file=sys.stderr)
+        settings = game.settings
+        saved = recompress_profiles(game.path, settings.compression, settings.compression_level, args.workers, progress)
+        print(file=sys.stderr)
+        print(f'{saved / 1e6:.1f} MB saved')
+
+    elif command == 'verify':
+        problems = verify_profiles(game.path)
+        for profile, name, problem in problems:
+            print(f'{profile}: "{name}" {problem}')
+        print(f'{len(problems)} damaged saves')
+        return 1 if problems else 0
+
+    if game.settings.profile != cfg['Main'].get('profile', NO_PROFILE):  # the current profile was renamed or deleted
+        cfg['Main']['profile'] = game.settings.profile
+        write_config(cfg, args.config)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='savemanager', description='Manage the save files of Dark Souls without the window')
+    parser.add_argument('--config', default=CONFIG_PATH, help='path of config.ini')
+    parser.add_argument('--game', choices=['ds1', 'ds3'], help='game to work on instead of the configured one')
+    parser.add_argument('--profile', help='profile to work on instead of the current one')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    commands.add_parser('profiles', help='list the profiles')
+    commands.add_parser('create-profile', help='create a profile').add_argument('name')
+    commands.add_parser('delete-profile', help='delete profiles, they are kept as former profiles').add_argument('names', nargs='+')
+    command = commands.add_parser('rename-profile', help='rename a profile')
+    command.add_argument('name')
+    command.add_argument('new_name')
+    commands.add_parser('switch', help='make a profile the current one').add_argument('name')
+
+    commands.add_parser('saves', help='list the saves of the profile').add_argument(
+        '--metadata', action='store_true', help='show the characters of the saves')
+    commands.add_parser('info', help='show the entries and the character slots of a save').add_argument('name')
+    command = commands.add_parser('import', help='import the live save under each name, or save files with --files')
+    command.add_argument('names', nargs='+')
+    command.add_argument('--files', action='store_true', help='the arguments are save files, named after their file names')
+    commands.add_parser('load', help='load a save into the game').add_argument('name')
+    command = commands.add_parser('rename', help='rename a save')
+    command.add_argument('name')
+    command.add_argument('new_name')
+    commands.add_parser('delete', help='delete saves').add_argument('names', nargs='+')
+    command = commands.add_parser('move', help='move a save to a position, starting at 1')
+    command.add_argument('name')
+    command.add_argument('position', type=int)
+    command = commands.add_parser('move-to', help='move saves to another profile, without their numbers')
+    command.add_argument('target', help='name of the other profile')
+    command.add_argument('names', nargs='+')
+    command = commands.add_parser('export', help='write saves as plain save files into a directory')
+    command.add_argument('directory')
+    command.add_argument('names', nargs='+')
+
+    command = commands.add_parser('export-profile', help='write the saves of the profile into a zip archive')
+    command.add_argument('archive')
+    command.add_argument('--workers', type=int, help='number of compressing threads, one per core by default')
+    command = commands.add_parser('import-profile', help='create a profile with every save of a zip or tar archive')
+    command.add_argument('archive')
+    command.add_argument('--name', help='name of the profile, the name of the archive by default')
+    commands.add_parser('archive-saves', help='list the saves of a zip or tar archive').add_argument('archive')
+    command = commands.add_parser('import-archive', help='import saves of a zip or tar archive into the profile, all of them by default')
+    command.add_argument('archive')
+    command.add_argument('names', nargs='*')
+
+    for name in ('number', 'renumber', 'reverse-numbering', 'export-numbering'):
+        command = commands.add_parser(name, help=f'{name.replace("-", " ")} the saves of the profile')
+        group = command.add_mutually_exclusive_group()
+        group.add_argument('--profiles', action='store_true', help='apply to the list of profiles')
+        group.add_argument('--all', action='store_true', help='apply to the saves of every profile')
+
+    commands.add_parser('enforce-quota', help='evict what the storage quota allows until the usage is under the budget')
+    commands.add_parser('recompress', help='rewrite the snapshots of every profile with the configured compression').add_argument(
+        '--workers', type=int, help='number of compressing processes, one per core by default')
+    commands.add_parser('verify', help='check the saves of every profile against their recorded digests')
+
+    args = parser.parse_args(argv)
+    try:
+        return run(args, read_config(args.config)) or 0
+    except (OSError, KeyError, ValueError) as error:
+        print(f'savemanager: {error}', file=sys.stderr)
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,167 @@
+# -*- coding:Utf-8 -*-
+
+import json
+import mmap
+import os
+import struct
+from collections import namedtuple
+
+from order_manifest import write_json_atomically
+from snapshot_codec import iter_raw, read_header
+
+BND4_MAGIC = b'BND4'
+BND4_HEADER = struct.Struct('<4s8xiq8sqq?B')  # magic, entry count, header size, version, entry header size, data start, unicode, format
+BND4_ENTRY = struct.Struct('<8xqII')  # start of an entry header: size, data offset, name offset
+SLOT_PREFIX = 'USER_DATA'  # USER_DATA000 to USER_DATA009 are the character slots, the others are the system data
+SLOT_COUNT = 10
+
+# character data of the slots of the unencrypted Dark Souls (Prepare to Die) saves, DS3 and DS1 Remastered encrypt them
+DS1_NAME_OFFSET = 0x100
+DS1_NAME_LENGTH = 14  # UTF-16 characters, with the terminating null
+DS1_LEVEL_OFFSET = 0x88
+DS1_MAX_LEVEL = 713
+
+METADATA_NAME = '.metadata.json'
+
+Entry = namedtuple('Entry', 'name offset size')
+Slot = namedtuple('Slot', 'index offset size occupied character level')  # occupied, character and level are None when encrypted
+SaveInfo = namedtuple('SaveInfo', 'version entries slots')
+
+
+def read_name(buffer, offset, unicode):
+    if unicode:
+        end = offset
+        while buffer[end:end + 2] not in (b'\0\0', b''):
+            end += 2
+        return bytes(buffer[offset:end]).decode('utf-16-le')
+    end = buffer.find(b'\0', offset)
+    return bytes(buffer[offset:end]).decode('shift_jis')
+
+
+def parse_bnd4(buffer):
+    # the entries of a BND4 container, only the header and the entry table are read
+    if len(buffer) < BND4_HEADER.size or buffer[:4] != BND4_MAGIC:
+        raise ValueError('not a BND4 container')
+    _, count, header_size, version, entry_size, _, unicode, _ = BND4_HEADER.unpack_from(buffer)
+    if count < 0 or entry_size < BND4_ENTRY.size or header_size + count * entry_size > len(buffer):
+        raise ValueError('truncated BND4 entry table')
+
+    entries = []
+    for i in range(count):
+        size, offset, name_offset = BND4_ENTRY.unpack_from(buffer, header_size + i * entry_size)
+        if offset + size > len(buffer) or name_offset >= len(buffer):
+            raise ValueError(f'entry {i} is outside of the file')
+        entries.append(Entry(read_name(buffer, name_offset, unicode), offset, size))
+    return version.rstrip(b'\0').decode('ascii', 'replace'), entries
+
+
+def read_ds1_character(buffer, entry):
+    # (name, level), None when the data does not look like a plain character
+    if entry.size < DS1_NAME_OFFSET + DS1_NAME_LENGTH * 2:
+        return None
+    start = entry.offset + DS1_NAME_OFFSET
+    name = bytes(buffer[start:start + DS1_NAME_LENGTH * 2]).decode('utf-16-le', 'replace').split('\0', 1)[0]
+    level, = struct.unpack_from('<I', buffer, entry.offset + DS1_LEVEL_OFFSET)
+    if not name.isprintable() or '\ufffd' in name or not 1 <= level <= DS1_MAX_LEVEL:
+        return None
+    return name, level
+
+
+def parse_save(buffer):
+    version, entries = parse_bnd4(buffer)
+    slots = []
+    for entry in entries:
+        if not entry.name.startswith(SLOT_PREFIX) or not entry.name[len(SLOT_PREFIX):].isdecimal():
+            continue
+        index = int(entry.name[len(SLOT_PREFIX):])
+        if index >= SLOT_COUNT:
+            continue
+        character = read_ds1_character(buffer, entry)
+        if character is not None:
+            slots.append(Slot(index, entry.offset, entry.size, bool(character[0]), *character))
+        elif not any(buffer[entry.offset:entry.offset + min(entry.size, 4096)]):  # never written
+            slots.append(Slot(index, entry.offset, entry.size, False, None, None))
+        else:
+            slots.append(Slot(index, entry.offset, entry.size, None, None, None))
+    return SaveInfo(version, entries, slots)
+
+
+def read_save_info(path, resolve=None):
+    # a raw save is memory-mapped, so only the pages of the header, the entry table and the slot headers are read.
+    # A compressed snapshot is decompressed in memory
+    if read_header(path) is not None:
+        return parse_save(b''.join(iter_raw(path, resolve)))
+    with open(path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            raise ValueError('empty file')
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            return parse_save(buffer)
+
+
+def describe(info):
+    # short text for the list: the characters of the plain slots
+    characters = [f'{slot.character} SL{slot.level}' for slot in info.slots if slot.character]
+    if not characters:
+        return ''
+    if len(characters) > 2:
+        return ', '.join(characters[:2]) + f' +{len(characters) - 2}'
+    return ', '.join(characters)
+
+
+def info_to_json(info):
+    return {'version': info.version, 'entries': [list(entry) for entry in info.entries], 'slots': [list(slot) for slot in info.slots]}
+
+
+def info_from_json(data):
+    return SaveInfo(data['version'], [Entry(*entry) for entry in data['entries']], [Slot(*slot) for slot in data['slots']])
+
+
+class MetadataCache:
+    # the parsed metadata of the saves of a profile, kept in a sidecar file. The entries are keyed by size and mtime,
+    # which a rename keeps, so renumbering does not parse anything again
+    def __init__(self, directory):
+        self.path = os.path.join(directory, METADATA_NAME)
+        self.changed = False
+        try:
+            with open(self.path, encoding='utf8') as file:
+                self.entries = json.load(file)
+        except (FileNotFoundError, ValueError):
+            self.entries = dict()  # 'size:mtime_ns' -> metadata, None when the file could not be parsed
+
+    def get(self, path, st=None, resolve=None):
+        if st is None:
+            st = os.stat(path)
+        key = f'{st.st_size}:{st.st_mtime_ns}'
+        if key not in self.entries:
+            try:
+                self.entries[key] = info_to_json(read_save_info(path, resolve))
+            except (ValueError, struct.error, UnicodeDecodeError):
+                self.entries[key] = None
+            self.changed = True
+        data = self.entries[key]
+        return None if data is None else info_from_json(data)
+
+    def prune(self, versions):
+        # keeps the entries of the given (size, mtime_ns) pairs only, the sidecar is written when some are dropped
+        keys = {f'{size}:{mtime}' for size, mtime in versions}
+        if any(key not in keys for key in self.entries):
+            self.entries = {key: data for key, data in self.entries.items() if key in keys}
+            self.changed = True
+            self.save()
+
+    def save(self):
+        if self.changed:
+            write_json_atomically(self.path, self.entries)
+            self.changed = False
+
+    def describe_saves(self, paths, resolve=None):
+        # {path: text for the list}, the sidecar is written once at the end
+        texts = dict()
+        for path in paths:
+            try:
+                info = self.get(path, resolve=resolve)
+            except FileNotFoundError:
+                continue
+            texts[path] = '' if info is None else describe(info)
+        self.save()
+        return texts
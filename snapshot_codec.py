@@ -0,0 +1,230 @@
+# -*- coding:Utf-8 -*-
+
+import lzma
+import os
+import struct
+import tempfile
+import zlib
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from hashing import CHUNK_SIZE, DIGEST_SIZE, file_digest, new_hash
+
+MAGIC = b'SMZ\x01'
+HEADER = struct.Struct(f'<4sBBQ{DIGEST_SIZE}s')  # magic, method, level, size and digest of the raw snapshot
+METHODS = {'zlib': 1, 'lzma': 2, 'delta': 3}
+METHOD_NAMES = {number: name for name, number in METHODS.items()}
+DELTA = struct.Struct(f'<{DIGEST_SIZE}sHI')  # after the header of a delta: digest of the base, length of the chain, block size
+BLOCK = struct.Struct('<I')  # index of a block that differs from the base, followed by the block
+BLOCK_SIZE = 4096
+
+SnapshotHeader = namedtuple('SnapshotHeader', 'method level size digest')
+DeltaHeader = namedtuple('DeltaHeader', 'base depth block_size')
+
+
+def read_header(path):
+    # None when the file is a raw snapshot
+    with open(path, 'rb') as file:
+        data = file.read(HEADER.size)
+    if len(data) < HEADER.size or not data.startswith(MAGIC):
+        return None
+    _, method, level, size, digest = HEADER.unpack(data)
+    return SnapshotHeader(METHOD_NAMES[method], level, size, digest.hex())
+
+
+def content_digest(path, st=None):
+    # digest of the raw snapshot, whether it is stored compressed or not
+    header = read_header(path)
+    if header is not None:
+        return header.digest
+    return file_digest(path, st)
+
+
+def _compressor(method, level):
+    if method == 'zlib':
+        return zlib.compressobj(level)
+    return lzma.LZMACompressor(preset=level)
+
+
+def _decompressor(method):
+    if method == 'zlib':
+        return zlib.decompressobj()
+    return lzma.LZMADecompressor()
+
+
+def iter_raw(path, resolve=None):
+    # chunks of the raw snapshot, decompressed on the fly. resolve gives the path of a snapshot from its digest,
+    # it is needed to rebuild a delta from its bases
+    with open(path, 'rb') as file:
+        data = file.read(HEADER.size)
+        if len(data) < HEADER.size or not data.startswith(MAGIC):
+            yield data
+            yield from iter(lambda: file.read(CHUNK_SIZE), b'')
+            return
+        method = METHOD_NAMES[data[len(MAGIC)]]
+        if method == 'delta':
+            if resolve is None:
+                raise ValueError(f'{path} is a delta, its base is unknown')
+            yield reconstruct(path, resolve)
+            return
+        decompressor = _decompressor(method)
+        for chunk in iter(lambda: file.read(CHUNK_SIZE), b''):
+            yield decompressor.decompress(chunk)
+        if method == 'zlib':
+            yield decompressor.flush()
+
+
+def write_snapshot(chunks, file, method, level):
+    # writes the chunks compressed with a header, or raw when method is None. Returns the header
+    h = new_hash()
+    size = 0
+    if method is None:
+        for chunk in chunks:
+            h.update(chunk)
+            file.write(chunk)
+            size += len(chunk)
+        return SnapshotHeader(None, 0, size, h.hexdigest())
+
+    start = file.tell()
+    file.write(bytes(HEADER.size))
+    compressor = _compressor(method, level)
+    for chunk in chunks:
+        h.update(chunk)
+        size += len(chunk)
+        file.write(compressor.compress(chunk))
+    file.write(compressor.flush())
+    end = file.tell()
+
+    header = SnapshotHeader(method, level, size, h.hexdigest())
+    file.seek(start)
+    file.write(HEADER.pack(MAGIC, METHODS[method], level, size, bytes.fromhex(header.digest)))
+    file.seek(end)
+    return header
+
+
+def compress_file(src, dst, method, level):
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        return write_snapshot(iter(lambda: fsrc.read(CHUNK_SIZE), b''), fdst, method, level)
+
+
+def decompress_file(src, dst, resolve=None):
+    # streams the raw snapshot into dst, which is rewritten in place
+    size = 0
+    with open(dst, 'wb') as fdst:
+        for chunk in iter_raw(src, resolve):
+            fdst.write(chunk)
+            size += len(chunk)
+    return size
+
+
+def encode_delta(data, digest, base, base_digest, depth, level, block_size=BLOCK_SIZE):
+    # the blocks of data that differ from the base, compressed with zlib
+    view, base_view = memoryview(data), memoryview(base)
+    compressor = zlib.compressobj(level)
+    parts = [HEADER.pack(MAGIC, METHODS['delta'], level, len(data), bytes.fromhex(digest)),
+             DELTA.pack(bytes.fromhex(base_digest), depth, block_size)]
+    for start in range(0, len(data), block_size):
+        block = view[start:start + block_size]
+        if block != base_view[start:start + block_size]:
+            parts.append(compressor.compress(BLOCK.pack(start // block_size)))
+            parts.append(compressor.compress(block))
+    parts.append(compressor.flush())
+    return b''.join(parts)
+
+
+def read_delta(path):
+    with open(path, 'rb') as file:
+        file.seek(HEADER.size)
+        base, depth, block_size = DELTA.unpack(file.read(DELTA.size))
+    return DeltaHeader(base.hex(), depth, block_size)
+
+
+def apply_delta(path, base):
+    with open(path, 'rb') as file:
+        _, _, _, size, _ = HEADER.unpack(file.read(HEADER.size))
+        _, _, block_size = DELTA.unpack(file.read(DELTA.size))
+        blocks = zlib.decompress(file.read())
+
+    data = bytearray(size)
+    length = min(size, len(base))
+    data[:length] = base[:length]
+    offset = 0
+    while offset < len(blocks):
+        (index,) = BLOCK.unpack_from(blocks, offset)
+        offset += BLOCK.size
+        start = index * block_size
+        length = min(block_size, size - start)
+        data[start:start + length] = blocks[offset:offset + length]
+        offset += length
+    return data
+
+
+def reconstruct(path, resolve):
+    # follows the chain of bases down to the keyframe, then applies the deltas back up
+    chain = []
+    header = read_header(path)
+    while header is not None and header.method == 'delta':
+        chain.append(path)
+        path = resolve(read_delta(path).base)
+        header = read_header(path)
+    data = b''.join(iter_raw(path))
+    for path in reversed(chain):
+        data = apply_delta(path, data)
+    return data
+
+
+def recompress(paths, method, level):
+    # paths are hard links to the same snapshot, they are all replaced by the new file. Returns the bytes saved
+    first = paths[0]
+    header = read_header(first)
+    if header is None and method is None or header is not None and header[:2] == (method, level):
+        return 0
+    if header is not None and header.method == 'delta':  # the deltas are already small and their bases are elsewhere
+        return 0
+    before = os.stat(first).st_size
+
+    directory = os.path.dirname(first)
+    fd, tmp = tempfile.mkstemp(suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            new_header = write_snapshot(iter_raw(first), file, method, level)
+            file.flush()
+            os.fsync(file.fileno())
+        if header is not None and new_header.digest != header.digest:
+            raise ValueError(f'{first} is corrupted')
+        os.replace(tmp, first)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+    for path in paths[1:]:
+        tmp = os.path.join(os.path.dirname(path), f'.{os.path.basename(path)}.link')
+        try:
+            os.link(first, tmp)
+        except OSError:  # no hard links on this filesystem
+            continue
+        os.replace(tmp, path)
+    return before - os.stat(first).st_size
+
+
+def linked_groups(paths):
+    # groups the paths by the file they point to, so a snapshot shared by hard links is compressed once
+    groups = dict()
+    for path in paths:
+        st = os.stat(path)
+        groups.setdefault((st.st_dev, st.st_ino), []).append(path)
+    return list(groups.values())
+
+
+def recompress_all(paths, method, level, workers=None, progress=None):
+    # the snapshots are compressed in parallel processes, progress is called with (done, total)
+    groups = linked_groups(paths)
+    saved = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(recompress, group, method, level) for group in groups]
+        for done, future in enumerate(as_completed(futures), 1):
+            saved += future.result()
+            if progress is not None:
+                progress(done, len(groups))
+    return saved
@@ -0,0 +1,258 @@
+# -*- coding:Utf-8 -*-
+
+import os
+import tempfile
+import threading
+from shutil import copyfile
+
+from hashing import CHUNK_SIZE, file_digest, forget_digest, new_hash, remember_digest
+from snapshot_codec import content_digest, decompress_file, encode_delta, read_delta, read_header, reconstruct, write_snapshot
+
+STORE_DIRECTORY = '.savestore'  # name of the stores in the game directory and in the profiles
+HEAD_NAME = 'HEAD'  # digest of the last object written, the base of the next delta
+
+_locks = dict()  # root path -> lock, the profiles of a game share its store from several I/O threads
+_locks_lock = threading.Lock()
+UMASK = os.umask(0)  # read once while the modules are imported, setting it is not thread safe
+os.umask(UMASK)
+
+_delta_bases = dict()  # root path -> {object digest: digest of its base, None for a whole object}, used under the lock
+
+
+def store_key(root_path):
+    return os.path.normcase(os.path.abspath(root_path))
+
+
+def store_lock(root_path):
+    with _locks_lock:
+        return _locks.setdefault(store_key(root_path), threading.RLock())
+
+
+class SnapshotStore:
+    # every snapshot is stored once under <root>/<xx>/<digest>, the saves of the profiles are hard links to it.
+    # With a keyframe interval, a new object is stored as the blocks that differ from the previous one
+    def __init__(self, root_path, method=None, level=6, keyframe_interval=0):
+        self.root_path = root_path
+        self.method = method  # compression of the new objects, None to store them raw
+        self.level = level
+        self.keyframe_interval = keyframe_interval  # a full object every n objects, 0 to never store deltas
+        self.head_path = os.path.join(root_path, HEAD_NAME)
+        self._last = None  # (digest, raw bytes) of the last object written, to encode the next delta without rebuilding it
+        self.lock = store_lock(root_path)  # an object is never collected between its writing and its linking
+        os.makedirs(root_path, exist_ok=True)
+
+    def object_path(self, digest):
+        return os.path.join(self.root_path, digest[:2], digest)
+
+    def add(self, src, dest):
+        digest = file_digest(src)
+        with self.lock:
+            obj = self.object_path(digest)
+            if not os.path.exists(obj):
+                digest = self._write_object(src)
+                obj = self.object_path(digest)
+
+            self._link(obj, dest)
+        return digest
+
+    def remove(self, path):
+        self.remove_all([path])
+
+    def remove_all(self, paths):
+        # the objects are released once all the saves are removed, the store is collected once
+        with self.lock:
+            digests = []
+            for path in paths:
+                st = os.stat(path)
+                digests.append(content_digest(path, st) if st.st_nlink > 1 else None)
+                os.remove(path)
+                forget_digest(path)
+            if os.path.exists(self.head_path):  # the objects may be the bases of deltas
+                self._release_deltas([digest for digest in digests if digest is not None])
+                return
+            for digest in digests:
+                if digest is not None:
+                    self._release(digest)
+
+    def collect(self):
+        with self.lock:
+            return self._collect()
+
+    def _collect(self):
+        # removes the objects that are not linked anymore, unless a linked delta is built on them
+        objects = dict()  # digest -> (path, stat)
+        for subdir in os.scandir(self.root_path):
+            if not subdir.is_dir():
+                continue
+            for entry in os.scandir(subdir.path):
+                objects[entry.name] = entry.path, os.stat(entry.path)  # the link count of a DirEntry is 0 on Windows
+
+        live = [digest for digest, (_, st) in objects.items() if st.st_nlink > 1]
+        kept = set(live)
+        while live:
+            path = objects[live.pop()][0]
+            header = read_header(path)
+            if header is not None and header.method == 'delta':
+                base = read_delta(path).base
+                if base not in kept and base in objects:
+                    kept.add(base)
+                    live.append(base)
+
+        freed = 0
+        for digest, (path, st) in objects.items():
+            if digest not in kept:
+                os.remove(path)
+                forget_digest(path)
+                freed += st.st_size
+        return freed
+
+    def _write_object(self, src):
+        # the object is named after what has actually been copied, in case the source changed after hashing
+        if self.keyframe_interval:
+            return self._write_delta_object(src)
+
+        fd, tmp = tempfile.mkstemp(suffix='.tmp', dir=self.root_path)
+        try:
+            with open(src, 'rb') as fsrc, os.fdopen(fd, 'wb') as fdst:
+                digest = write_snapshot(iter(lambda: fsrc.read(CHUNK_SIZE), b''), fdst, self.method, self.level).digest
+            self._commit_object(tmp, digest)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+        if self.method is None:  # the digest of a compressed object is not the digest of its bytes
+            remember_digest(self.object_path(digest), digest)
+        return digest
+
+    def _write_delta_object(self, src):
+        with open(src, 'rb') as file:
+            data = file.read()
+        h = new_hash()
+        h.update(data)
+        digest = h.hexdigest()
+
+        content = None
+        base = self._delta_base()
+        if base is not None:
+            base_digest, depth = base
+            if self._last is not None and self._last[0] == base_digest:
+                base_data = self._last[1]
+            else:
+                base_data = reconstruct(self.object_path(base_digest), self.object_path)
+            content = encode_delta(data, digest, base_data, base_digest, depth + 1, self.level)
+            if len(content) > len(data) // 2:  # too different, a keyframe costs about the same
+                content = None
+
+        fd, tmp = tempfile.mkstemp(suffix='.tmp', dir=self.root_path)
+        try:
+            with os.fdopen(fd, 'wb') as fdst:
+                if content is None:
+                    write_snapshot([data], fdst, self.method, self.level)
+                else:
+                    fdst.write(content)
+            self._commit_object(tmp, digest)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+        fd, tmp = tempfile.mkstemp(suffix='.tmp', dir=self.root_path)
+        with os.fdopen(fd, 'w', encoding='utf8') as file:
+            file.write(digest)
+        os.replace(tmp, self.head_path)
+        self._last = digest, data
+        return digest
+
+    def _delta_base(self):
+        # (digest, length of its chain) of the last object, None when the next object has to be a keyframe
+        try:
+            with open(self.head_path, encoding='utf8') as file:
+                digest = file.read().strip()
+            header = read_header(self.object_path(digest))
+        except (FileNotFoundError, ValueError):
+            return None
+        depth = read_delta(self.object_path(digest)).depth if header is not None and header.method == 'delta' else 0
+        if depth + 1 >= self.keyframe_interval:
+            return None
+        return digest, depth
+
+    def _commit_object(self, tmp, digest):
+        # the saves are links to the object, it gets the permissions of a new file instead of the private ones of mkstemp
+        obj = self.object_path(digest)
+        os.makedirs(os.path.dirname(obj), exist_ok=True)
+        if os.path.exists(obj):
+            os.remove(tmp)
+        else:
+            os.chmod(tmp, 0o666 & ~UMASK)
+            os.replace(tmp, obj)
+
+    def _link(self, obj, dest):
+        # never write into an existing save: it may be another link to a stored object
+        if os.path.lexists(dest):
+            os.remove(dest)
+            forget_digest(dest)
+        try:
+            os.link(obj, dest)
+        except OSError:  # no hard links on this filesystem
+            header = read_header(obj)
+            if header is not None and header.method == 'delta':  # a copy has to stand on its own
+                decompress_file(obj, dest, self.object_path)
+            else:
+                copyfile(obj, dest)
+
+    def _bases(self):
+        # the header of an object is read once, the names listed complete the map with the objects written since by
+        # any store or process and drop the ones removed
+        bases = _delta_bases.setdefault(store_key(self.root_path), dict())
+        listed = set()
+        for subdir in os.scandir(self.root_path):
+            if subdir.is_dir():
+                listed.update(os.listdir(subdir.path))
+        for digest in [digest for digest in bases if digest not in listed]:
+            del bases[digest]
+        for digest in listed - bases.keys():
+            try:
+                header = read_header(self.object_path(digest))
+                bases[digest] = read_delta(self.object_path(digest)).base if header is not None and header.method == 'delta' else None
+            except (FileNotFoundError, ValueError):  # being written by another process
+                continue
+        return bases
+
+    def _release_deltas(self, digests):
+        # the objects of the removed saves are removed unless a linked delta is built on them, then their bases
+        bases = self._bases()
+        children = dict()
+        for digest, base in bases.items():
+            if base is not None:
+                children.setdefault(base, []).append(digest)
+
+        def needed(digest):
+            try:
+                if os.stat(self.object_path(digest)).st_nlink > 1:
+                    return True
+            except FileNotFoundError:
+                return False
+            return any(needed(child) for child in children.get(digest, ()))
+
+        pending = list(digests)
+        while pending:
+            digest = pending.pop()
+            if digest not in bases or needed(digest):
+                continue
+            obj = self.object_path(digest)
+            os.remove(obj)
+            forget_digest(obj)
+            base = bases.pop(digest)
+            if base is not None:
+                children[base].remove(digest)
+                pending.append(base)
+
+    def _release(self, digest):
+        obj = self.object_path(digest)
+        try:
+            if os.stat(obj).st_nlink <= 1:
+                os.remove(obj)
+                forget_digest(obj)
+        except FileNotFoundError:
+            pass
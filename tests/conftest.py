@@ -0,0 +1,25 @@
+# -*- coding:Utf-8 -*-
+
+import os
+import sys
+from configparser import ConfigParser
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from save_core import Settings  # noqa: E402
+
+
+@pytest.fixture
+def make_settings(tmp_path):
+    # Settings of a ds3 game directory in tmp_path, with the given options of [Main]
+    def make(**options):
+        ds_path = tmp_path / 'ds'
+        ds_path.mkdir(exist_ok=True)
+        cfg = ConfigParser()
+        cfg['Main'] = {'game': 'ds3', 'ds3_path': str(ds_path), 'ds1_path': str(ds_path), 'profile': 'no profile'}
+        cfg['Main'].update({key: str(value) for key, value in options.items()})
+        return Settings(cfg)
+    return make
+
@@ -0,0 +1,69 @@
+# -*- coding:Utf-8 -*-
+
+import os
+import time
+
+from auto_snapshot import AutoSnapshotter, auto_time, is_auto_name
+from hashing import stat_key
+
+
+def write(path, data):
+    with open(path, 'wb') as file:
+        file.write(data)
+    os.utime(path, ns=(time.time_ns(), time.time_ns()))  # distinct mtimes on coarse clocks
+
+
+def wait_for(condition, timeout=5):
+    end = time.monotonic() + timeout
+    while not condition() and time.monotonic() < end:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_auto_names():
+    assert is_auto_name('3 auto 2026-01-02 10.00.00') and not is_auto_name('autosave')
+    assert auto_time('3 auto 2026-01-02 10.00.00') < auto_time('auto 2026-01-02 10.00.01')
+    assert auto_time("auto 2026-01-02 10.00.00'") is None
+
+
+def test_one_snapshot_once_the_writes_settle(tmp_path):
+    path = str(tmp_path / 'live.sl2')
+    write(path, b'0')
+    calls = []
+    watcher = AutoSnapshotter(path, lambda: calls.append(time.monotonic()), interval=0.01, debounce=0.2, min_interval=0)
+    watcher.start()
+    try:
+        time.sleep(0.05)
+        for i in range(5):  # a save written in several steps
+            time.sleep(0.03)
+            write(path, bytes([i]) * (i + 2))
+        last_write = time.monotonic()
+        assert wait_for(lambda: calls)
+        assert calls[0] - last_write >= 0.19
+        time.sleep(0.3)
+        assert len(calls) == 1
+    finally:
+        watcher.stop()
+
+
+def test_min_interval_and_ignored_writes(tmp_path):
+    path = str(tmp_path / 'live.sl2')
+    write(path, b'0')
+    calls = []
+    ignored = set()
+    watcher = AutoSnapshotter(path, lambda: calls.append(1), interval=0.01, debounce=0.05, min_interval=60,
+                              is_ignored=lambda key: key in ignored)
+    watcher.start()
+    try:
+        time.sleep(0.05)
+        write(path, b'loaded')  # the manager's own write
+        ignored.add(stat_key(os.stat(path)))
+        time.sleep(0.3)
+        assert calls == []
+        write(path, b'saved by the game')
+        assert wait_for(lambda: calls)
+        write(path, b'saved again')
+        time.sleep(0.3)
+        assert calls == [1]
+    finally:
+        watcher.stop()
@@ -0,0 +1,34 @@
+# -*- coding:Utf-8 -*-
+
+import threading
+import time
+
+from fs_watcher import DirectoryWatcher
+
+
+def test_the_watcher_reports_the_new_items_and_stops(tmp_path):
+    reported = []
+    event = threading.Event()
+    def changed(names):
+        reported.append(names)
+        event.set()
+    watcher = DirectoryWatcher(str(tmp_path), '.sl2', changed, interval=0.01)
+    watcher.start()
+    time.sleep(0.1)  # the polling reads the first listing
+    (tmp_path / 'a.sl2').write_bytes(b'a')
+    (tmp_path / '.hidden.sl2').write_bytes(b'h')
+    assert event.wait(5)
+    watcher.stop()
+    assert watcher.thread is None and watcher.wake_pipe is None
+    assert all(names is None or names <= {'a'} for names in reported)
+    assert any(names is None or 'a' in names for names in reported)
+    watcher.stop()
+
+
+def test_stopping_while_events_come(tmp_path):
+    for i in range(50):
+        watcher = DirectoryWatcher(str(tmp_path), '.sl2', lambda names: None, interval=0.01)
+        watcher.start()
+        (tmp_path / f'{i}.sl2').write_bytes(b'x')
+        watcher.stop()
+        assert watcher.wake_pipe is None
@@ -0,0 +1,64 @@
+# -*- coding:Utf-8 -*-
+
+import os
+
+import pytest
+
+import integrity
+from integrity import IntegrityError, IntegrityIndex, verify_profiles
+from save_core import Game
+
+
+def test_import_saves_writes_the_index_once(make_settings, monkeypatch):
+    settings = make_settings(verify_saves='true')
+    game = Game(settings)
+    game.create_profile('p')
+    profile = game.profile('p')
+    sources = []
+    for i in range(20):
+        src = os.path.join(settings.ds_path, f'{i}.src')
+        with open(src, 'wb') as file:
+            file.write(b'BND4' + bytes([i]) * 1000)
+        sources.append((f's{i}', src))
+
+    saves = []
+    save = IntegrityIndex.save
+    monkeypatch.setattr(IntegrityIndex, 'save', lambda self: saves.append(self.path) or save(self))
+    profile.import_saves(sources)
+    assert len(saves) == 1
+    assert len(IntegrityIndex(profile.path).entries) == 20
+
+    with open(profile.item_path('s3'), 'r+b') as file:
+        file.write(b'XXXX')
+    with pytest.raises(IntegrityError, match='"s3"'):
+        profile.integrity.check(profile.item_path('s3'))
+    assert [(name, problem) for _, name, problem in verify_profiles(settings.ds_path)] == [('s3', 'has been modified since it was imported')]
+
+
+def test_verify_merges_with_the_operations_done_meanwhile(make_settings, monkeypatch):
+    settings = make_settings(verify_saves='true')
+    game = Game(settings)
+    game.create_profile('p')
+    profile = game.profile('p')
+    sources = []
+    for name in 'ab':
+        src = os.path.join(settings.ds_path, name + '.src')
+        with open(src, 'wb') as file:
+            file.write(b'BND4' + name.encode() * 1000)
+        sources.append((name, src))
+    profile.import_saves(sources[:1])
+    with open(profile.item_path('outside'), 'wb') as file:
+        file.write(b'BND4 outside')
+
+    digest = integrity.file_digest
+    def import_while_hashing(path, st=None):
+        result = digest(path, st)
+        if path.endswith('outside.sl2'):  # written again while it is read
+            with open(path, 'ab') as file:
+                file.write(b'more')
+        elif not os.path.exists(profile.item_path('b')):
+            profile.import_saves(sources[1:])
+        return result
+    monkeypatch.setattr(integrity, 'file_digest', import_while_hashing)
+    assert verify_profiles(settings.ds_path, workers=1) == []
+    assert sorted(IntegrityIndex(profile.path).entries) == ['a.sl2', 'b.sl2']
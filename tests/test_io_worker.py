@@ -0,0 +1,44 @@
+# -*- coding:Utf-8 -*-
+
+import os
+import threading
+
+from io_worker import IOExecutor, conflict
+
+
+class Root:
+    # the polling is driven by the tests
+    def after(self, delay, callback):
+        return object()
+
+    def after_cancel(self, poll_id):
+        pass
+
+
+def test_conflict_follows_the_directories():
+    game = os.path.join('ds')
+    profile = os.path.join(game, '1 a.profile')
+    assert conflict(game, profile) and conflict(profile, game)
+    assert not conflict(profile, os.path.join(game, '2 b.profile'))
+    assert not conflict(profile, os.path.join(game, '1 a.profile2'))
+    assert not conflict((game, 'verify'), game)
+
+
+def test_profiles_run_side_by_side_and_the_game_waits():
+    io = IOExecutor(Root())
+    game = os.path.join('ds')
+    first, second = os.path.join(game, '1 a.profile'), os.path.join(game, '2 b.profile')
+    release = threading.Event()
+    done = []
+    io.submit(first, 'slow', release.wait, 5, on_done=lambda _: done.append('slow'))
+    io.submit(second, 'fast', lambda: None, on_done=lambda _: done.append('fast'))
+    io.submit(game, 'game', lambda: None, on_done=lambda _: done.append('game'))
+    io.submit(second, 'after the game', lambda: None, on_done=lambda _: done.append('after the game'))
+
+    while 'fast' not in done:
+        io.process(block=True)
+    assert done == ['fast'] and io.busy(game) and io.busy(second)
+    release.set()
+    io.wait()
+    assert done == ['fast', 'slow', 'game', 'after the game']
+    io.shutdown()
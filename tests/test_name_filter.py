@@ -0,0 +1,37 @@
+# -*- coding:Utf-8 -*-
+
+from name_filter import NameFilter
+
+
+def test_matches_ignore_the_case_and_the_number():
+    names = NameFilter(['1 Boss', '2 boss', '3 Bridge', '12 bonfire'])
+    assert names.matches('boss') == {'1 Boss', '2 boss'}
+    assert names.matches('bo') == {'1 Boss', '2 boss', '12 bonfire'}
+    assert names.matches('1') == set()
+
+
+def test_add_and_remove_follow_the_previous_query():
+    names = NameFilter(['1 alpha', '2 beta'])
+    assert names.matches('alp') == {'1 alpha'}
+    names.add('3 alpine')
+    assert names.matches('alp') == {'1 alpha', '3 alpine'}
+    assert names.matches('alph') == {'1 alpha'}
+    names.remove('1 alpha')
+    assert names.matches('alph') == set()
+    assert names.matches('al') == {'3 alpine'}
+    assert names.matches('alpine') == {'3 alpine'}
+
+
+def test_replace_renumbers_renames_and_exchanges():
+    names = NameFilter(['1 alpha', '2 beta', '3 gamma'])
+    assert names.matches('alpha') == {'1 alpha'}
+    names.replace([('1 alpha', '2 alpha'), ('2 beta', '1 beta')])
+    assert names.matches('alpha') == {'2 alpha'}
+    assert names.matches('beta') == {'1 beta'}
+    names.replace([('2 alpha', '3 gamma'), ('3 gamma', '2 alpha')])
+    assert names.matches('amm') == {'3 gamma'}
+    assert names.matches('alp') == {'2 alpha'}
+    names.replace([('1 beta', '1 delta')])
+    assert names.matches('bet') == set()
+    assert names.matches('del') == {'1 delta'}
+    assert names.matches('a') == {'1 delta', '2 alpha', '3 gamma'}
@@ -0,0 +1,100 @@
+# -*- coding:Utf-8 -*-
+
+import json
+import os
+import threading
+
+import pytest
+
+import order_manifest
+from order_manifest import JOURNAL_NAME, OrderManifest, write_json_atomically
+
+
+def write(directory, names):
+    for name in names:
+        (directory / (name + '.sl2')).write_text(name)
+
+
+def contents(directory):
+    return {name[:-len('.sl2')]: (directory / name).read_text() for name in os.listdir(directory) if name.endswith('.sl2')}
+
+
+def unnumbered(directory, names):
+    manifest = OrderManifest(str(directory), '.sl2')
+    manifest.sync(names)
+    return manifest
+
+
+def test_export_does_not_overwrite_a_displayed_name(tmp_path):
+    write(tmp_path, ['1 a', 'a'])
+    manifest = unnumbered(tmp_path, ['1 a', 'a'])
+    journal = manifest.plan_export()
+    assert journal['renames'] == [['1 a', "a'"]]
+    manifest.apply_journal(journal)
+    assert contents(tmp_path) == {"a'": '1 a', 'a': 'a'}
+    assert OrderManifest(str(tmp_path), '.sl2').order.names == ["a'", 'a']
+
+
+def test_export_refuses_to_rename_onto_another_file(tmp_path):
+    write(tmp_path, ['1 a', 'b'])
+    manifest = unnumbered(tmp_path, ['1 a'])  # b is not in the manifest yet
+    journal = manifest.plan_export()
+    journal['renames'] = [['1 a', 'b']]
+    with pytest.raises(FileExistsError):
+        manifest.apply_journal(journal)
+    assert not (tmp_path / JOURNAL_NAME).exists()
+    assert contents(tmp_path) == {'1 a': '1 a', 'b': 'b'}
+
+
+@pytest.mark.parametrize('failing', [2, 4])  # in the first phase, then in the second one
+def test_interrupted_export_is_completed_when_opened(tmp_path, monkeypatch, failing):
+    names = ['1 a', '2 b', '3 c']
+    write(tmp_path, names)
+    manifest = unnumbered(tmp_path, names)
+    rename = os.rename
+    calls = []
+    def interrupted(src, dst):
+        calls.append(src)
+        if len(calls) == failing:
+            raise OSError('interrupted')
+        rename(src, dst)
+    monkeypatch.setattr(order_manifest.os, 'rename', interrupted)
+    with pytest.raises(OSError):
+        manifest.apply_journal(manifest.plan_export())
+    monkeypatch.setattr(order_manifest.os, 'rename', rename)
+
+    recovered = OrderManifest(str(tmp_path), '.sl2')
+    assert recovered.order.names == ['a', 'b', 'c']
+    assert contents(tmp_path) == {'a': '1 a', 'b': '2 b', 'c': '3 c'}
+    assert not (tmp_path / JOURNAL_NAME).exists()
+
+
+def test_recovery_keeps_a_file_taken_by_an_older_journal(tmp_path):
+    # a journal written without the check of the names, the temporary file would have replaced "a"
+    write(tmp_path, ['a'])
+    (tmp_path / '.0.export').write_text('1 a')
+    journal = {'phase': 2, 'renames': [['1 a', 'a']], 'manifest': {'order': ['a', 'a'], 'numbered': False}}
+    (tmp_path / JOURNAL_NAME).write_text(json.dumps(journal))
+    manifest = OrderManifest(str(tmp_path), '.sl2')
+    assert contents(tmp_path) == {'a': 'a', "a'": '1 a'}
+    assert manifest.order.names == ['a', "a'"]
+
+
+def test_concurrent_writers_never_mix_their_files(tmp_path):
+    path = str(tmp_path / 'index.json')
+    errors = []
+    def write_many(value):
+        try:
+            for _ in range(50):
+                write_json_atomically(path, {'value': [value] * 1000})
+        except OSError as error:  # the temporary file of another thread was moved away
+            errors.append(error)
+    threads = [threading.Thread(target=write_many, args=(value,)) for value in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    with open(path, encoding='utf8') as file:
+        assert len(set(json.load(file)['value'])) == 1
+    assert os.listdir(tmp_path) == ['index.json']
@@ -0,0 +1,122 @@
+# -*- coding:Utf-8 -*-
+
+import json
+import os
+import tarfile
+import zipfile
+
+import pytest
+
+from order_manifest import MANIFEST_NAME, OrderManifest
+from profile_archive import archive_saves, archive_stem, export_profile, import_archive
+from save_core import Game, open_store
+from snapshot_codec import iter_raw
+
+
+def raw(path, resolve=None):
+    return b''.join(iter_raw(path, resolve))
+
+
+def fill_profile(settings, name, saves, manifest_order=None):
+    # imports the saves {name: data} into a new profile of the game, through its store and compression
+    game = Game(settings)
+    game.create_profile(name)
+    profile = game.profile(name)
+    sources = []
+    for save_name, data in saves.items():
+        src = os.path.join(settings.ds_path, save_name + '.src')
+        with open(src, 'wb') as file:
+            file.write(data)
+        sources.append((save_name, src))
+    profile.import_saves(sources)
+    if manifest_order is not None:
+        with open(os.path.join(profile.path, MANIFEST_NAME), 'w', encoding='utf8') as file:
+            json.dump({'order': manifest_order, 'numbered': True}, file)
+    return game, profile
+
+
+SAVES = {'b': b'BND4' + bytes(range(256)) * 64, 'a': b'BND4' + b'\x01' * 20000, 'c': b'BND4' + os.urandom(5000)}
+
+
+def test_round_trip_through_store_and_compression(make_settings, tmp_path):
+    settings = make_settings(deduplicate_saves='true', compression='zlib', order_manifest='true')
+    game, profile = fill_profile(settings, 'source', SAVES, ['c', 'a', 'b'])
+    archive = str(tmp_path / 'source.zip')
+
+    assert profile.export_archive(archive, workers=2) == 4
+    with zipfile.ZipFile(archive) as file:
+        assert file.testzip() is None
+        assert json.loads(file.read(MANIFEST_NAME))['order'] == ['c', 'a', 'b']
+        for name, data in SAVES.items():
+            assert file.read(name + '.sl2') == data  # plain saves, not snapshot containers
+
+    assert sorted(game.import_profile(archive, 'copy')) == ['a', 'b', 'c']
+    copy = game.profile('copy')
+    with open(os.path.join(copy.path, MANIFEST_NAME), 'rb') as file:
+        assert file.read(1) == b'{'
+    assert os.stat(os.path.join(copy.path, MANIFEST_NAME)).st_nlink == 1
+    assert OrderManifest(copy.path, '.sl2').order.names == ['c', 'a', 'b']
+    assert copy.names() == ['c', 'a', 'b']
+    resolve = open_store(settings, copy.path).object_path
+    for name, data in SAVES.items():
+        assert raw(copy.item_path(name), resolve) == data
+
+
+def test_round_trip_with_deltas(make_settings, tmp_path):
+    settings = make_settings(delta_saves='true', compression='lzma', verify_saves='true', order_manifest='true')
+    game, profile = fill_profile(settings, 'source', SAVES, ['b', 'c', 'a'])
+    archive = str(tmp_path / 'source.zip')
+    profile.export_archive(archive)
+
+    game.import_profile(archive, 'copy')
+    copy = game.profile('copy')
+    assert copy.names() == ['b', 'c', 'a']
+    for name, data in SAVES.items():
+        assert raw(copy.item_path(name), copy.store.object_path) == data
+        copy.integrity.check(copy.item_path(name))
+
+
+def test_import_into_a_profile_renames_and_keeps_its_manifest(make_settings, tmp_path):
+    settings = make_settings(order_manifest='true')
+    game, profile = fill_profile(settings, 'source', SAVES, ['a', 'b', 'c'])
+    archive = str(tmp_path / 'source.zip')
+    profile.export_archive(archive)
+    _, target = fill_profile(settings, 'target', {'a': b'other'}, ['a'])
+
+    assert target.import_archive(archive, 'a', 'c') == ["a'", 'c']
+    assert target.names() == ['a', "a'", 'c']
+    assert OrderManifest(target.path, '.sl2').order.names == ['a', "a'", 'c']
+    with pytest.raises(FileNotFoundError):
+        target.import_archive(archive, 'b', 'missing')
+    assert 'b' not in target.names()
+
+
+def test_tar_archives_are_read_with_their_folder(make_settings, tmp_path):
+    settings = make_settings()
+    folder = tmp_path / 'shared.profile'
+    folder.mkdir()
+    for name, data in SAVES.items():
+        (folder / (name + '.sl2')).write_bytes(data)
+    archive = str(tmp_path / 'shared.profile.tar.gz')
+    with tarfile.open(archive, 'w:gz') as file:
+        file.add(str(folder), arcname='shared.profile')
+
+    assert archive_stem(archive) == 'shared'
+    assert sorted(archive_saves(archive)) == ['a', 'b', 'c']
+    target = tmp_path / 'target'
+    target.mkdir()
+    assert import_archive(settings, archive, str(target), names=['b']) == ['b']
+    assert (target / 'b.sl2').read_bytes() == SAVES['b']
+
+
+def test_export_is_deterministic(tmp_path):
+    folder = tmp_path / 'p.profile'
+    folder.mkdir()
+    for name, data in SAVES.items():
+        (folder / (name + '.sl2')).write_bytes(data)
+        os.utime(folder / (name + '.sl2'), ns=(1_600_000_000_000_000_000, 1_600_000_000_000_000_000))
+    first, second = str(tmp_path / '1.zip'), str(tmp_path / '2.zip')
+    export_profile(str(folder), first, workers=1)
+    export_profile(str(folder), second, workers=3)
+    with open(first, 'rb') as a, open(second, 'rb') as b:
+        assert a.read() == b.read()
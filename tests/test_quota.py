@@ -0,0 +1,60 @@
+# -*- coding:Utf-8 -*-
+
+import os
+
+from quota import TOMBSTONE_SUFFIX, QuotaManager, bury
+from save_core import Game
+
+
+def test_bury_gives_each_deletion_its_own_tombstone(tmp_path):
+    for _ in range(2):
+        (tmp_path / 'p.profile').mkdir()
+        (tmp_path / 'p.profile' / 'a.sl2').write_bytes(b'a')
+        bury(str(tmp_path / 'p'))
+    tombstones = sorted(os.listdir(tmp_path))
+    assert len(tombstones) == 2
+    assert all(name.startswith('p~') and name.endswith(TOMBSTONE_SUFFIX) for name in tombstones)
+
+
+def test_enforce_removes_the_oldest_tombstones_first(tmp_path):
+    (tmp_path / 'live.sl2').write_bytes(bytes(1000))
+    for stamp in (3, 1, 2):
+        tombstone = tmp_path / f'p~{stamp}{TOMBSTONE_SUFFIX}'
+        tombstone.mkdir()
+        (tombstone / 'a.sl2').write_bytes(bytes([stamp]) * 1000)
+    quota = QuotaManager(str(tmp_path), 2500)
+    evicted, planned = quota.enforce()
+    assert evicted == [f'p~1{TOMBSTONE_SUFFIX}', f'p~2{TOMBSTONE_SUFFIX}']
+    assert planned == {}
+    assert sorted(os.listdir(tmp_path)) == ['live.sl2', f'p~3{TOMBSTONE_SUFFIX}']
+    assert quota.usage == 2000
+
+
+def test_refresh_sees_a_save_overwritten_in_place(tmp_path):
+    (tmp_path / 'a.sl2').write_bytes(bytes(1000))
+    quota = QuotaManager(str(tmp_path), 0)
+    assert quota.refresh() == 1000
+    os.utime(tmp_path, ns=(0, 0))
+    with open(tmp_path / 'a.sl2', 'r+b') as file:
+        file.write(bytes(3000))
+    os.utime(tmp_path, ns=(0, 0))
+    assert quota.refresh() == 3000
+
+
+def test_auto_snapshots_are_evicted_in_import_order_through_the_profile(make_settings, tmp_path):
+    settings = make_settings(sorting_type='import', ds3_quota_mb=0.01, quota_evicts_auto_snapshots=True)
+    game = Game(settings)
+    game.create_profile('p')
+    profile = game.profile('p')
+    names = ['auto 2026-01-03 10.00.00', 'auto 2026-01-01 10.00.00', 'auto 2026-01-02 10.00.00', 'kept']
+    for i, name in enumerate(names):
+        src = tmp_path / f'src{i}'
+        src.write_bytes(bytes([i]) * 4096)
+        profile.import_save(name, str(src))
+    for i, name in enumerate(names):  # the mtimes would evict them in the other order
+        os.utime(profile.item_path(name), ns=(i, (len(names) - i) * 10 ** 9))
+
+    assert game.enforce_quota() == names[:2]
+    assert sorted(os.listdir(profile.path)) == ['.imports.json', f'{names[2]}.sl2', 'kept.sl2']
+    assert game.profile('p').names() == [names[2], 'kept']
+    assert game.quota.usage <= game.quota.budget
@@ -0,0 +1,138 @@
+# -*- coding:Utf-8 -*-
+
+import os
+from configparser import ConfigParser
+
+import pytest
+
+from order_manifest import ImportLog
+from save_core import BACKUP_SUFFIX, NO_PROFILE, Game, read_config, rename_all, write_config
+
+
+def make_profile(settings, names):
+    game = Game(settings)
+    game.create_profile('p')
+    profile = game.profile('p')
+    for name in names:
+        with open(profile.item_path(name), 'wb') as file:
+            file.write(name.encode())
+    return game, game.profile('p')
+
+
+def files(profile):
+    return sorted(name[:-len('.sl2')] for name in os.listdir(profile.path) if name.endswith('.sl2'))
+
+
+def test_unnumbered_saves_cannot_be_moved(make_settings):
+    _, profile = make_profile(make_settings(), ['a', 'b', 'c', 'd'])
+    with pytest.raises(ValueError, match='numbered'):
+        profile.move('d', 1)
+    assert profile.names() == files(profile) == ['a', 'b', 'c', 'd']
+
+
+def test_move_renumbers_the_moved_range(make_settings):
+    _, profile = make_profile(make_settings(), ['1 a', '2 b', '3 c', '4 d'])
+    profile.move('4 d', 1)
+    assert profile.names() == files(profile) == ['1 a', '2 d', '3 b', '4 c']
+    with open(profile.item_path('2 d'), 'rb') as file:
+        assert file.read() == b'4 d'
+
+
+def test_moving_an_unknown_save_is_refused(make_settings):
+    _, profile = make_profile(make_settings(), ['1 a', '2 b'])
+    with pytest.raises(FileNotFoundError, match='"3 c" does not exist'):
+        profile.move('3 c', 0)
+    with pytest.raises(FileNotFoundError, match='"3 c" does not exist'):
+        profile.swap('3 c', -1)
+    assert profile.names() == files(profile) == ['1 a', '2 b']
+
+
+def test_imported_saves_are_sorted_by_their_written_size(make_settings, tmp_path):
+    game, profile = make_profile(make_settings(sorting_type='size'), [])
+    for name, size in [('small', 10), ('large', 1000), ('medium', 100)]:
+        (tmp_path / name).write_bytes(bytes(size))
+        profile.import_save(name, str(tmp_path / name))
+    assert list(profile.order) == ['large', 'medium', 'small']
+    assert game.profile('p').names() == ['large', 'medium', 'small']
+
+
+@pytest.mark.parametrize('failing', range(1, 7))
+def test_rename_all_undoes_the_renames_when_one_fails(tmp_path, monkeypatch, failing):
+    # a rotation goes through temporary names: three renames to them, then three to the new names
+    for name in 'abc':
+        (tmp_path / name).write_text(name)
+    calls = []
+    rename = os.rename
+    def flaky(path, new_path):
+        calls.append(path)
+        if len(calls) == failing:
+            raise PermissionError(path)
+        rename(path, new_path)
+    monkeypatch.setattr(os, 'rename', flaky)
+
+    paths = [str(tmp_path / name) for name in 'abc']
+    with pytest.raises(PermissionError):
+        rename_all(list(zip(paths, paths[1:] + paths[:1])))
+    assert {path.name: path.read_text() for path in tmp_path.iterdir()} == {'a': 'a', 'b': 'b', 'c': 'c'}
+
+
+def test_the_current_profile_follows_the_renames(make_settings):
+    settings = make_settings(profile='b.profile')
+    game = Game(settings)
+    for name in ('b', 'a'):
+        game.create_profile(name)
+    game.number()
+    assert settings.profile == '2 b.profile'
+    game.rename('2 b', 'c')  # the number is kept
+    assert game.current_profile().name == '2 c'
+    game.delete('1 a')
+    assert settings.profile == '2 c.profile'
+    game.delete('2 c')
+    assert settings.profile == NO_PROFILE
+
+
+def test_the_import_order_is_kept_for_deduplicated_saves(make_settings):
+    # the second import of A is a hard link to the first one, with its mtime
+    settings = make_settings(sorting_type='import', deduplicate_saves='true')
+    game = Game(settings)
+    game.create_profile('p')
+    profile = game.profile('p')
+    sources = {}
+    for name, data in (('a', b'BND4 a'), ('b', b'BND4 b')):
+        sources[name] = os.path.join(settings.ds_path, name + '.src')
+        with open(sources[name], 'wb') as file:
+            file.write(data)
+    for name, src in (('first', 'a'), ('second', 'b'), ('third', 'a')):
+        profile.import_saves([(name, sources[src])])
+    assert os.stat(profile.item_path('third')).st_mtime_ns == os.stat(profile.item_path('first')).st_mtime_ns
+    assert profile.names() == ['first', 'second', 'third']
+
+    profile.rename('first', 'fourth')
+    profile.import_saves([('first', sources['b'])])
+    assert game.profile('p').names() == ['fourth', 'second', 'third', 'first']
+    profile.delete('second')
+    assert sorted(ImportLog(profile.path).times) == ['first', 'fourth', 'third']
+
+
+def test_read_config_falls_back_to_the_backup(tmp_path):
+    path = str(tmp_path / 'config.ini')
+    cfg = ConfigParser()
+    cfg['Main'] = {'game': 'ds3', 'ds3_path': str(tmp_path), 'profile': 'first.profile'}
+    write_config(cfg, path)
+    cfg['Main']['profile'] = 'second.profile'
+    write_config(cfg, path)
+    assert read_config(path)['Main']['profile'] == 'second.profile'
+
+    with open(path, 'w', encoding='utf8') as file:  # truncated
+        file.write('[Main]\ngame = ds3\n')
+    assert read_config(path)['Main']['profile'] == 'first.profile'
+    cfg['Main']['profile'] = 'third.profile'
+    write_config(cfg, path)  # the invalid version does not replace the backup
+    assert read_config(path + BACKUP_SUFFIX)['Main']['profile'] == 'first.profile'
+
+    os.remove(path)
+    assert read_config(path)['Main']['profile'] == 'first.profile'
+    with open(path + BACKUP_SUFFIX, 'w', encoding='utf8') as file:
+        file.write('not a configuration')
+    with pytest.raises(ValueError, match='no valid configuration'):
+        read_config(path)
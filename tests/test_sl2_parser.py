@@ -0,0 +1,152 @@
+# -*- coding:Utf-8 -*-
+
+import os
+import random
+import struct
+
+import pytest
+
+import sl2_parser
+from sl2_parser import (BND4_ENTRY, BND4_HEADER, DS1_LEVEL_OFFSET, DS1_NAME_OFFSET, MetadataCache, describe, parse_bnd4, parse_save,
+                        read_save_info)
+from snapshot_codec import compress_file
+
+HEADER_SIZE = 0x40
+ENTRY_SIZE = 0x20
+SLOT_SIZE = 0x400
+
+
+def build_bnd4(entries, unicode=True, version=b'00000001'):
+    # a BND4 container of the (name, data) entries: header, entry table, names, then the data
+    table_end = HEADER_SIZE + len(entries) * ENTRY_SIZE
+    names = b''
+    name_offsets = []
+    for name, _ in entries:
+        name_offsets.append(table_end + len(names))
+        names += name.encode('utf-16-le') + b'\0\0' if unicode else name.encode('shift_jis') + b'\0'
+    data_start = table_end + len(names)
+    body = b''
+    offsets = []
+    for _, data in entries:
+        offsets.append(data_start + len(body))
+        body += data
+    header = BND4_HEADER.pack(b'BND4', len(entries), HEADER_SIZE, version, ENTRY_SIZE, data_start, unicode, 0x74).ljust(HEADER_SIZE, b'\0')
+    table = b''.join(BND4_ENTRY.pack(len(data), offset, name_offset).ljust(ENTRY_SIZE, b'\0')
+                     for (_, data), offset, name_offset in zip(entries, offsets, name_offsets))
+    return header + table + names + body
+
+
+def character(name, level):
+    data = bytearray(SLOT_SIZE)
+    struct.pack_into('<I', data, DS1_LEVEL_OFFSET, level)
+    encoded = name.encode('utf-16-le')
+    data[DS1_NAME_OFFSET:DS1_NAME_OFFSET + len(encoded)] = encoded
+    return bytes(data)
+
+
+def encrypted():
+    return random.Random(1).randbytes(SLOT_SIZE)
+
+
+def save(*slots):
+    # USER_DATA000... for the slots, then the system data that is not a character slot
+    entries = [(f'USER_DATA{i:03}', data) for i, data in enumerate(slots)]
+    entries.append(('USER_DATA010', b'\xff' * 64))
+    return build_bnd4(entries)
+
+
+def test_parse_bnd4_reads_the_entry_table():
+    buffer = build_bnd4([('USER_DATA000', b'abc'), ('USER_DATA001', b'defgh')])
+    version, entries = parse_bnd4(buffer)
+    assert version == '00000001'
+    assert [(entry.name, entry.size) for entry in entries] == [('USER_DATA000', 3), ('USER_DATA001', 5)]
+    assert buffer[entries[1].offset:entries[1].offset + entries[1].size] == b'defgh'
+
+
+def test_parse_bnd4_reads_shift_jis_names():
+    _, entries = parse_bnd4(build_bnd4([('SYSTEM', b'x')], unicode=False))
+    assert entries[0].name == 'SYSTEM'
+
+
+def test_parse_save_detects_plain_empty_and_encrypted_slots():
+    info = parse_save(save(character('Solaire', 42), bytes(SLOT_SIZE), encrypted(), character('Siegmeyer', 713)))
+    assert [(slot.index, slot.occupied, slot.character, slot.level) for slot in info.slots] == [
+        (0, True, 'Solaire', 42), (1, False, None, None), (2, None, None, None), (3, True, 'Siegmeyer', 713)]
+    assert len(info.entries) == 5  # the system data is listed but is not a slot
+
+
+def test_out_of_range_levels_are_not_characters():
+    info = parse_save(save(character('Solaire', 0), character('Solaire', 714)))
+    assert [slot.occupied for slot in info.slots] == [None, None]
+
+
+@pytest.mark.parametrize('buffer', [b'', b'BND4', b'BND3' + bytes(100)])
+def test_not_a_container(buffer):
+    with pytest.raises(ValueError):
+        parse_bnd4(buffer)
+
+
+def test_truncated_entry_table():
+    buffer = build_bnd4([('USER_DATA000', b'a' * 10), ('USER_DATA001', b'b' * 10)])
+    with pytest.raises(ValueError, match='truncated'):
+        parse_bnd4(buffer[:HEADER_SIZE + ENTRY_SIZE])
+
+
+def test_entry_outside_of_the_file():
+    buffer = build_bnd4([('USER_DATA000', b'a' * 100)])
+    with pytest.raises(ValueError, match='outside'):
+        parse_bnd4(buffer[:-50])
+
+
+def test_describe():
+    assert describe(parse_save(save(bytes(SLOT_SIZE)))) == ''
+    assert describe(parse_save(save(character('A', 1), character('B', 2)))) == 'A SL1, B SL2'
+    assert describe(parse_save(save(*(character(name, 10) for name in 'ABCD')))) == 'A SL10, B SL10 +2'
+
+
+def test_read_save_info_of_raw_and_compressed_saves(tmp_path):
+    path = tmp_path / 'a.sl2'
+    path.write_bytes(save(character('Solaire', 42)))
+    compressed = tmp_path / 'b.sl2'
+    compress_file(str(path), str(compressed), 'zlib', 6)
+    for file in (path, compressed):
+        assert read_save_info(str(file)).slots[0].character == 'Solaire'
+    (tmp_path / 'empty.sl2').write_bytes(b'')
+    with pytest.raises(ValueError):
+        read_save_info(str(tmp_path / 'empty.sl2'))
+
+
+def test_metadata_cache_hits_and_misses(tmp_path, monkeypatch):
+    parsed = []
+    parse = sl2_parser.read_save_info
+    monkeypatch.setattr(sl2_parser, 'read_save_info', lambda path, resolve=None: parsed.append(path) or parse(path, resolve))
+    path = tmp_path / '1 a.sl2'
+    path.write_bytes(save(character('Solaire', 42)))
+    broken = tmp_path / 'broken.sl2'
+    broken.write_bytes(b'not a save')
+
+    cache = MetadataCache(str(tmp_path))
+    texts = cache.describe_saves([str(path), str(broken), str(tmp_path / 'gone.sl2')])
+    assert texts == {str(path): 'Solaire SL42', str(broken): ''}
+    assert len(parsed) == 2 and not cache.changed  # written once at the end
+
+    renamed = tmp_path / '2 a.sl2'
+    os.rename(path, renamed)  # the size and the mtime are kept
+    cache = MetadataCache(str(tmp_path))
+    assert cache.get(str(renamed)).slots[0].character == 'Solaire'
+    assert cache.get(str(broken)) is None
+    assert len(parsed) == 2
+
+    renamed.write_bytes(save(character('Solaire', 43)))
+    assert cache.get(str(renamed)).slots[0].level == 43
+    assert len(parsed) == 3
+
+    st = os.stat(renamed)
+    cache.prune([(st.st_size, st.st_mtime_ns)])
+    assert len(cache.entries) == 1 and not cache.changed
+    assert len(MetadataCache(str(tmp_path)).entries) == 1
+
+
+def test_damaged_sidecar_is_ignored(tmp_path):
+    (tmp_path / sl2_parser.METADATA_NAME).write_text('{', encoding='utf8')
+    assert MetadataCache(str(tmp_path)).entries == {}
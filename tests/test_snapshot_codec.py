@@ -0,0 +1,127 @@
+# -*- coding:Utf-8 -*-
+
+import os
+from configparser import ConfigParser
+
+import pytest
+
+import savemanager
+from hashing import file_digest
+from integrity import IntegrityError, IntegrityIndex
+from save_core import Game, recompress_profiles
+from snapshot_codec import HEADER, MAGIC, compress_file, content_digest, decompress_file, iter_raw, read_header, recompress
+
+DATA = b'BND4' + bytes(range(256)) * 400 + os.urandom(3000)
+
+
+def raw(path):
+    return b''.join(iter_raw(str(path)))
+
+
+@pytest.mark.parametrize('method', ['zlib', 'lzma'])
+def test_compressed_snapshots_round_trip(tmp_path, method):
+    src = tmp_path / 'src.sl2'
+    src.write_bytes(DATA)
+    header = compress_file(str(src), str(tmp_path / 'c.sl2'), method, 9)
+
+    assert (tmp_path / 'c.sl2').read_bytes().startswith(MAGIC)
+    assert read_header(str(tmp_path / 'c.sl2')) == header == (method, 9, len(DATA), file_digest(str(src)))
+    assert os.path.getsize(tmp_path / 'c.sl2') < len(DATA)
+    assert content_digest(str(tmp_path / 'c.sl2')) == content_digest(str(src))
+    assert decompress_file(str(tmp_path / 'c.sl2'), str(tmp_path / 'd.sl2')) == len(DATA)
+    assert (tmp_path / 'd.sl2').read_bytes() == DATA
+
+
+def test_raw_snapshots_are_read_as_they_are(tmp_path):
+    for data in (b'', b'SMZ', DATA):
+        (tmp_path / 'a.sl2').write_bytes(data)
+        assert read_header(str(tmp_path / 'a.sl2')) is None
+        assert raw(tmp_path / 'a.sl2') == data
+
+
+def test_recompress_keeps_the_hard_links(tmp_path):
+    first, second = tmp_path / 'a.sl2', tmp_path / 'b.sl2'
+    first.write_bytes(DATA)
+    os.link(first, second)
+
+    assert recompress([str(first), str(second)], 'lzma', 6) > 0
+    assert os.path.samefile(first, second) and read_header(str(second)).method == 'lzma'
+    assert recompress([str(first), str(second)], 'lzma', 6) == 0  # already in this format
+    recompress([str(first), str(second)], None, 0)
+    assert first.read_bytes() == DATA and os.path.samefile(first, second)
+
+
+def test_recompress_refuses_a_damaged_snapshot(tmp_path):
+    path = tmp_path / 'a.sl2'
+    compress_file(__file__, str(path), 'zlib', 6)
+    data = bytearray(path.read_bytes())
+    data[HEADER.size - 1] ^= 0xff  # the recorded digest
+    path.write_bytes(bytes(data))
+
+    with pytest.raises(ValueError, match='corrupted'):
+        recompress([str(path)], 'lzma', 6)
+    assert path.read_bytes() == bytes(data)
+    assert [entry.name for entry in os.scandir(tmp_path)] == ['a.sl2']
+
+
+def fill_game(settings, saves):
+    game = Game(settings)
+    game.create_profile('p')
+    profile = game.profile('p')
+    sources = []
+    for name, data in saves.items():
+        src = os.path.join(settings.ds_path, name + '.src')
+        with open(src, 'wb') as file:
+            file.write(data)
+        sources.append((name, src))
+    profile.import_saves(sources)
+    return profile
+
+
+def test_recompress_profiles_rewrites_the_saves_and_the_store(make_settings):
+    settings = make_settings(deduplicate_saves='true')
+    profile = fill_game(settings, {'a': DATA, 'b': DATA, 'c': DATA[::-1]})
+    live = os.path.join(settings.ds_path, 'DS30000.sl2')
+    with open(live, 'wb') as file:
+        file.write(DATA)
+
+    assert recompress_profiles(settings.ds_path, 'zlib', 6, workers=1) > 0
+    for name, data in (('a', DATA), ('b', DATA), ('c', DATA[::-1])):
+        assert read_header(profile.item_path(name)).method == 'zlib'
+        assert raw(profile.item_path(name)) == data
+    assert os.path.samefile(profile.item_path('a'), profile.item_path('b'))
+    assert read_header(live) is None  # the game reads the live save
+
+
+def test_recompress_profiles_records_the_rewritten_saves(make_settings):
+    settings = make_settings(deduplicate_saves='true', verify_saves='true')
+    profile = fill_game(settings, {'a': DATA, 'b': DATA, 'c': DATA[::-1], 'd': DATA[:5000]})
+    with open(profile.item_path('d'), 'r+b') as file:
+        file.write(b'XXXX')
+    damaged = open(profile.item_path('d'), 'rb').read()
+
+    recompress_profiles(settings.ds_path, 'zlib', 6, workers=1, indexes={profile.path: profile.integrity})
+    for name in 'abc':
+        assert read_header(profile.item_path(name)).method == 'zlib'
+        st = os.stat(profile.item_path(name))
+        assert profile.integrity.find(profile.item_path(name), st) is not None
+        profile.integrity.check(profile.item_path(name))
+        assert IntegrityIndex(profile.path).find(profile.item_path(name), st) is not None
+    assert open(profile.item_path('d'), 'rb').read() == damaged
+    with pytest.raises(IntegrityError, match='"d"'):
+        profile.integrity.check(profile.item_path('d'))
+
+
+def test_recompress_command(make_settings, tmp_path, capsys):
+    settings = make_settings(compression='lzma', compression_level='3')
+    profile = fill_game(make_settings(), {'a': DATA})
+    cfg = ConfigParser()
+    cfg['Main'] = {'game': 'ds3', 'ds3_path': settings.ds_path, 'profile': 'p', 'compression': 'lzma', 'compression_level': '3'}
+    config = tmp_path / 'config.ini'
+    with open(config, 'w', encoding='utf8') as file:
+        cfg.write(file)
+
+    assert savemanager.main(['--config', str(config), 'recompress', '--workers', '1']) == 0
+    assert 'MB saved' in capsys.readouterr().out
+    assert read_header(profile.item_path('a'))[:2] == ('lzma', 3)
+    assert raw(profile.item_path('a')) == DATA
@@ -0,0 +1,118 @@
+# -*- coding:Utf-8 -*-
+
+import os
+import random
+
+import pytest
+
+from hashing import new_hash
+from snapshot_codec import BLOCK_SIZE, apply_delta, encode_delta, iter_raw, read_delta, read_header, reconstruct
+from snapshot_store import SnapshotStore
+
+
+def digest(data):
+    h = new_hash()
+    h.update(data)
+    return h.hexdigest()
+
+
+def versions(count, size=20 * BLOCK_SIZE):
+    # successive saves of a game: each one changes a few blocks of the previous one
+    rng = random.Random(2)
+    data = bytearray(rng.randbytes(size))
+    result = [bytes(data)]
+    for _ in range(count - 1):
+        for _ in range(2):
+            start = rng.randrange(size - 100)
+            data[start:start + 100] = rng.randbytes(100)
+        result.append(bytes(data))
+    return result
+
+
+def add_all(store, tmp_path, datas):
+    digests = []
+    for i, data in enumerate(datas):
+        src = tmp_path / 'src'
+        src.write_bytes(data)
+        digests.append(store.add(str(src), str(tmp_path / f'{i}.sl2')))
+    return digests
+
+
+@pytest.mark.parametrize('size', [10 * BLOCK_SIZE, 10 * BLOCK_SIZE + 7, 3 * BLOCK_SIZE + 1, 30 * BLOCK_SIZE - 3])
+def test_delta_round_trip_when_the_size_changes(tmp_path, size):
+    base = random.Random(3).randbytes(10 * BLOCK_SIZE)
+    data = bytearray(random.Random(4).randbytes(size))
+    data[:BLOCK_SIZE] = base[:BLOCK_SIZE]
+    path = tmp_path / 'delta'
+    path.write_bytes(encode_delta(bytes(data), digest(data), base, digest(base), 1, 6))
+
+    assert read_header(str(path)).method == 'delta'
+    assert read_delta(str(path)) == (digest(base), 1, BLOCK_SIZE)
+    assert apply_delta(str(path), base) == data
+
+
+def test_unchanged_blocks_are_not_stored(tmp_path):
+    base = random.Random(3).randbytes(50 * BLOCK_SIZE)
+    data = bytearray(base)
+    data[7 * BLOCK_SIZE] ^= 1
+    content = encode_delta(bytes(data), digest(data), base, digest(base), 1, 6)
+    assert len(content) < 2 * BLOCK_SIZE
+
+
+def test_store_chains_deltas_up_to_the_keyframe_interval(tmp_path):
+    store = SnapshotStore(str(tmp_path / 'store'), keyframe_interval=3)
+    datas = versions(7)
+    digests = add_all(store, tmp_path, datas)
+
+    methods = [getattr(read_header(store.object_path(d)), 'method', None) for d in digests]
+    assert methods == [None, 'delta', 'delta', None, 'delta', 'delta', None]
+    assert [read_delta(store.object_path(d)).depth for d in digests[4:6]] == [1, 2]
+    assert read_delta(store.object_path(digests[5])).base == digests[4]
+    for i, data in enumerate(datas):
+        assert b''.join(iter_raw(str(tmp_path / f'{i}.sl2'), store.object_path)) == data
+        assert reconstruct(store.object_path(digests[i]), store.object_path) == data
+
+
+def test_a_new_store_rebuilds_the_base_of_the_next_delta(tmp_path):
+    datas = versions(3)
+    add_all(SnapshotStore(str(tmp_path / 'store'), keyframe_interval=5), tmp_path, datas[:2])
+    store = SnapshotStore(str(tmp_path / 'store'), keyframe_interval=5)  # no last object in memory
+    src = tmp_path / 'src'
+    src.write_bytes(datas[2])
+    new = store.add(str(src), str(tmp_path / '2.sl2'))
+    assert read_delta(store.object_path(new)).depth == 2
+    assert b''.join(iter_raw(str(tmp_path / '2.sl2'), store.object_path)) == datas[2]
+
+
+def test_different_saves_are_stored_as_keyframes(tmp_path):
+    store = SnapshotStore(str(tmp_path / 'store'), 'zlib', 6, keyframe_interval=10)
+    rng = random.Random(5)
+    digests = add_all(store, tmp_path, [rng.randbytes(8 * BLOCK_SIZE), rng.randbytes(8 * BLOCK_SIZE)])
+    assert read_header(store.object_path(digests[1])).method == 'zlib'
+
+
+def test_bases_of_linked_deltas_are_kept(tmp_path):
+    store = SnapshotStore(str(tmp_path / 'store'), keyframe_interval=10)
+    datas = versions(3)
+    digests = add_all(store, tmp_path, datas)
+
+    store.remove_all([str(tmp_path / '0.sl2'), str(tmp_path / '1.sl2')])
+    assert all(os.path.exists(store.object_path(d)) for d in digests)  # the last delta is built on them
+    assert b''.join(iter_raw(str(tmp_path / '2.sl2'), store.object_path)) == datas[2]
+
+    store.remove(str(tmp_path / '2.sl2'))
+    assert not any(os.path.exists(store.object_path(d)) for d in digests)
+
+
+def test_removing_saves_releases_only_their_objects(tmp_path, monkeypatch):
+    store = SnapshotStore(str(tmp_path / 'store'), keyframe_interval=2)
+    datas = versions(4)
+    digests = add_all(store, tmp_path, datas)
+    monkeypatch.setattr(store, 'collect', lambda: pytest.fail('full collect'))
+
+    store.remove_all([str(tmp_path / '1.sl2'), str(tmp_path / '2.sl2')])
+    assert [os.path.exists(store.object_path(d)) for d in digests] == [True, False, True, True]
+    assert b''.join(iter_raw(str(tmp_path / '3.sl2'), store.object_path)) == datas[3]
+
+    store.remove_all([str(tmp_path / '0.sl2'), str(tmp_path / '3.sl2')])
+    assert not any(os.path.exists(store.object_path(d)) for d in digests)
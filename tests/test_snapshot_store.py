@@ -0,0 +1,80 @@
+# -*- coding:Utf-8 -*-
+
+import os
+
+from snapshot_store import SnapshotStore
+
+
+def write(path, data):
+    path.write_bytes(data)
+    return str(path)
+
+
+def objects(store):
+    return sorted(entry.name for subdir in os.scandir(store.root_path) if subdir.is_dir() for entry in os.scandir(subdir.path))
+
+
+def test_identical_saves_share_one_object(tmp_path):
+    store = SnapshotStore(str(tmp_path / 'store'))
+    first = store.add(write(tmp_path / 'src1', b'same data'), str(tmp_path / 'a.sl2'))
+    second = store.add(write(tmp_path / 'src2', b'same data'), str(tmp_path / 'b.sl2'))
+    other = store.add(write(tmp_path / 'src3', b'other data'), str(tmp_path / 'c.sl2'))
+
+    assert first == second != other
+    assert objects(store) == sorted([first, other])
+    assert os.path.samefile(tmp_path / 'a.sl2', tmp_path / 'b.sl2')
+    assert os.stat(store.object_path(first)).st_nlink == 3
+    assert (tmp_path / 'c.sl2').read_bytes() == b'other data'
+
+
+def test_add_replaces_the_link_instead_of_writing_through_it(tmp_path):
+    store = SnapshotStore(str(tmp_path / 'store'))
+    digest = store.add(write(tmp_path / 'src', b'kept'), str(tmp_path / 'a.sl2'))
+    os.link(tmp_path / 'a.sl2', tmp_path / 'b.sl2')
+    store.add(write(tmp_path / 'src', b'new'), str(tmp_path / 'b.sl2'))
+
+    assert (tmp_path / 'a.sl2').read_bytes() == b'kept'
+    assert (tmp_path / 'b.sl2').read_bytes() == b'new'
+    assert os.path.exists(store.object_path(digest))
+
+
+def test_objects_are_released_with_their_last_save(tmp_path):
+    store = SnapshotStore(str(tmp_path / 'store'))
+    digest = store.add(write(tmp_path / 'src', b'data'), str(tmp_path / 'a.sl2'))
+    store.add(str(tmp_path / 'src'), str(tmp_path / 'b.sl2'))
+
+    store.remove(str(tmp_path / 'a.sl2'))
+    assert objects(store) == [digest]
+    store.remove(str(tmp_path / 'b.sl2'))
+    assert objects(store) == []
+
+
+def test_collect_frees_the_unlinked_objects(tmp_path):
+    store = SnapshotStore(str(tmp_path / 'store'))
+    kept = store.add(write(tmp_path / 'src1', b'kept'), str(tmp_path / 'a.sl2'))
+    store.add(write(tmp_path / 'src2', b'dropped!'), str(tmp_path / 'b.sl2'))
+    os.remove(tmp_path / 'b.sl2')  # removed behind the back of the store
+
+    assert store.collect() == len(b'dropped!')
+    assert objects(store) == [kept]
+
+
+def test_compressed_objects_are_linked_as_they_are(tmp_path):
+    store = SnapshotStore(str(tmp_path / 'store'), 'zlib', 9)
+    data = b'BND4' + b'\0' * 100000
+    digest = store.add(write(tmp_path / 'src', data), str(tmp_path / 'a.sl2'))
+    assert store.add(str(tmp_path / 'src'), str(tmp_path / 'b.sl2')) == digest
+    assert os.path.getsize(tmp_path / 'a.sl2') < len(data)
+    store.remove_all([str(tmp_path / 'a.sl2'), str(tmp_path / 'b.sl2')])
+    assert objects(store) == []
+
+
+def test_objects_and_saves_follow_the_umask(tmp_path):
+    store = SnapshotStore(str(tmp_path / 'store'))
+    (tmp_path / 'src').write_bytes(b'save')
+    os.chmod(tmp_path / 'src', 0o600)
+    digest = store.add(str(tmp_path / 'src'), str(tmp_path / 'a.sl2'))
+    umask = os.umask(0)
+    os.umask(umask)
+    assert os.stat(store.object_path(digest)).st_mode & 0o777 == 0o666 & ~umask
+    assert os.stat(tmp_path / 'a.sl2').st_mode & 0o777 == 0o666 & ~umask
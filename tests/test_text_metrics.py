@@ -0,0 +1,53 @@
+# -*- coding:Utf-8 -*-
+
+from text_metrics import MaxTracker, MeasureCache
+
+
+class Font:
+    name = 'font1'
+
+    def __init__(self):
+        self.measured = []
+
+    def measure(self, text):
+        self.measured.append(text)
+        return 7 * len(text)
+
+
+def test_max_tracker_deletes_the_removed_widths_lazily():
+    widths = MaxTracker([10, 30, 30, 20])
+    assert widths.max == 30
+    widths.remove(30)
+    assert widths.max == 30
+    widths.remove(30)
+    assert widths.max == 20
+    widths.add(30)
+    assert widths.max == 30
+    widths.remove(30)
+    widths.remove(20)
+    widths.remove(10)
+    assert widths.max == 0
+    widths.add(5)
+    assert widths.max == 5
+
+
+def test_max_tracker_keeps_a_removed_width_that_was_added_back():
+    widths = MaxTracker([10, 40])
+    widths.remove(40)
+    widths.add(40)
+    widths.add(40)
+    widths.remove(40)
+    assert widths.max == 40
+    assert len(widths.heap) == 2
+
+
+def test_measure_cache_fits_the_whole_list():
+    font = Font()
+    cache = MeasureCache(maxsize=4)
+    names = [f'save {i}' for i in range(10)]
+    cache.fit(len(names))
+    for name in names * 2:
+        assert cache.measure(font, name) == 7 * len(name)
+    assert font.measured == names
+    cache.fit(3)
+    assert cache.maxsize == 14
@@ -0,0 +1,51 @@
+# -*- coding:Utf-8 -*-
+
+from collections import Counter, OrderedDict
+from heapq import heapify, heappop, heappush
+
+
+class MeasureCache:
+    # font.measure() is a round-trip into Tcl, the widths are kept per (font, text) with LRU eviction
+    def __init__(self, maxsize=8192):
+        self.minsize = self.maxsize = maxsize
+        self.widths = OrderedDict()
+
+    def fit(self, count):
+        # a list measures all its items to align them, they are kept with as many other widths as the initial size
+        self.maxsize = max(self.maxsize, count + self.minsize)
+
+    def measure(self, font, text):
+        key = font.name, text
+        try:
+            self.widths.move_to_end(key)
+            return self.widths[key]
+        except KeyError:
+            pass
+
+        width = font.measure(text)
+        self.widths[key] = width
+        if len(self.widths) > self.maxsize:
+            self.widths.popitem(last=False)
+        return width
+
+
+class MaxTracker:
+    # maximum of a multiset of widths, with lazily deleted entries in a max-heap
+    def __init__(self, values=()):
+        self.counts = Counter(values)
+        self.heap = [-value for value in self.counts]
+        heapify(self.heap)
+
+    def add(self, value):
+        if value not in self.counts:  # a removed value stays in the heap until it is popped
+            heappush(self.heap, -value)
+        self.counts[value] += 1
+
+    def remove(self, value):
+        self.counts[value] -= 1
+
+    @property
+    def max(self):
+        while self.heap and self.counts[-self.heap[0]] <= 0:
+            del self.counts[-heappop(self.heap)]
+        return -self.heap[0] if self.heap else 0
@@ -0,0 +1,137 @@
+# -*- coding:Utf-8 -*-
+
+from tkinter import ttk
+
+
+class VirtualList(ttk.Frame):
+    # only the visible rows have a button, the buttons are rebound to other items when scrolling
+    def __init__(self, master, rows, callback, text_for, style_for, on_drop=None, on_select=None, *args, **kwargs):
+        super().__init__(master, *args, **kwargs)
+
+        self.rows = rows
+        self.callback = callback  # called with the name of the clicked item
+        self.text_for = text_for  # (position, name) -> text of the button
+        self.style_for = style_for  # name -> style of the button
+        self.on_drop = on_drop  # called with the name of a dragged item and the position where it is dropped
+        self.on_select = on_select  # called with the name of an item and 'toggle' for a ctrl-click or 'range' for a shift-click
+
+        self.items = []
+        self.top = 0
+
+        self.buttons = []
+        self.rendered = [None] * rows  # (text, style) shown by each button, None when it is hidden
+        self.scrollbar_state = None
+        for row in range(rows):
+            button = ttk.Button(self, command=self.define_callback(row), style='B.TButton')
+            self.buttons.append(button)
+            self.bind_wheel(button)
+            button.bind('<ButtonRelease-1>', self.define_drop_callback(row), add='+')
+            button.bind('<Control-Button-1>', self.define_select_callback(row, 'toggle'))
+            button.bind('<Shift-Button-1>', self.define_select_callback(row, 'range'))
+
+        self.scrollbar = ttk.Scrollbar(self, orient='vertical', command=self.yview)
+        self.bind_wheel(self)
+
+    def define_callback(self, row):
+        def callback():
+            position = self.top + row
+            if position < len(self.items):
+                self.callback(self.items[position])
+        return callback
+
+    def define_drop_callback(self, row):
+        def callback(event):
+            position = self.top + row
+            target = self.position_at(event.y_root)
+            if self.on_drop is not None and position < len(self.items) and target is not None and target != position:
+                self.on_drop(self.items[position], target)
+        return callback
+
+    def define_select_callback(self, row, mode):
+        def callback(_):
+            position = self.top + row
+            if self.on_select is not None and position < len(self.items):
+                self.on_select(self.items[position], mode)
+            return 'break'  # the button is not pressed, so its command is not called
+        return callback
+
+    def position_at(self, y_root):
+        # the buttons all have the same height
+        first = self.buttons[0]
+        height = first.winfo_height()
+        if not self.items or height <= 1:
+            return None
+        row = (y_root - first.winfo_rooty()) // height
+        return max(0, min(self.top + row, len(self.items) - 1))
+
+    def bind_wheel(self, widget):
+        widget.bind('<MouseWheel>', self.on_mousewheel)
+        widget.bind('<Button-4>', self.on_mousewheel)
+        widget.bind('<Button-5>', self.on_mousewheel)
+
+    def on_mousewheel(self, event):
+        if event.num == 4 or event.delta > 0:
+            self.scroll(-3)
+        else:
+            self.scroll(3)
+
+    def set_items(self, items):
+        self.items = items
+        self.scroll_to(self.top)
+
+    def scroll(self, n):
+        self.scroll_to(self.top + n)
+
+    def scroll_to(self, top):
+        self.top = max(0, min(top, len(self.items) - self.rows))
+        self.refresh()
+
+    def see(self, position):
+        if position < self.top:
+            self.scroll_to(position)
+        elif position >= self.top + self.rows:
+            self.scroll_to(position - self.rows + 1)
+
+    def yview(self, *args):
+        if args[0] == 'moveto':
+            self.scroll_to(round(float(args[1]) * len(self.items)))
+        elif args[0] == 'scroll':
+            n = int(args[1])
+            if args[2] == 'pages':
+                n *= self.rows
+            self.scroll(n)
+
+    def refresh(self):
+        # only the buttons whose text or style changed are touched
+        for row, button in enumerate(self.buttons):
+            position = self.top + row
+            rendered = self.rendered[row]
+            if position < len(self.items):
+                name = self.items[position]
+                text, style = self.text_for(position, name), self.style_for(name)
+                if rendered is None:
+                    button.configure(text=text, style=style)
+                    button.grid(column=0, row=row, sticky='w')
+                elif rendered[0] != text and rendered[1] != style:
+                    button.configure(text=text, style=style)
+                elif rendered[0] != text:
+                    button['text'] = text
+                elif rendered[1] != style:
+                    button['style'] = style
+                self.rendered[row] = text, style
+            elif rendered is not None:
+                button.grid_remove()
+                self.rendered[row] = None
+
+        if len(self.items) > self.rows:
+            scrollbar_state = self.top / len(self.items), (self.top + self.rows) / len(self.items)
+        else:
+            scrollbar_state = None
+        if scrollbar_state != self.scrollbar_state:
+            if scrollbar_state is None:
+                self.scrollbar.grid_remove()
+            else:
+                self.scrollbar.set(*scrollbar_state)
+                if self.scrollbar_state is None:
+                    self.scrollbar.grid(column=1, row=0, rowspan=self.rows, sticky='ns')
+            self.scrollbar_state = scrollbar_state